@@ -1,16 +1,32 @@
 import random
 import sqlite3
 import json
+import os
 from datetime import datetime, timedelta
-from src.db import get_connection
+from src.agent_runs import AgentRun
+from src.db import get_connection, init_db
 from src.events import emit_event
+from src.lineage_extractor import MODELS_DIR
+from src.lineage_graph import get_lineage_graph
 from src.llm_scanner import LLMScanner
+from src.llm_telemetry import LLMBudget
 from src.policy_checker import PolicyChecker
+from src.policy_coverage import get_coverage_gaps
+from src.rolling_stats import load_rolling_stats, trend_factor
+from src.rule_state import EDGE_TRIGGERED, daily_rule_scores, load_rule_states, risk_changed, save_rule_states, transition
+from src.whatif import predict_impact
 
 class GovernanceAgent:
-    def __init__(self, date_str: str):
-        self.llm_scanner = LLMScanner()
-        self.policy_checker = PolicyChecker()
+    def __init__(self, date_str: str, llm_scanner: LLMScanner = None, policy_checker: PolicyChecker = None):
+        # One LLM budget per daily run; once spent, SQL analysis uses heuristics.
+        # Long-running callers (src/daemon.py) pass warm instances kept across days.
+        budget = LLMBudget.from_env(run_id=f"agent:{date_str}")
+        if llm_scanner is None:
+            llm_scanner = LLMScanner(budget=budget)
+        else:
+            llm_scanner.budget = budget
+        self.llm_scanner = llm_scanner
+        self.policy_checker = policy_checker or PolicyChecker()
         self.date_str = date_str
         
     def review_persistent_memory(self):
@@ -65,122 +81,204 @@ class GovernanceAgent:
         conn.commit()
         conn.close()
 
-    def raise_pull_request(self, tde_id: str, model_name: str, suggestion: str):
-        """Persists the agent's suggestion into memory as an Open PR."""
+    def raise_pull_request(self, tde_id: str, model_name: str, suggestion: str, predicted_impact: dict = None):
+        """
+        Persists the agent's suggestion into memory as an Open PR, with its what-if
+        predicted DQ impact. A run raises at most one PR per (date, TDE, model):
+        repeating the call returns the existing pr_id.
+        """
         conn = get_connection()
         cursor = conn.cursor()
         
         timestamp = datetime.utcnow().isoformat()
         cursor.execute('''
-            INSERT INTO AGENT_MEMORY (timestamp, tde_id, model_name, suggestion, status)
-            VALUES (?, ?, ?, ?, 'open')
-        ''', (timestamp, tde_id, model_name, suggestion))
-        pr_id = cursor.lastrowid
+            INSERT INTO AGENT_MEMORY (timestamp, tde_id, model_name, suggestion, status, run_date, predicted_impact)
+            VALUES (?, ?, ?, ?, 'open', ?, ?)
+            ON CONFLICT(run_date, tde_id, model_name) DO NOTHING
+        ''', (timestamp, tde_id, model_name, suggestion, self.date_str,
+              json.dumps(predicted_impact) if predicted_impact is not None else None))
+        cursor.execute(
+            "SELECT pr_id FROM AGENT_MEMORY WHERE run_date = ? AND tde_id = ? AND model_name = ?",
+            (self.date_str, tde_id, model_name)
+        )
+        pr_id = cursor.fetchone()[0]
         
         conn.commit()
         conn.close()
         return pr_id
 
     def run_daily_agent(self):
+        """
+        One daily run, checkpointed per stage in AGENT_RUNS / AGENT_RUN_STAGES. Re-running
+        the same date resumes after the last completed stage with its stored results,
+        so events, LLM calls and PRs of finished stages are not repeated.
+        """
         conn = get_connection()
         conn.row_factory = lambda cursor, row: {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
         cursor = conn.cursor()
         
         print(f"\n[{self.date_str}] --- AGENT EXECUTION STARTING ---")
+        run = AgentRun(self.date_str)
+        if run.completed:
+            print(f"[{self.date_str}] Run {run.run_id} already completed.")
+            conn.close()
+            return
         
         # 0. Check memory for outcomes of past merged PRs
-        self.review_persistent_memory()
+        run.stage("memory_reviewed", self.review_persistent_memory)
         
-        # 1. Detect breached rules
-        cursor.execute('''
-            SELECT r.rule_id, r.threshold, r.description, d.score, t.tde_id, t.name as tde_name, b.term_id, b.criticality
-            FROM RULES r
-            JOIN BUSINESS_TERMS b ON r.business_term_id = b.term_id
-            JOIN TDE t ON t.business_term_id = b.term_id
-            JOIN DQ_SCORES d ON d.tde_id = t.tde_id
-            WHERE d.date = ?
-        ''', (self.date_str,))
+        # 1-2. Detect breached rules and assess their risk
+        risks = run.stage("risk_assessed", lambda: self._assess_breaches(conn, cursor))
+        if not risks:
+            print("No breaches today.")
+            run.finish("no_breaches")
+            conn.close()
+            return
+            
+        # 3-4. Select focus (opens the investigation the following events belong to)
+        focus = run.stage("focus_selected", lambda: self._select_focus(risks))
+        investigation_id = focus['investigation_id']
+        
+        # 5. Trace lineage
+        lineage = run.stage("lineage_traced", lambda: self._trace_lineage(conn, focus, investigation_id))
+        if not lineage:
+            run.finish("no_lineage")
+            conn.close()
+            return
+        sql_text = self._read_model_sql(lineage['model_name'])
+        if sql_text is None:
+            run.finish("no_model_sql")
+            conn.close()
+            return
+        
+        # 6. LLM SQL Analysis (the expensive stage: its answer is never paid for twice)
+        analysis = run.stage("sql_analyzed", lambda: self._analyze_sql(focus, lineage, sql_text, investigation_id))
+        inferred_type, sql_risks = analysis['inferred_type'], analysis['sql_risks']
         
+        # 7. Policy Check (read from the materialized coverage matrix when it is current)
+        gaps = run.stage("policy_checked", lambda: self._check_policy(cursor, focus, lineage, inferred_type, investigation_id))
+            
+        # 8. Create recommendation & Raise PR
+        if gaps or sql_risks:
+            run.stage("recommendation_created", lambda: self._recommend(focus, lineage, sql_text, sql_risks, investigation_id))
+
+        run.finish("completed")
+        conn.close()
+
+    def _assess_breaches(self, conn, cursor) -> list[dict]:
+        """Emits rule_breached / risk_assessed, updates RULE_STATE and returns the breaches with risk scores."""
+        # Track each rule's status for edge-triggered events
+        rule_states = load_rule_states(conn)
+        updated_states = {}
         breaches = []
-        for r in cursor.fetchall():
-            if r['score'] < r['threshold']:
+        for r in daily_rule_scores(cursor, self.date_str):
+            key = (r['rule_id'], r['tde_id'])
+            previous = rule_states.get(key)
+            breached = r['score'] < r['threshold']
+            state, change = transition(previous, "breached" if breached else "ok", self.date_str, r['score'])
+            updated_states[key] = state
+            if breached:
                 breaches.append(r)
+                if not EDGE_TRIGGERED or change == "breached":
+                    emit_event(
+                        "rule_breached", "rule", r['rule_id'], r['description'],
+                        {"score": r['score'], "threshold": r['threshold']},
+                        {"delta": r['threshold'] - r['score']},
+                        f"DQ rule breached on {r['tde_name']} (Score: {r['score']:.3f} < {r['threshold']})"
+                    )
+            elif EDGE_TRIGGERED and change == "recovered":
                 emit_event(
-                    "rule_breached", "rule", r['rule_id'], r['description'],
-                    {"score": r['score'], "threshold": r['threshold']},
-                    {"delta": r['threshold'] - r['score']},
-                    f"DQ rule breached on {r['tde_name']} (Score: {r['score']:.3f} < {r['threshold']})"
+                    "rule_recovered", "rule", r['rule_id'], r['description'],
+                    {"score": r['score'], "threshold": r['threshold'], "tde_id": r['tde_id'], "term_id": r['term_id'],
+                     "breached_since": previous['since_date'], "breached_days": previous['days_in_status']},
+                    {"margin": r['score'] - r['threshold']},
+                    f"DQ rule recovered on {r['tde_name']} (Score: {r['score']:.3f} >= {r['threshold']}) "
+                    f"after {previous['days_in_status']} day(s) in breach"
                 )
 
-        if not breaches:
-            print("No breaches today.")
-            return
-
-        # 2. Assess risk
+        # Weight each breach by its TDE's precomputed score trend
+        # (in edge-triggered mode only new breaches and significant changes are emitted)
+        trends = load_rolling_stats(conn, {b['tde_id'] for b in breaches})
         risks = []
         for b in breaches:
             delta = b['threshold'] - b['score']
-            trend_decline_factor = 1.1 
+            trend = trends.get(b['tde_id'])
+            trend_decline_factor = trend_factor(trend, delta)
             risk_score = b['criticality'] * delta * trend_decline_factor
             
             risks.append({**b, 'risk_score': risk_score})
             
-            emit_event(
-                "risk_assessed", "business_term", b['term_id'], b['term_id'],
-                {"criticality": b['criticality'], "delta": delta},
-                {"risk_score": risk_score},
-                f"Assessed risk score of {risk_score:.3f} for term {b['term_id']}"
-            )
-            
-        # 3. Select focus
-        risks.sort(key=lambda x: x['risk_score'], reverse=True)
+            state = updated_states[(b['rule_id'], b['tde_id'])]
+            if not EDGE_TRIGGERED or risk_changed(state, risk_score):
+                state['emitted_risk_score'] = risk_score
+                emit_event(
+                    "risk_assessed", "business_term", b['term_id'], b['term_id'],
+                    {"criticality": b['criticality'], "delta": delta, "tde_id": b['tde_id'],
+                     "trend": {k: trend[k] for k in ("ewma", "slope", "volatility")} if trend else None},
+                    {"risk_score": risk_score, "trend_factor": trend_decline_factor},
+                    f"Assessed risk score of {risk_score:.3f} for term {b['term_id']} (trend factor {trend_decline_factor:.2f})"
+                )
+        save_rule_states(cursor, updated_states)
+        conn.commit()
+        return risks
+
+    def _select_focus(self, risks: list[dict]) -> dict:
+        risks = sorted(risks, key=lambda x: x['risk_score'], reverse=True)
         focus = risks[0]
         
-        emit_event(
+        investigation_id = emit_event(
             "focus_selected", "business_term", focus['term_id'], focus['term_id'],
             {"highest_risk_score": focus['risk_score'], "term": focus['term_id']},
             {},
             f"Agent selected {focus['term_id']} as primary investigation focus based on risk."
         )
         
-        # 4. Start investigation
         emit_event(
             "investigation_started", "tde", focus['tde_id'], focus['tde_name'],
             {"rule_id": focus['rule_id']},
             {},
-            f"Started investigation targeting TDE {focus['tde_name']}"
+            f"Started investigation targeting TDE {focus['tde_name']}",
+            investigation_id=investigation_id
         )
-        
-        # 5. Trace lineage
-        cursor.execute('''
-            SELECT m.model_name, m.column_name
-            FROM DBT_COLUMN_MAPPING m
-            WHERE m.tde_id = ?
-        ''', (focus['tde_id'],))
-        
-        lineage = cursor.fetchone()
-        if not lineage:
+        return {**focus, 'investigation_id': investigation_id}
+
+    def _trace_lineage(self, conn, focus: dict, investigation_id: int) -> dict:
+        graph = get_lineage_graph(conn)
+        mappings = graph.mappings_by_tde.get(focus['tde_id'])
+        if not mappings:
             print("No lineage found, stopping investigation.")
-            return
+            return None
+        model_name, column_name = mappings[0]
+        # Nearest upstream models first, so the trace reads like the data flow in reverse
+        upstream = sorted(graph.upstream_of(model_name).items(), key=lambda x: (x[1], x[0]))
+        upstream_models = [table for table, _ in upstream if table in graph.models]
+        upstream_columns = [
+            f"{table}.{column}"
+            for (table, column), _ in sorted(graph.column_upstream_of(model_name, column_name).items(), key=lambda x: x[1])
+        ]
+        if self._read_model_sql(model_name) is None:
+            return None
             
-        # Read actual dbt code from disk
-        import os
-        model_path = os.path.join(os.path.dirname(__file__), "..", "models", f"{lineage['model_name']}.sql")
+        emit_event(
+            "lineage_traced", "dbt_model", model_name, model_name,
+            {"column": column_name, "upstream_models": upstream_models, "upstream_columns": upstream_columns},
+            {"upstream_depth": max((hops for _, hops in upstream), default=0)},
+            f"Traced lineage to DBT model {model_name}, column {column_name}",
+            investigation_id=investigation_id
+        )
+        return {'model_name': model_name, 'column_name': column_name}
+
+    def _read_model_sql(self, model_name: str) -> str:
+        """Actual dbt code from disk, or None when the model file is missing."""
+        model_path = os.path.join(MODELS_DIR, f"{model_name}.sql")
         try:
             with open(model_path, 'r') as f:
-                sql_text = f.read()
+                return f.read()
         except FileNotFoundError:
             print(f"Could not find actual dbt code at {model_path}")
-            return
-            
-        emit_event(
-            "lineage_traced", "dbt_model", lineage['model_name'], lineage['model_name'],
-            {"column": lineage['column_name']},
-            {},
-            f"Traced lineage to DBT model {lineage['model_name']}, column {lineage['column_name']}"
-        )
-        
-        # 6. LLM SQL Analysis
+            return None
+
+    def _analyze_sql(self, focus: dict, lineage: dict, sql_text: str, investigation_id: int) -> dict:
         inferred_type = self.llm_scanner.infer_semantic_type(lineage['column_name'], focus['description'])
         sql_risks = self.llm_scanner.analyze_sql_for_risks(sql_text)
         
@@ -188,64 +286,80 @@ class GovernanceAgent:
             "sql_analysis_completed", "dbt_model", lineage['model_name'], lineage['model_name'],
             {"inferred_semantic_type": inferred_type, "detected_risks": sql_risks},
             {"risk_count": len(sql_risks)},
-            f"LLM scanned SQL: interpreted as '{inferred_type}' semantic type. Found risks: {sql_risks}"
+            f"LLM scanned SQL: interpreted as '{inferred_type}' semantic type. Found risks: {sql_risks}",
+            investigation_id=investigation_id
         )
-        
-        # 7. Policy Check
-        gaps = self.policy_checker.check_policy_gaps(inferred_type, focus['description'])
+        return {'inferred_type': inferred_type, 'sql_risks': sql_risks}
+
+    def _check_policy(self, cursor, focus: dict, lineage: dict, inferred_type: str, investigation_id: int) -> list[str]:
+        gaps = get_coverage_gaps(
+            cursor, focus['tde_id'], focus['rule_id'], inferred_type,
+            lineage['column_name'], focus['description'], self.policy_checker
+        )
+        if gaps is None:
+            gaps = self.policy_checker.check_policy_gaps(inferred_type, focus['description'])
         if gaps:
             emit_event(
                 "policy_gap_detected", "rule", focus['rule_id'], focus['description'],
                 {"semantic_type": inferred_type, "gaps": gaps},
                 {"gap_count": len(gaps)},
-                f"Detected policy gaps for '{inferred_type}': {gaps}"
+                f"Detected policy gaps for '{inferred_type}': {gaps}",
+                investigation_id=investigation_id
             )
-            
-        # 8. Create recommendation & Raise PR
-        if gaps or sql_risks:
-            suggestion = "Add rigorous validation upstream."
-            fixed_sql = sql_text
-            
-            if "CAST detected" in str(sql_risks):
-                suggestion = f"Perform validation before CAST transformation in model {lineage['model_name']}."
-                fixed_sql = fixed_sql.replace("cast(income_str as decimal(18,2))", "income_str")
-                if fixed_sql == sql_text:
-                    fixed_sql += " -- TODO: Remove unsafe CAST"
-                    
-            if "COALESCE detected" in str(sql_risks):
-                suggestion = f"Address root cause of nulls instead of silencing with COALESCE in {lineage['model_name']}."
-                fixed_sql = fixed_sql.replace("coalesce(income_reported, '0')", "income_reported")
-                if fixed_sql == sql_text:
-                    fixed_sql += " -- TODO: Remove unsafe COALESCE"
-                    
-            if "JOIN detected" in str(sql_risks):
-                suggestion = f"Enforce distinct validation on `{lineage['column_name']}` post-join to guarantee rule isn't broken by duplicates."
-                fixed_sql = fixed_sql.replace("LEFT JOIN reference_decisions b", "LEFT JOIN (SELECT app_id, status FROM reference_decisions GROUP BY app_id, status) b")
-                if fixed_sql == sql_text:
-                    fixed_sql += " -- TODO: Deduplicate JOIN"
+        return gaps
+
+    def _recommend(self, focus: dict, lineage: dict, sql_text: str, sql_risks: list[str], investigation_id: int) -> dict:
+        suggestion = "Add rigorous validation upstream."
+        fixed_sql = sql_text
+        
+        if "CAST detected" in str(sql_risks):
+            suggestion = f"Perform validation before CAST transformation in model {lineage['model_name']}."
+            fixed_sql = fixed_sql.replace("cast(income_str as decimal(18,2))", "income_str")
+            if fixed_sql == sql_text:
+                fixed_sql += " -- TODO: Remove unsafe CAST"
                 
-            import difflib
-            diff_lines = list(difflib.unified_diff(
-                [sql_text + '\\n'],
-                [fixed_sql + '\\n'],
-                fromfile=f"a/models/{lineage['model_name']}.sql",
-                tofile=f"b/models/{lineage['model_name']}.sql",
-                n=3
-            ))
-            mock_diff = "".join(diff_lines)
+        if "COALESCE detected" in str(sql_risks):
+            suggestion = f"Address root cause of nulls instead of silencing with COALESCE in {lineage['model_name']}."
+            fixed_sql = fixed_sql.replace("coalesce(income_reported, '0')", "income_reported")
+            if fixed_sql == sql_text:
+                fixed_sql += " -- TODO: Remove unsafe COALESCE"
                 
-            # Log action to persistent memory first to get ID
-            pr_id = self.raise_pull_request(focus['tde_id'], lineage['model_name'], suggestion)
-            print(f"[{self.date_str}] Raised Pull Request against {lineage['model_name']} (PR ID: {pr_id})")
+        if "JOIN detected" in str(sql_risks):
+            suggestion = f"Enforce distinct validation on `{lineage['column_name']}` post-join to guarantee rule isn't broken by duplicates."
+            fixed_sql = fixed_sql.replace("LEFT JOIN reference_decisions b", "LEFT JOIN (SELECT app_id, status FROM reference_decisions GROUP BY app_id, status) b")
+            if fixed_sql == sql_text:
+                fixed_sql += " -- TODO: Deduplicate JOIN"
             
-            emit_event(
-                "recommendation_created", "tde", focus['tde_id'], focus['tde_name'],
-                {"suggestion": suggestion, "diff": mock_diff, "pr_id": pr_id},
-                {},
-                f"Generated pull request: {suggestion}"
-            )
-
-        conn.close()
+        import difflib
+        diff_lines = list(difflib.unified_diff(
+            [sql_text + '\\n'],
+            [fixed_sql + '\\n'],
+            fromfile=f"a/models/{lineage['model_name']}.sql",
+            tofile=f"b/models/{lineage['model_name']}.sql",
+            n=3
+        ))
+        mock_diff = "".join(diff_lines)
+        
+        # Predict the DQ impact of the fix in a sandbox before anyone merges it
+        impact = predict_impact(lineage['model_name'], fixed_sql)
+        predicted = impact['tdes'].get(focus['tde_id']) if 'error' not in impact else None
+        if predicted:
+            outlook = f" Predicted {focus['tde_id']} score {predicted['baseline']:.3f} -> {predicted['predicted']:.3f}."
+        else:
+            outlook = f" No DQ impact prediction: {impact.get('error', 'TDE not scored downstream of the model')}."
+            
+        # Log action to persistent memory first to get ID (deduplicated per date, TDE and model)
+        pr_id = self.raise_pull_request(focus['tde_id'], lineage['model_name'], suggestion, impact)
+        print(f"[{self.date_str}] Raised Pull Request against {lineage['model_name']} (PR ID: {pr_id}).{outlook}")
+        
+        emit_event(
+            "recommendation_created", "tde", focus['tde_id'], focus['tde_name'],
+            {"suggestion": suggestion, "diff": mock_diff, "pr_id": pr_id, "predicted_impact": impact},
+            {"predicted_delta": predicted['delta']} if predicted else {},
+            f"Generated pull request: {suggestion}{outlook}",
+            investigation_id=investigation_id
+        )
+        return {'pr_id': pr_id, 'suggestion': suggestion, 'predicted_impact': impact}
 
 if __name__ == "__main__":
     import sys
@@ -258,5 +372,6 @@ if __name__ == "__main__":
     current_date = base_date + timedelta(days=day_num)
     date_str = current_date.strftime("%Y-%m-%d")
     
+    init_db()
     agent = GovernanceAgent(date_str)
     agent.run_daily_agent()
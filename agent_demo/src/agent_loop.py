@@ -2,6 +2,7 @@ import random
 import sqlite3
 from datetime import datetime, timedelta
 from src.db import get_connection
+from src.dq_series import write_scores
 from src.events import emit_event
 from src.llm_scanner import LLMScanner
 from src.policy_checker import PolicyChecker
@@ -28,6 +29,7 @@ class GovernanceAgent:
         cursor.execute("SELECT tde_id, name FROM TDE")
         tdes = cursor.fetchall()
         
+        scores = []
         for tde in tdes:
             base_score = 0.85
             # Add improvement if a fix was applied
@@ -40,11 +42,10 @@ class GovernanceAgent:
                 # Fluctuate naturally
                 score = max(0.0, min(1.0, base_score + random.uniform(-0.1, 0.1)))
                 
-            cursor.execute('''
-                INSERT OR REPLACE INTO DQ_SCORES (date, tde_id, score) 
-                VALUES (?, ?, ?)
-            ''', (current_date_str, tde['tde_id'], score))
+            scores.append((current_date_str, tde['tde_id'], score))
             
+        # Insert, updating the packed series, rollups and rolling stats in the same transaction
+        write_scores(cursor, scores)
         conn.commit()
         conn.close()
 
@@ -205,7 +206,15 @@ class GovernanceAgent:
         conn.commit()
         conn.close()
 
-def run_simulation(days=30):
+def run_simulation(days=30, seeds=None):
+    """
+    Steps one run day by day through SQLite. With `seeds`, runs the vectorized
+    Monte Carlo engine instead and returns its aggregate statistics.
+    """
+    if seeds:
+        from src.monte_carlo import run_monte_carlo
+        return run_monte_carlo(seeds=seeds, days=days)
+
     agent = GovernanceAgent()
     base_date = datetime.now()
     
@@ -0,0 +1,61 @@
+import json
+from datetime import datetime
+from src.db import get_connection
+
+class AgentRun:
+    """
+    Checkpoints of one daily agent run. Every completed stage is stored with its
+    result; a later attempt at the same date returns the stored result instead of
+    running the stage again, so the run resumes after the last completed stage.
+    """
+
+    def __init__(self, date_str: str):
+        self.date_str = date_str
+        self.run_id = f"agent:{date_str}"
+        now = datetime.utcnow().isoformat()
+        conn = get_connection()
+        with conn:
+            conn.execute('''
+                INSERT OR IGNORE INTO AGENT_RUNS (run_id, date, status, started_at, updated_at)
+                VALUES (?, ?, 'running', ?, ?)
+            ''', (self.run_id, date_str, now, now))
+        self.status = conn.execute("SELECT status FROM AGENT_RUNS WHERE run_id = ?", (self.run_id,)).fetchone()[0]
+        self.results = {
+            row[0]: json.loads(row[1])
+            for row in conn.execute("SELECT stage, result FROM AGENT_RUN_STAGES WHERE run_id = ?", (self.run_id,))
+        }
+        conn.close()
+
+    @property
+    def completed(self) -> bool:
+        return self.status == 'completed'
+
+    def stage(self, name: str, fn):
+        """Result of stage `name`: stored by an earlier attempt, or computed by fn() now and stored."""
+        if name in self.results:
+            print(f"[{self.date_str}] Stage '{name}' already completed, resuming after it.")
+            return self.results[name]
+        # Round-tripped, so a first attempt sees exactly what a resumed one would
+        encoded = json.dumps(fn())
+        now = datetime.utcnow().isoformat()
+        conn = get_connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO AGENT_RUN_STAGES (run_id, stage, result, completed_at) VALUES (?, ?, ?, ?)",
+                (self.run_id, name, encoded, now)
+            )
+            conn.execute("UPDATE AGENT_RUNS SET updated_at = ? WHERE run_id = ?", (now, self.run_id))
+        conn.close()
+        self.results[name] = json.loads(encoded)
+        return self.results[name]
+
+    def finish(self, outcome: str):
+        now = datetime.utcnow().isoformat()
+        conn = get_connection()
+        with conn:
+            conn.execute(
+                "UPDATE AGENT_RUNS SET status = 'completed', outcome = ?, updated_at = ?, completed_at = ? WHERE run_id = ?",
+                (outcome, now, now, self.run_id)
+            )
+        conn.close()
+        self.status = 'completed'
@@ -0,0 +1,317 @@
+import difflib
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Synthetic catalog at scale factor 1; terms, TDEs and models grow linearly with
+# the factor, days of history too but capped at a year
+BASE_SCALE = {"terms": 10, "tdes": 40, "models": 12, "days": 30}
+DEFAULT_FACTORS = (1, 4, 16)
+REPEATS = 3
+# A timing regresses when it is this much slower than the baseline (0.5 = 50%)
+# and by more than the noise floor
+TOLERANCE = float(os.environ.get("STEWARD_BENCH_TOLERANCE", "0.5"))
+NOISE_FLOOR_S = 0.02
+
+AGENT_DEMO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(AGENT_DEMO_DIR, "benchmarks")
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+BACKEND_DIR = os.path.join(os.path.dirname(AGENT_DEMO_DIR), "agent_ui", "backend")
+BACKEND_ENDPOINTS = (
+    "/events", "/events?start=2026-01-10&end=2026-01-11", "/investigations", "/investigations/{investigation_id}", "/latest_state",
+    "/learning_summary", "/policy_coverage", "/llm_usage", "/heatmap?bucket=day",
+    "/heatmap?bucket=week", "/heatmap?bucket=month", "/shards"
+)
+BASE_DATE = datetime(2026, 1, 1)
+
+def scale_params(factor: int) -> dict:
+    params = {key: value * factor for key, value in BASE_SCALE.items()}
+    params["days"] = min(365, params["days"])
+    return params
+
+def _timed(fn, repeats: int) -> dict:
+    """Median and first (cold) wall-clock seconds of `repeats` calls of fn(i)."""
+    runs = []
+    for i in range(repeats):
+        started = time.perf_counter()
+        fn(i)
+        runs.append(time.perf_counter() - started)
+    return {"seconds": statistics.median(runs), "cold_seconds": runs[0], "runs": len(runs)}
+
+def _mcp_timings(workdir: str, env: dict, repeats: int, tde_id: str, model_name: str, diff_text: str) -> dict:
+    """Round trips through a real MCP server process over stdio, from request written to response read."""
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "src.mcp_server"], cwd=workdir, env=env,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, bufsize=1
+    )
+    next_id = [0]
+
+    def call(method, params=None):
+        next_id[0] += 1
+        proc.stdin.write(json.dumps({"jsonrpc": "2.0", "id": next_id[0], "method": method, "params": params or {}}) + "\n")
+        proc.stdin.flush()
+        # Progress notifications carry no id; skip them
+        while True:
+            line = proc.stdout.readline()
+            if not line:
+                raise RuntimeError(f"MCP server exited during {method}")
+            response = json.loads(line)
+            if response.get("id") == next_id[0]:
+                if "error" in response:
+                    raise RuntimeError(f"MCP {method} failed: {response['error']}")
+                return response
+
+    tool_calls = {
+        "lineage_of": {"entity": model_name},
+        "dq_history": {"tde_id": tde_id, "days": 30},
+        "open_recommendations": {},
+        "review_changeset": {
+            "pr_title": "Benchmark: widen model", "changeset_type": "code",
+            "changed_entity": model_name, "diff_text": diff_text
+        }
+    }
+    timings = {}
+    try:
+        timings["mcp.initialize"] = _timed(lambda i: call("initialize"), 1)
+        timings["mcp.tools_list"] = _timed(lambda i: call("tools/list"), repeats)
+        for tool, args in tool_calls.items():
+            timings[f"mcp.{tool}"] = _timed(lambda i: call("tools/call", {"name": tool, "arguments": args}), repeats)
+    finally:
+        proc.stdin.close()
+        proc.wait(timeout=60)
+    return timings
+
+def _backend_timings(repeats: int) -> tuple:
+    """(timings, reason skipped) for every dashboard endpoint, served in-process by the FastAPI app."""
+    if not os.path.isdir(BACKEND_DIR):
+        return {}, f"backend not found at {BACKEND_DIR}"
+    sys.path.insert(0, BACKEND_DIR)
+    try:
+        import main as backend
+        from fastapi.testclient import TestClient
+    except ImportError as e:
+        return {}, f"backend dependencies missing: {e}"
+
+    client = TestClient(backend.app)
+    page = client.get("/investigations?limit=1").json()
+    investigation_id = page["investigations"][0]["id"] if page.get("investigations") else 0
+
+    def get(path):
+        response = client.get(path)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {path} returned {response.status_code}")
+
+    timings = {}
+    for endpoint in BACKEND_ENDPOINTS:
+        path = endpoint.format(investigation_id=investigation_id)
+        timings[f"backend {endpoint}"] = _timed(lambda i: get(path), repeats)
+    return timings, None
+
+def run_scale(factor: int, workdir: str, repeats: int = REPEATS) -> dict:
+    """
+    Benchmarks one scale factor against a fresh database in `workdir`. Runs in its own
+    process, started by run_benchmarks with STEWARD_DB_PATH and STEWARD_MODELS_DIR
+    pointing into `workdir`, so the src modules below bind to that database.
+    """
+    from src.agent import GovernanceAgent
+    from src.db import get_connection, init_db
+    from src.pipeline import run_pipeline
+    from src.retention import RETENTION_DAYS, archive_events
+    from src.reviewer import CodeReviewer
+    from src.state_snapshots import write_state_snapshots
+    from src.synthetic_catalog import populate_synthetic_catalog
+    from src.whatif import predict_diff_impact, predict_impact
+
+    params = scale_params(factor)
+    result = {"factor": factor, "params": params, "timings": {}, "skipped": {}}
+    timings = result["timings"]
+
+    # 1. Catalog and history
+    init_db()
+    started = time.perf_counter()
+    result["catalog"] = populate_synthetic_catalog(**params)
+    timings["generate_catalog"] = {"seconds": time.perf_counter() - started, "cold_seconds": None, "runs": 1}
+
+    # 2. Daily pipeline and agent, one new day per repeat
+    days = params["days"]
+    timings["run_pipeline"] = _timed(lambda i: run_pipeline(days + 1 + i), repeats)
+    timings["run_daily_agent"] = _timed(
+        lambda i: GovernanceAgent((BASE_DATE + timedelta(days=days + 1 + i)).strftime("%Y-%m-%d")).run_daily_agent(),
+        repeats
+    )
+
+    # 3. Retention as the nightly job runs it: state snapshots, then the events older than
+    # RETENTION_DAYS on the synthetic calendar move to the archive the dashboard reads from
+    started = time.perf_counter()
+    write_state_snapshots()
+    timings["write_state_snapshots"] = {"seconds": time.perf_counter() - started, "cold_seconds": None, "runs": 1}
+    cutoff = BASE_DATE + timedelta(days=days - RETENTION_DAYS)
+    started = time.perf_counter()
+    result["archived"] = archive_events((datetime.utcnow() - cutoff).days)
+    timings["archive_events"] = {"seconds": time.perf_counter() - started, "cold_seconds": None, "runs": 1}
+
+    # 4. Reviews of a change to an upstream synthetic model and of a policy. The change drops the model's COALESCE, as the agent would propose,
+    # and goes in as a real unified diff so the review predicts its impact.
+    conn = get_connection()
+    model_name, model_sql = conn.execute(
+        "SELECT model_name, sql_text FROM DBT_SQL_MODELS WHERE model_name LIKE 'syn_bronze_%' ORDER BY 1"
+    ).fetchone()
+    term_id, tde_id = conn.execute(
+        "SELECT business_term_id, tde_id FROM TDE WHERE tde_id LIKE 'TDE_S%' ORDER BY tde_id"
+    ).fetchone()
+    conn.close()
+    proposed_sql = model_sql.replace("coalesce(income_reported, '0')", "income_reported")
+    diff_text = "".join(difflib.unified_diff(
+        [model_sql + "\n"], [proposed_sql + "\n"],
+        fromfile=f"a/models/{model_name}.sql", tofile=f"b/models/{model_name}.sql"
+    ))
+    reviewer = CodeReviewer()
+    timings["review_changeset code"] = _timed(lambda i: reviewer.review_changeset(
+        "Benchmark: drop coalesce upstream", "code", model_name, diff_text
+    ), repeats)
+    timings["review_changeset policy"] = _timed(lambda i: reviewer.review_changeset(
+        "Benchmark: tighten threshold", "policy", term_id, "threshold: changed from 0.95 to 0.99"
+    ), repeats)
+
+    # 5. What-if of the same change, rebuilding the model's whole downstream chain
+    timings["predict_impact"] = _timed(lambda i: predict_impact(model_name, proposed_sql), repeats)
+    # A what-if that fails returns at once; make sure the timings above measured real work
+    impact = predict_diff_impact(model_name, diff_text)
+    if "error" in impact or not impact["tdes"]:
+        raise RuntimeError(f"What-if of {model_name} scored nothing: {impact.get('error')}")
+    result["whatif"] = {"changed_models": len(impact["changed_models"]), "tdes": len(impact["tdes"])}
+
+    # 6. MCP round trips and backend endpoints
+    timings.update(_mcp_timings(workdir, dict(os.environ), repeats, tde_id, model_name, diff_text))
+    backend, skipped = _backend_timings(repeats)
+    timings.update(backend)
+    if skipped:
+        result["skipped"]["backend"] = skipped
+    return result
+
+def _worker_env(workdir: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "STEWARD_DB_PATH": os.path.join(workdir, "governance.db"),
+        "STEWARD_MODELS_DIR": os.path.join(workdir, "models"),
+        "STEWARD_SHARDING": "off",
+        "PYTHONPATH": os.pathsep.join(p for p in (AGENT_DEMO_DIR, env.get("PYTHONPATH")) if p)
+    })
+    # Never time (or pay for) real LLM calls
+    env.pop("GEMINI_API_KEY", None)
+    return env
+
+def run_benchmarks(factors=DEFAULT_FACTORS, repeats: int = REPEATS, keep: bool = False) -> dict:
+    """Runs every scale factor in a fresh process and database; returns the combined results."""
+    results = {
+        "created_at": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeats": repeats,
+        "env": {k: v for k, v in sorted(os.environ.items()) if k.startswith("STEWARD_")},
+        "scales": {}
+    }
+    for factor in factors:
+        workdir = tempfile.mkdtemp(prefix=f"steward_bench_{factor}_")
+        print(f"Scale {factor}: {scale_params(factor)} in {workdir}")
+        try:
+            proc = subprocess.run(
+                [sys.executable, "-m", "src.benchmark", "--worker", str(factor), workdir, str(repeats)],
+                cwd=workdir, env=_worker_env(workdir),
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+            )
+            if proc.returncode != 0:
+                results["scales"][str(factor)] = {"factor": factor, "error": proc.stderr.strip().splitlines()[-1:]}
+                print(f"Scale {factor} failed:\n{proc.stderr}")
+                continue
+            with open(os.path.join(workdir, "result.json")) as f:
+                results["scales"][str(factor)] = json.load(f)
+        finally:
+            if not keep:
+                shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def find_regressions(results: dict, baseline: dict, tolerance: float = TOLERANCE) -> list[dict]:
+    """Timings slower than the baseline's same scale and operation by more than tolerance and the noise floor."""
+    regressions = []
+    for scale, current in results["scales"].items():
+        base = baseline.get("scales", {}).get(scale, {}).get("timings", {})
+        for operation, timing in current.get("timings", {}).items():
+            if operation not in base:
+                continue
+            now, then = timing["seconds"], base[operation]["seconds"]
+            if now > then * (1 + tolerance) and now - then > NOISE_FLOOR_S:
+                regressions.append({
+                    "scale": scale, "operation": operation,
+                    "baseline_s": then, "current_s": now, "ratio": now / then if then else None
+                })
+    return regressions
+
+def print_report(results: dict, baseline: dict = None):
+    for scale, result in results["scales"].items():
+        if "error" in result:
+            print(f"\nScale {scale}: FAILED {result['error']}")
+            continue
+        print(f"\nScale {scale} {json.dumps(result['catalog'])}")
+        base = (baseline or {}).get("scales", {}).get(scale, {}).get("timings", {})
+        for operation, timing in result["timings"].items():
+            line = f"  {operation:<40} {timing['seconds'] * 1000:10.1f} ms"
+            if operation in base and base[operation]["seconds"]:
+                line += f"   x{timing['seconds'] / base[operation]['seconds']:.2f} vs baseline"
+            print(line)
+        for part, reason in result.get("skipped", {}).items():
+            print(f"  {part} skipped: {reason}")
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args and args[0] == "--worker":
+        factor, workdir, repeats = int(args[1]), args[2], int(args[3])
+        result = run_scale(factor, workdir, repeats)
+        with open(os.path.join(workdir, "result.json"), "w") as f:
+            json.dump(result, f, indent=2)
+        sys.exit(0)
+    if "--help" in args:
+        print("Usage: python -m src.benchmark [--scales 1,4,16] [--repeats N] [--tolerance 0.5] "
+              "[--baseline <path>] [--out <path>] [--save-baseline] [--keep]")
+        sys.exit(0)
+
+    def option(name, default):
+        return args[args.index(name) + 1] if name in args else default
+
+    factors = [int(f) for f in option("--scales", ",".join(map(str, DEFAULT_FACTORS))).split(",")]
+    baseline_path = option("--baseline", BASELINE_PATH)
+    tolerance = float(option("--tolerance", TOLERANCE))
+    results = run_benchmarks(factors, int(option("--repeats", REPEATS)), keep="--keep" in args)
+
+    out_path = option("--out", os.path.join(RESULTS_DIR, f"results_{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json"))
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    with open(out_path, "w") as f:
+        json.dump(results, f, indent=2)
+
+    baseline = None
+    if "--save-baseline" in args:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, "w") as f:
+            json.dump(results, f, indent=2)
+    elif os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+    print(f"\nResults written to {out_path}")
+    if "--save-baseline" in args:
+        print(f"Baseline saved to {baseline_path}")
+
+    failed = [scale for scale, result in results["scales"].items() if "error" in result]
+    regressions = find_regressions(results, baseline, tolerance) if baseline else []
+    for r in regressions:
+        print(f"REGRESSION scale {r['scale']} {r['operation']}: "
+              f"{r['baseline_s'] * 1000:.1f} ms -> {r['current_s'] * 1000:.1f} ms (x{r['ratio']:.2f})")
+    sys.exit(1 if regressions or failed else 0)
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import zlib
+
+# String values in an event's context longer than this (in bytes) move to BLOBS;
+# a reference costs about 90 bytes, so shorter strings stay inline
+BLOB_THRESHOLD = 128
+BLOB_KEY = "$blob"
+
+def put_blob(cursor, text: str) -> str:
+    """Stores text compressed under its SHA-256 and returns the hash; identical content is stored once."""
+    data = text.encode('utf-8')
+    digest = hashlib.sha256(data).hexdigest()
+    cursor.execute(
+        "INSERT OR IGNORE INTO BLOBS (hash, data, size) VALUES (?, ?, ?)",
+        (digest, zlib.compress(data), len(data))
+    )
+    return digest
+
+def get_blobs(cursor, hashes) -> dict[str, str]:
+    """hash -> text for the given hashes, in one query."""
+    hashes = list(set(hashes))
+    if not hashes:
+        return {}
+    cursor.execute(
+        f"SELECT hash, data FROM BLOBS WHERE hash IN ({','.join('?' * len(hashes))})",
+        hashes
+    )
+    return {row[0]: zlib.decompress(row[1]).decode('utf-8') for row in cursor.fetchall()}
+
+def externalize(cursor, value):
+    """
+    Copy of a JSON-able value with every long string replaced by a
+    {"$blob": hash, "size": bytes} reference to BLOBS.
+    """
+    if isinstance(value, str):
+        size = len(value.encode('utf-8'))
+        if size > BLOB_THRESHOLD:
+            return {BLOB_KEY: put_blob(cursor, value), "size": size}
+        return value
+    if isinstance(value, dict):
+        return {k: externalize(cursor, v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [externalize(cursor, v) for v in value]
+    return value
+
+def _is_ref(value) -> bool:
+    return isinstance(value, dict) and BLOB_KEY in value
+
+def _collect_refs(value, found):
+    if _is_ref(value):
+        found.add(value[BLOB_KEY])
+    elif isinstance(value, dict):
+        for v in value.values():
+            _collect_refs(v, found)
+    elif isinstance(value, list):
+        for v in value:
+            _collect_refs(v, found)
+    return found
+
+def resolve(cursor, value):
+    """Replaces blob references in a value with their content (one query for all of them)."""
+    blobs = get_blobs(cursor, _collect_refs(value, set()))
+
+    def substitute(v):
+        if _is_ref(v):
+            return blobs.get(v[BLOB_KEY], v)
+        if isinstance(v, dict):
+            return {k: substitute(x) for k, x in v.items()}
+        if isinstance(v, list):
+            return [substitute(x) for x in v]
+        return v
+    return substitute(value)
+
+def migrate_event_payloads(cursor, batch_size: int = 500) -> int:
+    """
+    Moves long strings in existing EVENT_LOG contexts into BLOBS, rewriting the
+    rows in place. Only rows whose context is longer than the threshold can hold
+    such a string, so the rest are never decoded. Returns the number of rows rewritten.
+    """
+    rewritten = 0
+    last_id = 0
+    while True:
+        cursor.execute('''
+            SELECT event_id, context FROM EVENT_LOG
+            WHERE event_id > ? AND length(context) > ?
+            ORDER BY event_id LIMIT ?
+        ''', (last_id, BLOB_THRESHOLD, batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            return rewritten
+        updates = []
+        for event_id, context in rows:
+            last_id = event_id
+            try:
+                parsed = json.loads(context)
+            except ValueError:
+                continue
+            compact = json.dumps(externalize(cursor, parsed))
+            if compact != context:
+                updates.append((compact, event_id))
+        cursor.executemany("UPDATE EVENT_LOG SET context = ? WHERE event_id = ?", updates)
+        rewritten += len(updates)
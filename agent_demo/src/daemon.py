@@ -0,0 +1,285 @@
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from src.agent import GovernanceAgent
+from src.db import get_connection, get_table_versions, init_db
+from src.lineage_extractor import extract_lineage
+from src.llm_scanner import LLMScanner
+from src.mock_data import populate_mock_data
+from src.pipeline import assess_actual_dq_scores, generate_bronze_data, run_dbt_models
+from src.policy_checker import PolicyChecker
+from src.shards import DEFAULT_DOMAIN, get_shard_connection
+from src.state_snapshots import write_state_snapshots
+
+# Day numbers count from here, as in `python -m src.pipeline N` / `python -m src.agent N`
+BASE_DATE = datetime(2026, 1, 1)
+POLL_SECONDS = float(os.environ.get("STEWARD_DAEMON_POLL_SECONDS", "5"))
+# A lease not renewed for this long is free for another instance to take over
+LEASE_SECONDS = 60.0
+LEASE_NAME = "steward_daemon"
+
+# Stages in processing order; each watermark is the last date the stage completed.
+# Pipeline stages are tracked per domain; the agent, which reads the scores of
+# every domain, once (under domain '').
+PIPELINE_STAGES = ("ingested", "scored")
+STAGES = PIPELINE_STAGES + ("agent",)
+
+def day_to_date(day: int) -> str:
+    return (BASE_DATE + timedelta(days=day)).strftime("%Y-%m-%d")
+
+def date_to_day(date_str: str) -> int:
+    return (datetime.strptime(date_str, "%Y-%m-%d") - BASE_DATE).days
+
+def _mark_domain(stage: str, domain: str) -> str:
+    return domain if stage in PIPELINE_STAGES else ''
+
+def lease_name(stage: str, domain: str = DEFAULT_DOMAIN) -> str:
+    """Each domain's pipeline has its own lease, so domains run side by side; the agent has one."""
+    return f"{LEASE_NAME}:pipeline:{domain}" if stage in PIPELINE_STAGES else f"{LEASE_NAME}:agent"
+
+def get_watermarks(conn, domain: str = DEFAULT_DOMAIN) -> dict:
+    """The domain's pipeline watermarks and the global agent watermark."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT domain, stage, value FROM PIPELINE_WATERMARKS WHERE domain IN (?, '')", (domain,))
+    marks = {(row[0], row[1]): row[2] for row in cursor.fetchall()}
+    return {stage: marks.get((_mark_domain(stage, domain), stage)) for stage in STAGES}
+
+def _table_exists(conn, name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+def seed_watermarks(conn, domain: str = DEFAULT_DOMAIN):
+    """
+    Gives a database that predates the daemon its starting watermarks: the latest
+    ingested date in the domain's landing table and, as DQ_SCORES is shared by all
+    domains, the latest scored date no later than that; for the agent the latest
+    date whose run completed (AGENT_RUNS). Without completed runs the agent mark
+    stays unset and the agent visits every scored day, where AgentRun skips the
+    ones already done. Only domains that have landed data get pipeline marks
+    (databases from before domains were registered hold the default domain's).
+    Existing marks win.
+    """
+    scored = conn.execute("SELECT max(date) FROM DQ_SCORES").fetchone()[0]
+    agent = conn.execute("SELECT max(date) FROM AGENT_RUNS WHERE status = 'completed'").fetchone()[0]
+    landed = domain == DEFAULT_DOMAIN or conn.execute(
+        "SELECT 1 FROM SHARD_TABLES WHERE domain = ? AND kind = 'landing'", (domain,)
+    ).fetchone() is not None
+    ingested = None
+    if landed:
+        shard = get_shard_connection(domain)
+        ingested = shard.execute("SELECT max(ingest_date) FROM main.ext_application_source").fetchone()[0] \
+            if _table_exists(shard, "ext_application_source") else None
+        shard.close()
+    domain_scored = min(scored, ingested) if scored and ingested else None
+    now = datetime.utcnow().isoformat()
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO PIPELINE_WATERMARKS (domain, stage, value, updated_at) VALUES (?, ?, ?, ?)",
+            [(_mark_domain(stage, domain), stage, value, now)
+             for stage, value in (("ingested", ingested), ("scored", domain_scored), ("agent", agent)) if value]
+        )
+
+def registered_domains(conn) -> set:
+    """Domains with a pipeline: registered in DATA_SHARDS or holding pipeline watermarks."""
+    return {row[0] for row in conn.execute(
+        "SELECT domain FROM DATA_SHARDS UNION SELECT domain FROM PIPELINE_WATERMARKS WHERE domain != ''"
+    ).fetchall()}
+
+def agent_ready_upto(conn) -> str:
+    """
+    The latest date every registered domain has scored. The agent reads the scores
+    of all domains, so a date is only ready once none of them is still missing it;
+    None while some domain has scored nothing yet.
+    """
+    domains = registered_domains(conn)
+    scored = dict(conn.execute("SELECT domain, value FROM PIPELINE_WATERMARKS WHERE stage = 'scored'").fetchall())
+    if not domains or not domains.issubset(scored):
+        return None
+    return min(scored[domain] for domain in domains)
+
+def acquire_lease(conn, owner: str, seconds: float = LEASE_SECONDS, name: str = LEASE_NAME) -> bool:
+    """Takes or renews the lease; fails while another owner holds an unexpired one."""
+    now = time.time()
+    with conn:
+        conn.execute('''
+            INSERT INTO DAEMON_LEASES (name, owner, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+            WHERE DAEMON_LEASES.owner = excluded.owner OR DAEMON_LEASES.expires_at < ?
+        ''', (name, owner, now + seconds, now))
+    row = conn.execute("SELECT owner FROM DAEMON_LEASES WHERE name = ?", (name,)).fetchone()
+    return row is not None and row[0] == owner
+
+def release_lease(conn, owner: str, name: str = LEASE_NAME):
+    with conn:
+        conn.execute("DELETE FROM DAEMON_LEASES WHERE name = ? AND owner = ?", (name, owner))
+
+def advance_watermark(conn, stage: str, value: str, owner: str, domain: str = DEFAULT_DOMAIN) -> bool:
+    """
+    Moves a stage's watermark forward, but only while `owner` still holds the stage's
+    lease, so an instance that lost it can never record work over its successor's.
+    """
+    with conn:
+        cursor = conn.execute('''
+            INSERT INTO PIPELINE_WATERMARKS (domain, stage, value, updated_at)
+            SELECT ?, ?, ?, ? WHERE EXISTS (
+                SELECT 1 FROM DAEMON_LEASES WHERE name = ? AND owner = ? AND expires_at >= ?
+            )
+            ON CONFLICT(domain, stage) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+            WHERE excluded.value > PIPELINE_WATERMARKS.value
+        ''', (_mark_domain(stage, domain), stage, value, datetime.utcnow().isoformat(),
+              lease_name(stage, domain), owner, time.time()))
+    return cursor.rowcount > 0
+
+class StewardDaemon:
+    """
+    Keeps the pipeline and the agent running in one warm process. Scanner, policy
+    checker and their caches live across days; per-stage watermarks in the DB say
+    what is done, so the daemon resumes (and catches up) wherever it stopped. Only
+    the instance holding a domain's pipeline lease runs that pipeline, and only the
+    one holding the agent lease runs the agent, so daemons for several domains can
+    run side by side.
+    """
+
+    def __init__(self, until_day: int = None, run_pipeline: bool = True, poll_seconds: float = POLL_SECONDS,
+                 domain: str = DEFAULT_DOMAIN):
+        self.until_day = until_day
+        self.domain = domain
+        self.run_pipeline = run_pipeline
+        self.poll_seconds = poll_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.llm_scanner = LLMScanner()
+        self.policy_checker = PolicyChecker()
+        self.conn = get_connection()
+        self._scores_version = None
+        for registered in registered_domains(self.conn) | {domain}:
+            seed_watermarks(self.conn, registered)
+
+    def target_day(self) -> int:
+        """The latest day to ingest: today on the simulated calendar, or until_day."""
+        today = (datetime.utcnow() - BASE_DATE).days
+        return today if self.until_day is None else min(today, self.until_day)
+
+    def _holds_lease(self, stage: str) -> bool:
+        return acquire_lease(self.conn, self.owner, name=lease_name(stage, self.domain))
+
+    def ingest_and_score(self, day: int) -> bool:
+        """Runs the domain's pipeline for one day, advancing 'ingested' then 'scored'."""
+        date_str = day_to_date(day)
+        conn = get_shard_connection(self.domain)
+        try:
+            marks = get_watermarks(self.conn, self.domain)
+            if not marks["ingested"] or marks["ingested"] < date_str:
+                # A run that died before its watermark may have left part of the day behind
+                if _table_exists(conn, "ext_application_source"):
+                    conn.execute("DELETE FROM main.ext_application_source WHERE ingest_date = ?", (date_str,))
+                generate_bronze_data(conn, day, date_str, self.domain)
+                if not advance_watermark(self.conn, "ingested", date_str, self.owner, self.domain):
+                    return False
+                print(f"[{date_str}] Bronze data ingested.")
+
+            extract_lineage()
+            models = run_dbt_models(conn, self.domain)
+            assess_actual_dq_scores(conn, date_str, models)
+            print(f"[{date_str}] DQ scores computed.")
+        finally:
+            conn.close()
+        return advance_watermark(self.conn, "scored", date_str, self.owner, self.domain)
+
+    def pending_agent_dates(self) -> list[str]:
+        """
+        Dates with DQ scores (from the daemon or a manual pipeline run) the agent has
+        not processed, up to the last date every domain has scored.
+        """
+        agent_mark = get_watermarks(self.conn, self.domain)["agent"]
+        ready = agent_ready_upto(self.conn)
+        if ready is None:
+            return []
+        cursor = self.conn.execute(
+            "SELECT DISTINCT date FROM DQ_SCORES WHERE (? IS NULL OR date > ?) AND date <= ? ORDER BY date",
+            (agent_mark, agent_mark, ready)
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+    def run_agent(self, date_str: str) -> bool:
+        GovernanceAgent(date_str, llm_scanner=self.llm_scanner, policy_checker=self.policy_checker).run_daily_agent()
+        return advance_watermark(self.conn, "agent", date_str, self.owner, self.domain)
+
+    def run_pending_agent(self) -> int:
+        """
+        Runs the agent for every pending date, as soon as new scores are there (a
+        changed DQ_SCORES counter) and every domain has scored them, then persists the
+        dashboard's state snapshots for the events just written. Only runs while the
+        agent lease is held. Returns the number of agent runs done.
+        """
+        if not self._holds_lease("agent"):
+            return 0
+        version = (get_table_versions(self.conn, ('DQ_SCORES',)), agent_ready_upto(self.conn))
+        if version == self._scores_version:
+            return 0
+        ran = 0
+        for date_str in self.pending_agent_dates():
+            if not self._holds_lease("agent") or not self.run_agent(date_str):
+                return ran
+            ran += 1
+        self._scores_version = version
+        if ran:
+            write_state_snapshots()
+        return ran
+
+    def tick(self) -> int:
+        """
+        One scheduling pass: ingest and score every missing day of the domain up to
+        the target, running the agent after each one, then run the agent for any other
+        day all domains have scored that it has not seen. Each part only runs while its
+        lease is held. Returns the number of stage runs done.
+        """
+        done = 0
+
+        # 1. Pipeline catch-up, oldest day first. The agent follows each day, so its
+        # predictions for a day read that day's tables rather than the last day's.
+        if self.run_pipeline and self._holds_lease("scored"):
+            scored = get_watermarks(self.conn, self.domain)["scored"]
+            first = date_to_day(scored) + 1 if scored else 1
+            for day in range(first, self.target_day() + 1):
+                if not self._holds_lease("scored") or not self.ingest_and_score(day):
+                    break
+                done += 1 + self.run_pending_agent()
+
+        # 2. Agent, for days scored elsewhere (other domains, manual pipeline runs)
+        return done + self.run_pending_agent()
+
+    def run(self, once: bool = False):
+        print(f"Steward daemon {self.owner} started.")
+        try:
+            while True:
+                done = self.tick()
+                if once and done == 0:
+                    break
+                if done == 0:
+                    time.sleep(self.poll_seconds)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for stage in ("scored", "agent"):
+                release_lease(self.conn, self.owner, lease_name(stage, self.domain))
+            self.conn.close()
+            print(f"Steward daemon {self.owner} stopped.")
+
+if __name__ == "__main__":
+    import sys
+
+    args = sys.argv[1:]
+    if "--help" in args:
+        print("Usage: python -m src.daemon [--once] [--agent-only] [--until <day_number>] [--domain <domain>]")
+        sys.exit(0)
+
+    init_db()
+    conn = get_connection()
+    if conn.execute("SELECT count(*) FROM BUSINESS_TERMS").fetchone()[0] == 0:
+        populate_mock_data()
+    conn.close()
+
+    until = int(args[args.index("--until") + 1]) if "--until" in args else None
+    domain = args[args.index("--domain") + 1] if "--domain" in args else DEFAULT_DOMAIN
+    StewardDaemon(until_day=until, run_pipeline="--agent-only" not in args, domain=domain).run(once="--once" in args)
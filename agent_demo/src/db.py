@@ -1,8 +1,25 @@
 import sqlite3
 import os
 import json
+from datetime import datetime
+from src.blobs import migrate_event_payloads
+from src.dq_series import rebuild_series
+from src.rolling_stats import rebuild_rolling_stats
 
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "governance.db")
+DB_PATH = os.environ.get(
+    "STEWARD_DB_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "governance.db")
+)
+# Where landing and model tables live: 'off' (in this database), 'warehouse' or 'domain' (see src/shards.py)
+SHARDING = os.environ.get("STEWARD_SHARDING", "off")
+# Business domain a pipeline or daemon works on unless told otherwise
+DEFAULT_DOMAIN = os.environ.get("STEWARD_DOMAIN", "loans")
+
+# Tables whose writes bump a counter in TABLE_VERSIONS, so in-process caches
+# can detect changes with a single primary-key lookup instead of rescanning.
+VERSIONED_TABLES = [
+    'DBT_COLUMN_MAPPING', 'DBT_SQL_MODELS', 'COLUMN_LINEAGE',
+    'DQ_SCORES', 'AGENT_MEMORY', 'TDE', 'BUSINESS_TERMS', 'RULES', 'EVENT_LOG'
+]
 
 def get_connection():
     conn = sqlite3.connect(DB_PATH)
@@ -12,6 +29,10 @@ def get_connection():
 def init_db():
     conn = get_connection()
     cursor = conn.cursor()
+    if SHARDING != 'off':
+        # Pipelines write their shards while the agent writes here; with WAL, readers
+        # attached from a shard never block the agent's commits
+        cursor.execute("PRAGMA journal_mode=WAL")
     
     cursor.executescript('''
         CREATE TABLE IF NOT EXISTS BUSINESS_TERMS(
@@ -56,6 +77,23 @@ def init_db():
             sql_text TEXT
         );
         
+        -- Scoring checks of TDEs beyond the loan journey's built-in ones (DQ_CHECKS in
+        -- src/pipeline.py): the model the TDE is measured on and the condition of a valid row
+        CREATE TABLE IF NOT EXISTS TDE_CHECKS(
+            tde_id TEXT PRIMARY KEY,
+            table_name TEXT,
+            condition TEXT,      -- SQL boolean expression over the table's columns
+            FOREIGN KEY (tde_id) REFERENCES TDE(tde_id)
+        );
+        
+        -- Business domain whose pipeline builds (and scores) a model; models without a
+        -- row belong to the default domain (STEWARD_DOMAIN)
+        CREATE TABLE IF NOT EXISTS MODEL_DOMAINS(
+            model_name TEXT PRIMARY KEY,
+            domain TEXT,
+            FOREIGN KEY (model_name) REFERENCES DBT_SQL_MODELS(model_name)
+        );
+        
         CREATE TABLE IF NOT EXISTS EVENT_LOG(
             event_id INTEGER PRIMARY KEY AUTOINCREMENT,
             timestamp TEXT,
@@ -65,7 +103,8 @@ def init_db():
             entity_name TEXT,
             context TEXT,        -- JSON string
             metrics TEXT,        -- JSON string
-            explanation TEXT
+            explanation TEXT,
+            investigation_id INTEGER -- event_id of the focus_selected event that opened it
         );
         
         CREATE TABLE IF NOT EXISTS AGENT_MEMORY(
@@ -75,12 +114,320 @@ def init_db():
             model_name TEXT,
             suggestion TEXT,
             status TEXT,         -- 'open', 'merged'
+            run_date TEXT,       -- date of the agent run that raised it
+            predicted_impact TEXT, -- JSON: what-if DQ score deltas (src/whatif.py)
             FOREIGN KEY (tde_id) REFERENCES TDE(tde_id)
         );
+        
+        CREATE TABLE IF NOT EXISTS LLM_CALLS(
+            call_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT,
+            run_id TEXT,
+            caller TEXT,
+            prompt_hash TEXT,
+            model TEXT,
+            latency_ms REAL,
+            input_tokens INTEGER,
+            output_tokens INTEGER,
+            cost_usd REAL,
+            cache_hit INTEGER,   -- 0/1
+            fallback_used INTEGER, -- 0/1
+            error_class TEXT
+        );
+        
+        CREATE TABLE IF NOT EXISTS POLICY_COVERAGE(
+            tde_id TEXT,
+            rule_id TEXT,
+            required_validation TEXT,
+            semantic_type TEXT,
+            status TEXT,         -- 'covered', 'missing'
+            updated_at TEXT,
+            PRIMARY KEY (tde_id, rule_id, required_validation)
+        );
+        
+        -- Inputs each (TDE, rule) pair was last evaluated with, for incremental refresh
+        CREATE TABLE IF NOT EXISTS POLICY_COVERAGE_STATE(
+            tde_id TEXT,
+            rule_id TEXT,
+            semantic_type TEXT,
+            rule_hash TEXT,
+            ontology_hash TEXT,
+            updated_at TEXT,
+            PRIMARY KEY (tde_id, rule_id)
+        );
+        
+        -- Column-to-column edges extracted from model SQL by src/lineage_extractor.py
+        CREATE TABLE IF NOT EXISTS COLUMN_LINEAGE(
+            model_name TEXT,
+            column_name TEXT,
+            source_table TEXT,
+            source_column TEXT,
+            expression TEXT,
+            PRIMARY KEY (model_name, column_name, source_table, source_column)
+        );
+        CREATE INDEX IF NOT EXISTS idx_column_lineage_source ON COLUMN_LINEAGE(source_table, source_column);
+        
+        CREATE TABLE IF NOT EXISTS LINEAGE_PARSE_STATE(
+            model_name TEXT PRIMARY KEY,
+            origin TEXT,         -- 'db', 'file'
+            sql_hash TEXT,
+            file_mtime REAL,
+            parsed_at TEXT
+        );
+        
+        -- Content-addressed, zlib-compressed payloads referenced from EVENT_LOG as {"$blob": hash}
+        CREATE TABLE IF NOT EXISTS BLOBS(
+            hash TEXT PRIMARY KEY, -- SHA-256 of the uncompressed content
+            data BLOB,
+            size INTEGER         -- uncompressed bytes
+        );
+        
+        -- Point-in-time projection states written by src/state_snapshots.py and read by the
+        -- dashboard's ?as_of= queries; `state` is the projection after every event with id <= event_id
+        CREATE TABLE IF NOT EXISTS STATE_SNAPSHOTS(
+            projection TEXT,
+            event_id INTEGER,
+            state TEXT,          -- JSON string
+            created_at TEXT,
+            PRIMARY KEY (projection, event_id)
+        );
+        
+        -- Daily scores packed per (TDE, month) as 31 float64 slots (NaN = no score),
+        -- maintained alongside DQ_SCORES by src/dq_series.py
+        CREATE TABLE IF NOT EXISTS DQ_SERIES(
+            tde_id TEXT,
+            month TEXT,          -- 'YYYY-MM'
+            scores BLOB,
+            PRIMARY KEY (tde_id, month)
+        );
+        
+        -- Weekly (from Monday) and monthly score aggregates per TDE; breaches are
+        -- days below the strictest rule threshold of the TDE's business term
+        CREATE TABLE IF NOT EXISTS DQ_ROLLUPS(
+            tde_id TEXT,
+            period TEXT,         -- 'week', 'month'
+            period_start TEXT,
+            count INTEGER,
+            min_score REAL,
+            mean_score REAL,
+            last_score REAL,
+            last_date TEXT,
+            breach_count INTEGER,
+            PRIMARY KEY (tde_id, period, period_start)
+        );
+        CREATE INDEX IF NOT EXISTS idx_dq_rollups_period ON DQ_ROLLUPS(period, period_start);
+        
+        -- Exponentially weighted trend statistics per TDE, advanced one step per daily
+        -- score by src/rolling_stats.py; prev_state (JSON) allows re-scoring the last day
+        CREATE TABLE IF NOT EXISTS DQ_ROLLING_STATS(
+            tde_id TEXT PRIMARY KEY,
+            last_date TEXT,
+            count INTEGER,
+            ewma REAL,
+            level REAL,
+            slope REAL,          -- score change per day
+            variance REAL,       -- of the one-step forecast error
+            prev_state TEXT,
+            updated_at TEXT
+        );
+        
+        -- Current status of every (rule, TDE) pair and how long it has lasted, so the
+        -- agent can emit events on transitions only (see src/rule_state.py)
+        CREATE TABLE IF NOT EXISTS RULE_STATE(
+            rule_id TEXT,
+            tde_id TEXT,
+            status TEXT,         -- 'breached', 'ok'
+            since_date TEXT,     -- first day of the current status
+            last_date TEXT,
+            days_in_status INTEGER,
+            last_score REAL,
+            emitted_risk_score REAL, -- risk score of the last risk_assessed event for this breach
+            updated_at TEXT,
+            PRIMARY KEY (rule_id, tde_id)
+        );
+        
+        -- Aggregate results of Monte Carlo runs of src/monte_carlo.py
+        CREATE TABLE IF NOT EXISTS SIMULATION_RUNS(
+            run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at TEXT,
+            seeds INTEGER,
+            days INTEGER,
+            base_seed INTEGER,
+            params TEXT,         -- JSON string
+            summary TEXT,        -- JSON string
+            duration_s REAL
+        );
+        
+        -- Events of the sampled seeds of a run (opt-in), kept apart from EVENT_LOG
+        CREATE TABLE IF NOT EXISTS SIMULATION_EVENTS(
+            run_id INTEGER,
+            seed INTEGER,
+            day INTEGER,
+            event_type TEXT,
+            tde_id TEXT,
+            score REAL,
+            risk_score REAL,
+            FOREIGN KEY (run_id) REFERENCES SIMULATION_RUNS(run_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_simulation_events_run ON SIMULATION_EVENTS(run_id, seed, day);
+        
+        -- Last date each daemon stage completed: 'ingested' and 'scored' per domain,
+        -- 'agent' once for all domains (domain '')
+        CREATE TABLE IF NOT EXISTS PIPELINE_WATERMARKS(
+            domain TEXT NOT NULL DEFAULT '',
+            stage TEXT,
+            value TEXT,
+            updated_at TEXT,
+            PRIMARY KEY (domain, stage)
+        );
+        
+        -- Leases so only one daemon instance works on a domain's pipeline, and one
+        -- on the agent, at a time (src/daemon.py)
+        CREATE TABLE IF NOT EXISTS DAEMON_LEASES(
+            name TEXT PRIMARY KEY,
+            owner TEXT,
+            expires_at REAL      -- epoch seconds
+        );
+        
+        -- Daily agent runs and their completed stages with intermediate results, so a
+        -- re-run of a date resumes instead of repeating events, LLM calls and PRs
+        CREATE TABLE IF NOT EXISTS AGENT_RUNS(
+            run_id TEXT PRIMARY KEY, -- 'agent:<date>'
+            date TEXT,
+            status TEXT,         -- 'running', 'completed'
+            outcome TEXT,        -- how a completed run ended, e.g. 'no_breaches'
+            started_at TEXT,
+            updated_at TEXT,
+            completed_at TEXT
+        );
+        
+        CREATE TABLE IF NOT EXISTS AGENT_RUN_STAGES(
+            run_id TEXT,
+            stage TEXT,
+            result TEXT,         -- JSON string
+            completed_at TEXT,
+            PRIMARY KEY (run_id, stage),
+            FOREIGN KEY (run_id) REFERENCES AGENT_RUNS(run_id)
+        );
+        
+        -- Files holding each business domain's landing and model tables (src/shards.py);
+        -- path is relative to this database's directory, NULL when they live in this file
+        CREATE TABLE IF NOT EXISTS DATA_SHARDS(
+            domain TEXT PRIMARY KEY,
+            path TEXT,
+            updated_at TEXT
+        );
+        
+        CREATE TABLE IF NOT EXISTS SHARD_TABLES(
+            domain TEXT,
+            table_name TEXT,
+            kind TEXT,           -- 'landing', 'model'
+            PRIMARY KEY (domain, table_name),
+            FOREIGN KEY (domain) REFERENCES DATA_SHARDS(domain)
+        );
+        
+        -- One-off data migrations already applied to this database
+        CREATE TABLE IF NOT EXISTS SCHEMA_MIGRATIONS(
+            name TEXT PRIMARY KEY,
+            applied_at TEXT
+        );
+        
+        CREATE TABLE IF NOT EXISTS TABLE_VERSIONS(
+            table_name TEXT PRIMARY KEY,
+            version INTEGER
+        );
     ''')
+    _migrate_event_log(cursor)
+    _migrate_agent_memory(cursor)
+    _migrate_pipeline_watermarks(cursor)
+    _run_once(cursor, 'event_payload_blobs', migrate_event_payloads)
+    _run_once(cursor, 'dq_series_backfill', rebuild_series)
+    _run_once(cursor, 'dq_rolling_stats_backfill', rebuild_rolling_stats)
+    for table in VERSIONED_TABLES:
+        for op in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_version_{table}_{op.lower()}
+                AFTER {op} ON {table}
+                BEGIN
+                    INSERT INTO TABLE_VERSIONS (table_name, version) VALUES ('{table}', 1)
+                    ON CONFLICT(table_name) DO UPDATE SET version = version + 1;
+                END
+            ''')
     conn.commit()
     conn.close()
 
+def _migrate_event_log(cursor):
+    """Adds columns and indexes introduced after EVENT_LOG was first created."""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(EVENT_LOG)").fetchall()}
+    if 'investigation_id' not in columns:
+        cursor.execute("ALTER TABLE EVENT_LOG ADD COLUMN investigation_id INTEGER")
+        # Legacy events belong to the latest investigation opened before them,
+        # which is how the dashboard used to group them when replaying the log
+        cursor.execute('''
+            UPDATE EVENT_LOG SET investigation_id = (
+                SELECT max(f.event_id) FROM EVENT_LOG f
+                WHERE f.event_type = 'focus_selected' AND f.event_id <= EVENT_LOG.event_id
+            )
+        ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_event_log_investigation ON EVENT_LOG(investigation_id, event_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_event_log_type ON EVENT_LOG(event_type, event_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_event_log_timestamp ON EVENT_LOG(timestamp)")
+
+def _migrate_agent_memory(cursor):
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(AGENT_MEMORY)").fetchall()}
+    if 'run_date' not in columns:
+        cursor.execute("ALTER TABLE AGENT_MEMORY ADD COLUMN run_date TEXT")
+    if 'predicted_impact' not in columns:
+        cursor.execute("ALTER TABLE AGENT_MEMORY ADD COLUMN predicted_impact TEXT")
+    # PRs raised before run dates were recorded have NULL, which never conflicts
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_agent_memory_run ON AGENT_MEMORY(run_date, tde_id, model_name)")
+
+def _migrate_pipeline_watermarks(cursor):
+    """Rebuilds the stage-keyed watermarks of daemons that predate domains under (domain, stage)."""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(PIPELINE_WATERMARKS)").fetchall()}
+    if 'domain' in columns:
+        return
+    cursor.execute("ALTER TABLE PIPELINE_WATERMARKS RENAME TO PIPELINE_WATERMARKS_OLD")
+    cursor.execute('''
+        CREATE TABLE PIPELINE_WATERMARKS(
+            domain TEXT NOT NULL DEFAULT '',
+            stage TEXT,
+            value TEXT,
+            updated_at TEXT,
+            PRIMARY KEY (domain, stage)
+        )
+    ''')
+    # Those daemons only ever ran the default domain's pipeline
+    cursor.execute('''
+        INSERT INTO PIPELINE_WATERMARKS (domain, stage, value, updated_at)
+        SELECT CASE WHEN stage = 'agent' THEN '' ELSE ? END, stage, value, updated_at
+        FROM PIPELINE_WATERMARKS_OLD
+    ''', (DEFAULT_DOMAIN,))
+    cursor.execute("DROP TABLE PIPELINE_WATERMARKS_OLD")
+
+def _run_once(cursor, name, migration):
+    """Applies a data migration unless SCHEMA_MIGRATIONS says it already ran."""
+    cursor.execute("SELECT 1 FROM SCHEMA_MIGRATIONS WHERE name = ?", (name,))
+    if cursor.fetchone():
+        return
+    migration(cursor)
+    cursor.execute(
+        "INSERT INTO SCHEMA_MIGRATIONS (name, applied_at) VALUES (?, ?)",
+        (name, datetime.utcnow().isoformat())
+    )
+
+def get_table_versions(conn, tables) -> tuple:
+    """Current change counters of the given tables (0 for never-written ones)."""
+    cursor = conn.cursor()
+    # Plain tuples regardless of the row factory the caller configured
+    cursor.row_factory = None
+    cursor.execute(
+        f"SELECT table_name, version FROM TABLE_VERSIONS WHERE table_name IN ({','.join('?' * len(tables))})",
+        tuple(tables)
+    )
+    versions = dict(cursor.fetchall())
+    return tuple(versions.get(t, 0) for t in tables)
+
 if __name__ == "__main__":
     init_db()
     print("Database initialized.")
@@ -0,0 +1,190 @@
+import math
+from array import array
+from datetime import date, timedelta
+from src.rolling_stats import update_rolling_stats
+
+# One packed vector of daily scores per (TDE, month): slot day-1, NaN where no score
+MONTH_SLOTS = 31
+ROLLUP_PERIODS = ("week", "month")
+
+def period_start(day: date, period: str) -> date:
+    """First day of the week (Monday) or month containing `day`."""
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+def _period_days(start: date, period: str) -> list[date]:
+    if period == "week":
+        return [start + timedelta(days=i) for i in range(7)]
+    days = []
+    day = start
+    while day.month == start.month:
+        days.append(day)
+        day += timedelta(days=1)
+    return days
+
+def _month_key(day: date) -> str:
+    # Same as strftime("%Y-%m") at a fraction of the cost; called for every day of every rollup
+    return f"{day.year:04d}-{day.month:02d}"
+
+def _unpack(data) -> array:
+    scores = array('d')
+    scores.frombytes(data)
+    return scores
+
+def _load_months(cursor, tde_id: str, months, loaded: dict) -> dict:
+    """Adds the vectors of the given months (empty when absent) to `loaded` and returns it."""
+    missing = [m for m in months if m not in loaded]
+    if missing:
+        cursor.execute(
+            f"SELECT month, scores FROM DQ_SERIES WHERE tde_id = ? AND month IN ({','.join('?' * len(missing))})",
+            [tde_id] + missing
+        )
+        for row in cursor.fetchall():
+            loaded[row[0]] = _unpack(row[1])
+        for m in missing:
+            loaded.setdefault(m, array('d', [math.nan] * MONTH_SLOTS))
+    return loaded
+
+def breach_thresholds(cursor, tde_ids) -> dict:
+    """tde_id -> strictest threshold among the rules of its business term."""
+    tde_ids = list(tde_ids)
+    cursor.execute(f'''
+        SELECT t.tde_id, max(r.threshold) FROM TDE t
+        JOIN RULES r ON r.business_term_id = t.business_term_id
+        WHERE t.tde_id IN ({','.join('?' * len(tde_ids))})
+        GROUP BY t.tde_id
+    ''', tde_ids)
+    return {row[0]: row[1] for row in cursor.fetchall()}
+
+def update_series(cursor, scores):
+    """
+    Folds (date, tde_id, score) rows into the packed monthly vectors and recomputes
+    the week and month rollups they fall in. Work is proportional to the rows
+    written, never to the length of the history.
+    """
+    by_tde = {}
+    for date_str, tde_id, score in scores:
+        by_tde.setdefault(tde_id, []).append((date.fromisoformat(date_str), score))
+    if not by_tde:
+        return
+    thresholds = breach_thresholds(cursor, by_tde)
+
+    for tde_id, points in by_tde.items():
+        # 1. Patch the month vectors
+        months = _load_months(cursor, tde_id, {_month_key(d) for d, _ in points}, {})
+        for day, score in points:
+            months[_month_key(day)][day.day - 1] = score
+        cursor.executemany(
+            "INSERT OR REPLACE INTO DQ_SERIES (tde_id, month, scores) VALUES (?, ?, ?)",
+            [(tde_id, m, months[m].tobytes()) for m in {_month_key(d) for d, _ in points}]
+        )
+
+        # 2. Recompute the affected rollups from the vectors (a week can span two months)
+        threshold = thresholds.get(tde_id)
+        for period, start in {(p, period_start(d, p)) for d, _ in points for p in ROLLUP_PERIODS}:
+            days = _period_days(start, period)
+            _load_months(cursor, tde_id, {_month_key(d) for d in days}, months)
+            values = []
+            for d in days:
+                score = months[_month_key(d)][d.day - 1]
+                if not math.isnan(score):
+                    values.append((d, score))
+            if not values:
+                cursor.execute(
+                    "DELETE FROM DQ_ROLLUPS WHERE tde_id = ? AND period = ? AND period_start = ?",
+                    (tde_id, period, start.isoformat())
+                )
+                continue
+            observed = [v for _, v in values]
+            cursor.execute('''
+                INSERT OR REPLACE INTO DQ_ROLLUPS (
+                    tde_id, period, period_start, count, min_score, mean_score, last_score, last_date, breach_count
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                tde_id, period, start.isoformat(), len(observed), min(observed),
+                sum(observed) / len(observed), values[-1][1], values[-1][0].isoformat(),
+                sum(1 for v in observed if threshold is not None and v < threshold)
+            ))
+
+def write_scores(cursor, scores):
+    """
+    Writes (date, tde_id, score) rows to DQ_SCORES and keeps the series, rollups
+    and rolling trend statistics in step.
+    """
+    cursor.executemany("INSERT OR REPLACE INTO DQ_SCORES (date, tde_id, score) VALUES (?, ?, ?)", scores)
+    update_series(cursor, scores)
+    update_rolling_stats(cursor, scores)
+
+def rebuild_series(cursor) -> int:
+    """Rebuilds DQ_SERIES and DQ_ROLLUPS from DQ_SCORES (e.g. after rule thresholds change)."""
+    cursor.execute("DELETE FROM DQ_SERIES")
+    cursor.execute("DELETE FROM DQ_ROLLUPS")
+    cursor.execute("SELECT date, tde_id, score FROM DQ_SCORES")
+    scores = [tuple(row) for row in cursor.fetchall()]
+    update_series(cursor, scores)
+    return len(scores)
+
+def score_series(cursor, tde_id: str, start: str = None, end: str = None) -> list[tuple]:
+    """(date, score) pairs of a TDE with start <= date <= end, oldest first, read from the monthly vectors."""
+    cursor.execute('''
+        SELECT month, scores FROM DQ_SERIES
+        WHERE tde_id = ? AND (? IS NULL OR month >= ?) AND (? IS NULL OR month <= ?)
+        ORDER BY month
+    ''', (tde_id, start and start[:7], start and start[:7], end and end[:7], end and end[:7]))
+    series = []
+    for month, data in cursor.fetchall():
+        for slot, score in enumerate(_unpack(data)):
+            if math.isnan(score):
+                continue
+            day = f"{month}-{slot + 1:02d}"
+            if (start is None or day >= start) and (end is None or day <= end):
+                series.append((day, score))
+    return series
+
+def latest_scores(cursor, tde_id: str, n: int) -> list[tuple]:
+    """The last `n` (date, score) pairs of a TDE, oldest first; reads only as many months as needed."""
+    if n <= 0:
+        return []
+    cursor.execute("SELECT month, scores FROM DQ_SERIES WHERE tde_id = ? ORDER BY month DESC", (tde_id,))
+    latest = []
+    for month, data in cursor:
+        scores = _unpack(data)
+        for slot in range(MONTH_SLOTS - 1, -1, -1):
+            if not math.isnan(scores[slot]):
+                latest.append((f"{month}-{slot + 1:02d}", scores[slot]))
+                if len(latest) == n:
+                    return latest[::-1]
+    return latest[::-1]
+
+def get_rollups(cursor, tde_id: str, period: str, start: str = None, end: str = None) -> list[dict]:
+    """Week or month rollups of a TDE whose period starts within [start, end], oldest first."""
+    cursor.execute('''
+        SELECT period_start, count, min_score, mean_score, last_score, last_date, breach_count
+        FROM DQ_ROLLUPS
+        WHERE tde_id = ? AND period = ? AND (? IS NULL OR period_start >= ?) AND (? IS NULL OR period_start <= ?)
+        ORDER BY period_start
+    ''', (tde_id, period, start, start, end, end))
+    return [
+        {"period_start": row[0], "count": row[1], "min": row[2], "mean": row[3],
+         "last": row[4], "last_date": row[5], "breaches": row[6]}
+        for row in cursor.fetchall()
+    ]
+
+if __name__ == "__main__":
+    import json
+    import sys
+    from src.db import get_connection, init_db
+
+    init_db()
+    conn = get_connection()
+    cursor = conn.cursor()
+    if len(sys.argv) > 1 and sys.argv[1] == "rebuild":
+        print(f"Rebuilt series and rollups from {rebuild_series(cursor)} scores.")
+        conn.commit()
+    elif len(sys.argv) > 2:
+        period = sys.argv[3] if len(sys.argv) > 3 else "month"
+        print(json.dumps(get_rollups(cursor, sys.argv[2], period), indent=2))
+    else:
+        print("Usage: python -m src.dq_series rebuild | rollups <tde_id> [week|month]")
+    conn.close()
@@ -1,9 +1,11 @@
 import json
 from datetime import datetime
+from src.blobs import externalize
 from src.db import get_connection
 
 ALLOWED_EVENTS = {
     "rule_breached",
+    "rule_recovered",
     "risk_assessed",
     "focus_selected",
     "investigation_started",
@@ -22,8 +24,14 @@ def emit_event(
     entity_name: str,
     context_dict: dict,
     metrics_dict: dict,
-    explanation_text: str
-):
+    explanation_text: str,
+    investigation_id: int = None
+) -> int:
+    """
+    Appends an event and returns its event_id. A focus_selected event opens a new
+    investigation (its own event_id); other events join the given investigation,
+    or by default the most recently opened one.
+    """
     if event_type not in ALLOWED_EVENTS:
         raise ValueError(f"Event type '{event_type}' is not allowed.")
         
@@ -32,23 +40,34 @@ def emit_event(
     
     timestamp = datetime.utcnow().isoformat()
     
+    if investigation_id is None and event_type != "focus_selected":
+        # Investigation ids are increasing, so the latest one is the index maximum
+        cursor.execute("SELECT max(investigation_id) FROM EVENT_LOG")
+        investigation_id = cursor.fetchone()[0]
+    
     cursor.execute('''
         INSERT INTO EVENT_LOG (
             timestamp, event_type, entity_type, entity_id, entity_name,
-            context, metrics, explanation
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            context, metrics, explanation, investigation_id
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
     ''', (
         timestamp,
         event_type,
         entity_type,
         entity_id,
         entity_name,
-        json.dumps(context_dict),
+        # Diffs, SQL and other long strings are stored once in BLOBS and referenced
+        json.dumps(externalize(cursor, context_dict)),
         json.dumps(metrics_dict),
-        explanation_text
+        explanation_text,
+        investigation_id
     ))
+    event_id = cursor.lastrowid
+    if event_type == "focus_selected" and investigation_id is None:
+        cursor.execute("UPDATE EVENT_LOG SET investigation_id = ? WHERE event_id = ?", (event_id, event_id))
     
     conn.commit()
     conn.close()
     
     print(f"[{timestamp}] EVENT: {event_type} | {entity_type}: {entity_name} | {explanation_text}")
+    return event_id
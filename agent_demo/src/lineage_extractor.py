@@ -0,0 +1,208 @@
+import glob
+import hashlib
+import os
+import re
+from datetime import datetime
+from src.db import get_connection, init_db
+
+MODELS_DIR = os.environ.get("STEWARD_MODELS_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "models"))
+
+# Words that can appear as bare identifiers in a select expression without naming a column
+_NON_COLUMN_WORDS = {
+    'as', 'and', 'or', 'not', 'null', 'is', 'in', 'like', 'between', 'case', 'when', 'then',
+    'else', 'end', 'distinct', 'true', 'false', 'over', 'partition', 'by', 'order', 'asc', 'desc',
+    'decimal', 'numeric', 'varchar', 'char', 'text', 'int', 'integer', 'bigint', 'real', 'float',
+    'double', 'date', 'timestamp', 'boolean', 'string'
+}
+_CLAUSE_KEYWORDS = {
+    'on', 'using', 'where', 'group', 'order', 'having', 'limit', 'left', 'right', 'inner',
+    'outer', 'full', 'cross', 'join', 'union', 'natural'
+}
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_IDENTIFIER = re.compile(r'([A-Za-z_]\w*)(?:\.([A-Za-z_]\w*))?(\s*\()?')
+_ALIAS = re.compile(r'^(.*?)\s+as\s+([A-Za-z_]\w*)$', re.IGNORECASE | re.DOTALL)
+_IMPLICIT_ALIAS = re.compile(r"^(.*[\w)'])\s+([A-Za-z_]\w*)$", re.DOTALL)
+_TABLE_REF = re.compile(
+    r'\b(from|join)\s+(\((?:[^()]|\([^()]*\))*\)|[A-Za-z_][\w\.]*)(?:\s+(?:as\s+)?([A-Za-z_]\w*))?',
+    re.IGNORECASE
+)
+
+def _strip_comments(sql_text: str) -> str:
+    sql_text = re.sub(r'/\*.*?\*/', ' ', sql_text, flags=re.DOTALL)
+    return re.sub(r'--[^\n]*', ' ', sql_text)
+
+def _split_top_level(text: str, sep: str = ',') -> list[str]:
+    """Splits on `sep` outside parentheses and string literals."""
+    parts, depth, current, in_string = [], 0, [], False
+    for ch in text:
+        if ch == "'":
+            in_string = not in_string
+        elif not in_string:
+            if ch == '(':
+                depth += 1
+            elif ch == ')':
+                depth -= 1
+            elif ch == sep and depth == 0:
+                parts.append(''.join(current).strip())
+                current = []
+                continue
+        current.append(ch)
+    if ''.join(current).strip():
+        parts.append(''.join(current).strip())
+    return parts
+
+def _find_top_level_keyword(text: str, keyword: str, start: int = 0) -> int:
+    """Index of the first `keyword` at parenthesis depth 0, or -1."""
+    pattern = re.compile(r'\b' + keyword + r'\b', re.IGNORECASE)
+    depth = 0
+    i = start
+    while i < len(text):
+        ch = text[i]
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        elif depth == 0 and pattern.match(text, i) and (i == 0 or not (text[i - 1].isalnum() or text[i - 1] == '_')):
+            return i
+        i += 1
+    return -1
+
+def _table_aliases(from_clause: str) -> tuple[dict[str, str], str]:
+    """Maps every alias (and bare table name) in a FROM clause to its table; also returns the primary table."""
+    aliases, primary = {}, None
+    for _, ref, alias in _TABLE_REF.findall(from_clause):
+        if ref.startswith('('):
+            # Derived table: attribute its columns to the table the subquery reads
+            inner = _TABLE_REF.search(ref[1:-1])
+            if not inner:
+                continue
+            table = inner.group(2).split('.')[-1]
+        else:
+            table = ref.split('.')[-1]
+            aliases[table.lower()] = table
+        if alias and alias.lower() not in _CLAUSE_KEYWORDS:
+            aliases[alias.lower()] = table
+        primary = primary or table
+    return aliases, primary
+
+def parse_model_sql(sql_text: str) -> list[dict]:
+    """
+    Resolves a model's select list to column-level lineage.
+    Returns one {'column', 'expression', 'sources': [(table, column), ...]} per output column.
+    """
+    sql = ' '.join(_strip_comments(sql_text).split())
+    select_at = _find_top_level_keyword(sql, 'select')
+    if select_at < 0:
+        return []
+    from_at = _find_top_level_keyword(sql, 'from', select_at + 6)
+    select_list = sql[select_at + 6:from_at if from_at >= 0 else len(sql)]
+    aliases, primary = _table_aliases(sql[from_at:]) if from_at >= 0 else ({}, None)
+
+    columns = []
+    for item in _split_top_level(select_list):
+        item = re.sub(r'^distinct\s+', '', item, flags=re.IGNORECASE)
+        if item == '*' or item.endswith('.*'):
+            continue
+        match = _ALIAS.match(item) or _IMPLICIT_ALIAS.match(item)
+        if match and match.group(2).lower() not in _NON_COLUMN_WORDS:
+            expression, output = match.group(1), match.group(2)
+        else:
+            expression, output = item, None
+
+        sources = []
+        for qualifier, name, call in _IDENTIFIER.findall(_STRING_LITERAL.sub("''", expression)):
+            if call:
+                continue  # function name, e.g. cast( / coalesce(
+            if name:
+                table = aliases.get(qualifier.lower(), qualifier)
+                column = name
+            else:
+                if qualifier.lower() in _NON_COLUMN_WORDS:
+                    continue
+                table, column = primary, qualifier
+            if (table, column) not in sources:
+                sources.append((table, column))
+
+        if output is None:
+            # Un-aliased item keeps the name of the column it selects (a.loan_amount -> loan_amount)
+            if len(sources) != 1:
+                continue
+            output = sources[0][1]
+        columns.append({"column": output, "expression": expression, "sources": sources})
+    return columns
+
+def _sql_hash(sql_text: str) -> str:
+    return hashlib.sha1(sql_text.encode('utf-8')).hexdigest()
+
+def extract_lineage(models_dir: str = MODELS_DIR) -> dict:
+    """
+    Parses every model in DBT_SQL_MODELS and models/*.sql into COLUMN_LINEAGE.
+    Only models whose SQL hash changed since the last run are re-parsed; files are
+    re-read only when their mtime moved. DBT_SQL_MODELS wins when a model exists in both.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT model_name, sql_hash, file_mtime FROM LINEAGE_PARSE_STATE")
+    state = {r['model_name']: r for r in cursor.fetchall()}
+
+    cursor.execute("SELECT model_name, sql_text FROM DBT_SQL_MODELS")
+    sources = {r['model_name']: ('db', r['sql_text'], None) for r in cursor.fetchall()}
+
+    for path in glob.glob(os.path.join(models_dir, "*.sql")):
+        model = os.path.splitext(os.path.basename(path))[0]
+        if model in sources:
+            continue
+        mtime = os.stat(path).st_mtime
+        prev = state.get(model)
+        if prev and prev['file_mtime'] == mtime:
+            # Unchanged file: carry the previous hash forward without reading it
+            sources[model] = ('file', None, mtime)
+            continue
+        with open(path, 'r') as f:
+            sources[model] = ('file', f.read(), mtime)
+
+    stats = {"models": len(sources), "parsed": 0, "removed": 0}
+    timestamp = datetime.utcnow().isoformat()
+
+    for model, (origin, sql_text, mtime) in sources.items():
+        if sql_text is None:
+            continue
+        digest = _sql_hash(sql_text)
+        prev = state.get(model)
+        if prev and prev['sql_hash'] == digest:
+            if prev['file_mtime'] != mtime:
+                cursor.execute("UPDATE LINEAGE_PARSE_STATE SET file_mtime = ? WHERE model_name = ?", (mtime, model))
+            continue
+
+        edges = []
+        for col in parse_model_sql(sql_text):
+            for source_table, source_column in col['sources']:
+                edges.append((model, col['column'], source_table, source_column, col['expression']))
+
+        cursor.execute("DELETE FROM COLUMN_LINEAGE WHERE model_name = ?", (model,))
+        cursor.executemany('''
+            INSERT OR REPLACE INTO COLUMN_LINEAGE
+                (model_name, column_name, source_table, source_column, expression)
+            VALUES (?, ?, ?, ?, ?)
+        ''', edges)
+        cursor.execute('''
+            INSERT OR REPLACE INTO LINEAGE_PARSE_STATE (model_name, origin, sql_hash, file_mtime, parsed_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (model, origin, digest, mtime, timestamp))
+        stats["parsed"] += 1
+
+    removed = [m for m in state if m not in sources]
+    cursor.executemany("DELETE FROM COLUMN_LINEAGE WHERE model_name = ?", [(m,) for m in removed])
+    cursor.executemany("DELETE FROM LINEAGE_PARSE_STATE WHERE model_name = ?", [(m,) for m in removed])
+    stats["removed"] = len(removed)
+
+    conn.commit()
+    conn.close()
+    return stats
+
+if __name__ == "__main__":
+    init_db()
+    stats = extract_lineage()
+    print(f"Column lineage refreshed: {stats['parsed']} of {stats['models']} models re-parsed, {stats['removed']} removed.")
@@ -0,0 +1,155 @@
+import re
+import threading
+from collections import deque
+from src.db import get_connection, get_table_versions
+
+# Tables the graph is derived from; a change to any of them invalidates it
+LINEAGE_TABLES = ('DBT_COLUMN_MAPPING', 'DBT_SQL_MODELS', 'COLUMN_LINEAGE')
+
+_TABLE_REF = re.compile(r'\b(?:from|join)\s+([A-Za-z_][\w\.]*)', re.IGNORECASE)
+
+def referenced_tables(sql_text: str) -> set[str]:
+    """Tables a model reads, taken from its FROM and JOIN clauses."""
+    return {name.split('.')[-1] for name in _TABLE_REF.findall(sql_text or '')}
+
+def build_order(models: set, upstream: dict) -> list[str]:
+    """The models ordered so that each comes after the ones among them it reads."""
+    order, done = [], set()
+    pending = sorted(models)
+    while pending:
+        ready = [m for m in pending if not (upstream.get(m, set()) & models) - done]
+        if not ready:
+            # A cycle; build the rest in name order and let SQLite report what breaks
+            ready = pending
+        order += ready
+        done.update(ready)
+        pending = [m for m in pending if m not in done]
+    return order
+
+class LineageGraph:
+    """
+    In-memory lineage index over dbt models and the source tables they read.
+    Holds model- and column-level adjacency lists in both directions plus the
+    column -> TDE bindings; transitive closures are computed on first use and
+    memoized per node.
+    """
+
+    def __init__(self, models: dict[str, str], mappings, version: tuple, column_edges=()):
+        self.version = version
+        self.models = set(models) | {edge[0] for edge in column_edges}
+        # table -> tables it reads (upstream) / tables reading it (downstream)
+        self.upstream = {}
+        self.downstream = {}
+        for model, sql_text in models.items():
+            self.upstream.setdefault(model, set())
+            self.downstream.setdefault(model, set())
+            for source in referenced_tables(sql_text):
+                if source == model:
+                    continue
+                self.upstream[model].add(source)
+                self.downstream.setdefault(source, set()).add(model)
+                self.upstream.setdefault(source, set())
+
+        # (model, column) -> source columns it is computed from, and the reverse
+        self.column_upstream = {}
+        self.column_downstream = {}
+        for model, column, source_table, source_column in column_edges:
+            node, source = (model, column), (source_table, source_column)
+            self.column_upstream.setdefault(node, set()).add(source)
+            self.column_downstream.setdefault(source, set()).add(node)
+            if source_table != model:
+                self.upstream.setdefault(model, set()).add(source_table)
+                self.downstream.setdefault(source_table, set()).add(model)
+                self.downstream.setdefault(model, set())
+                self.upstream.setdefault(source_table, set())
+
+        # model -> [(column, tde_id)] and tde_id -> [(model, column)]
+        self.columns_by_model = {}
+        self.mappings_by_tde = {}
+        for model, column, tde_id in mappings:
+            self.columns_by_model.setdefault(model, []).append((column, tde_id))
+            self.mappings_by_tde.setdefault(tde_id, []).append((model, column))
+        for entries in self.mappings_by_tde.values():
+            entries.sort()
+
+        self._closures = {}
+        self._lock = threading.Lock()
+
+    def _closure(self, adjacency: dict, start: str, direction: str) -> dict[str, int]:
+        """Breadth-first reachable set of `start` (excluding itself) with hop counts."""
+        key = (direction, start)
+        cached = self._closures.get(key)
+        if cached is not None:
+            return cached
+
+        hops = {}
+        queue = deque([(start, 0)])
+        while queue:
+            node, depth = queue.popleft()
+            for neighbour in adjacency.get(node, ()):
+                if neighbour != start and neighbour not in hops:
+                    hops[neighbour] = depth + 1
+                    queue.append((neighbour, depth + 1))
+
+        with self._lock:
+            self._closures[key] = hops
+        return hops
+
+    def upstream_of(self, table: str) -> dict[str, int]:
+        """Every table `table` transitively reads, mapped to its distance in hops."""
+        return self._closure(self.upstream, table, 'up')
+
+    def downstream_of(self, table: str) -> dict[str, int]:
+        """Every model transitively reading `table`, mapped to its distance in hops."""
+        return self._closure(self.downstream, table, 'down')
+
+    def column_upstream_of(self, model: str, column: str) -> dict[tuple, int]:
+        """Every (table, column) a model column is transitively derived from, with hop counts."""
+        return self._closure(self.column_upstream, (model, column), 'col_up')
+
+    def column_downstream_of(self, table: str, column: str) -> dict[tuple, int]:
+        """Every (model, column) transitively derived from a column, with hop counts."""
+        return self._closure(self.column_downstream, (table, column), 'col_down')
+
+    def impacted_columns(self, model: str) -> list[dict]:
+        """
+        TDE-bound columns affected by a change to `model`: its own columns (hops 0)
+        followed by those of every downstream model, nearest first.
+        """
+        affected = [(model, 0)] + sorted(self.downstream_of(model).items(), key=lambda x: (x[1], x[0]))
+        impacted = []
+        for table, hops in affected:
+            for column, tde_id in self.columns_by_model.get(table, ()):
+                impacted.append({"model": table, "column": column, "tde": tde_id, "hops": hops})
+        return impacted
+
+# Process-wide graph, rebuilt when the versions of LINEAGE_TABLES move
+_graph = None
+_graph_lock = threading.Lock()
+
+def get_lineage_graph(conn=None) -> LineageGraph:
+    """Returns the shared lineage graph, rebuilding it if mappings or model SQL changed."""
+    global _graph
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        version = get_table_versions(conn, LINEAGE_TABLES)
+        if _graph is not None and _graph.version == version:
+            return _graph
+
+        with _graph_lock:
+            if _graph is not None and _graph.version == version:
+                return _graph
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute("SELECT model_name, sql_text FROM DBT_SQL_MODELS")
+            models = dict(cursor.fetchall())
+            cursor.execute("SELECT model_name, column_name, tde_id FROM DBT_COLUMN_MAPPING")
+            mappings = cursor.fetchall()
+            cursor.execute("SELECT model_name, column_name, source_table, source_column FROM COLUMN_LINEAGE")
+            _graph = LineageGraph(models, mappings, version, cursor.fetchall())
+            return _graph
+    finally:
+        if own_conn:
+            conn.close()
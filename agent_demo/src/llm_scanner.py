@@ -1,4 +1,9 @@
+import os
 import re
+from src.llm_telemetry import LLMBudget, Stopwatch, hash_prompt, record_llm_call
+
+LLM_MODEL = 'gemini-2.5-flash'
+CALLER = 'llm_scanner.analyze_sql_for_risks'
 
 class LLMScanner:
     """
@@ -6,7 +11,12 @@ class LLMScanner:
     Deterministic simulation for demo purposes based on simple heuristics.
     """
     
-    def __init__(self):
+    def __init__(self, budget: LLMBudget = None):
+        # Optional per-run allowance; exhausted budgets fall back to heuristics
+        self.budget = budget
+        # Answers keyed by prompt hash, so identical SQL is only paid for once
+        self._response_cache = {}
+        
         # Simulated semantic mapping memory
         self.semantic_mapping = {
             'income': 'income',
@@ -35,18 +45,21 @@ class LLMScanner:
         """
         Simulates LLM detecting risky SQL transformations that might drop data or change semantics.
         """
-        risks = []
-        sql_lower = sql_text.lower()
-        
         # Try real LLM if api key exists
-        import os
         api_key = os.environ.get("GEMINI_API_KEY")
         if api_key:
-            try:
-                from google import genai
-                client = genai.Client(api_key=api_key)
+            risks = self._analyze_with_llm(sql_text, api_key)
+            if risks:
+                return risks
                 
-                prompt = f"""
+        return self._heuristic_sql_risks(sql_text)
+        
+    def _analyze_with_llm(self, sql_text: str, api_key: str) -> list[str]:
+        """
+        Asks Gemini for SQL risks. Every invocation, cached answer or budget refusal is
+        recorded in LLM_CALLS; an empty result tells the caller to use the heuristics.
+        """
+        prompt = f"""
                 You are a data governance AI. Analyze the following SQL query for data quality or semantic risks.
                 Specifically look for:
                 1. Use of CAST() which might lose precision or hide invalid types.
@@ -61,12 +74,39 @@ class LLMScanner:
                 If you find any of those 3 risks, just return exactly those risk sentences. E.g. "COALESCE detected: Potential obfuscation of null values."
                 If NO risks, return "NO RISKS". Return ONLY a bulleted list of risks detected.
                 """
+        prompt_hash = hash_prompt(prompt)
+        run_id = self.budget.run_id if self.budget else None
+        
+        if prompt_hash in self._response_cache:
+            risks = self._response_cache[prompt_hash]
+            record_llm_call(CALLER, prompt_hash, LLM_MODEL, 0.0,
+                            cache_hit=True, fallback_used=not risks, run_id=run_id)
+            return list(risks)
+            
+        if self.budget and self.budget.exhausted():
+            print("LLM budget exhausted for this run. Falling back to mock logic.")
+            record_llm_call(CALLER, prompt_hash, LLM_MODEL, 0.0,
+                            fallback_used=True, error_class="BudgetExhausted", run_id=run_id)
+            return []
+            
+        risks = []
+        input_tokens = output_tokens = 0
+        error_class = None
+        with Stopwatch() as timer:
+            try:
+                from google import genai
+                client = genai.Client(api_key=api_key)
                 
                 response = client.models.generate_content(
-                    model='gemini-2.5-flash',
+                    model=LLM_MODEL,
                     contents=prompt,
                 )
                 
+                usage = getattr(response, "usage_metadata", None)
+                if usage:
+                    input_tokens = usage.prompt_token_count or 0
+                    output_tokens = usage.candidates_token_count or 0
+                
                 if "NO RISKS" not in response.text:
                     for line in response.text.split('\\n'):
                         line = line.strip().strip('-*').strip()
@@ -76,11 +116,22 @@ class LLMScanner:
                             elif "COALESCE" in line.upper(): risks.append("COALESCE detected: Potential obfuscation of null values.")
                             elif "JOIN" in line.upper(): risks.append("JOIN detected: Potential fan-out or row loss risk.")
                             else: risks.append(line)
-                            
-                    if risks:
-                        return list(set(risks))
+                    risks = list(set(risks))
+                self._response_cache[prompt_hash] = risks
             except Exception as e:
+                error_class = type(e).__name__
                 print(f"Failed to use real LLM: {e}. Falling back to mock logic.")
+                
+        if self.budget:
+            self.budget.charge(input_tokens + output_tokens, timer.elapsed_ms / 1000)
+        record_llm_call(CALLER, prompt_hash, LLM_MODEL, timer.elapsed_ms,
+                        input_tokens=input_tokens, output_tokens=output_tokens,
+                        fallback_used=not risks, error_class=error_class, run_id=run_id)
+        return risks
+        
+    def _heuristic_sql_risks(self, sql_text: str) -> list[str]:
+        risks = []
+        sql_lower = sql_text.lower()
         
         # Fallback to Mock Logic
         if 'cast(' in sql_lower:
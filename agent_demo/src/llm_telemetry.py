@@ -0,0 +1,114 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from src.db import get_connection
+
+# Published list prices in USD per 1M tokens: (input, output)
+MODEL_PRICING = {
+    'gemini-2.5-flash': (0.30, 2.50),
+}
+
+# Model name recorded for the reviewer's simulated LLM analysis
+SIMULATED_MODEL = 'simulated'
+
+def hash_prompt(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    input_price, output_price = MODEL_PRICING.get(model, (0.0, 0.0))
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+def record_llm_call(
+    caller: str,
+    prompt_hash: str,
+    model: str,
+    latency_ms: float,
+    input_tokens: int = 0,
+    output_tokens: int = 0,
+    cache_hit: bool = False,
+    fallback_used: bool = False,
+    error_class: str = None,
+    run_id: str = None
+):
+    """
+    Appends one LLM invocation to LLM_CALLS.
+    Telemetry must never break the caller, so storage errors are only reported.
+    """
+    try:
+        conn = get_connection()
+        conn.execute('''
+            INSERT INTO LLM_CALLS (
+                timestamp, run_id, caller, prompt_hash, model, latency_ms,
+                input_tokens, output_tokens, cost_usd, cache_hit, fallback_used, error_class
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            datetime.utcnow().isoformat(),
+            run_id,
+            caller,
+            prompt_hash,
+            model,
+            latency_ms,
+            input_tokens,
+            output_tokens,
+            estimate_cost(model, input_tokens, output_tokens),
+            int(cache_hit),
+            int(fallback_used),
+            error_class
+        ))
+        conn.commit()
+        conn.close()
+    except sqlite3.Error as e:
+        print(f"Failed to record LLM telemetry: {e}")
+
+class LLMBudget:
+    """
+    Per-run allowance of LLM tokens and wall-clock seconds.
+    Once either limit is spent, callers fall back to heuristics.
+    """
+
+    def __init__(self, run_id: str = None, max_tokens: int = None, max_seconds: float = None):
+        self.run_id = run_id
+        self.max_tokens = max_tokens
+        self.max_seconds = max_seconds
+        self.tokens_used = 0
+        self.seconds_used = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, run_id: str = None):
+        """Reads STEWARD_LLM_TOKEN_BUDGET / STEWARD_LLM_SECONDS_BUDGET; unset means unlimited."""
+        max_tokens = os.environ.get("STEWARD_LLM_TOKEN_BUDGET")
+        max_seconds = os.environ.get("STEWARD_LLM_SECONDS_BUDGET")
+        return cls(
+            run_id=run_id,
+            max_tokens=int(max_tokens) if max_tokens else None,
+            max_seconds=float(max_seconds) if max_seconds else None
+        )
+
+    def exhausted(self) -> bool:
+        with self._lock:
+            if self.max_tokens is not None and self.tokens_used >= self.max_tokens:
+                return True
+            if self.max_seconds is not None and self.seconds_used >= self.max_seconds:
+                return True
+            return False
+
+    def charge(self, tokens: int, seconds: float):
+        with self._lock:
+            self.tokens_used += tokens
+            self.seconds_used += seconds
+
+class Stopwatch:
+    """Measures wall-clock latency of a block in milliseconds."""
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.elapsed_ms = 0.0
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed_ms = (time.perf_counter() - self.start) * 1000
+        return False
@@ -1,153 +1,394 @@
 import sys
 import json
+import asyncio
 import logging
-from src.reviewer import CodeReviewer
+import logging.handlers
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from src.db import init_db
+from src.query_cache import QueryCache
+from src.reviewer import CodeReviewer, ReviewCancelled
 
-# Setup basic error logging so we don't mess up stdout which is for MCP JSON-RPC
+# Worker threads available for tool calls; each keeps its own pooled DB connection
+MAX_WORKERS = int(os.environ.get("STEWARD_MCP_WORKERS", "4"))
+
+# Logging must not block the event loop or touch stdout (which is for MCP JSON-RPC):
+# records are queued here and written to the file by a listener thread.
 logger = logging.getLogger("mcp")
+logger.setLevel(logging.DEBUG)
+_log_queue = queue.Queue(-1)
+logger.addHandler(logging.handlers.QueueHandler(_log_queue))
 fh = logging.FileHandler("mcp_server.log")
 fh.setLevel(logging.DEBUG)
-logger.addHandler(fh)
-logger.setLevel(logging.DEBUG)
+_log_listener = logging.handlers.QueueListener(_log_queue, fh)
+
+TOOLS = [
+    {
+        "name": "review_changeset",
+        "description": "Reviews code (SQL) or policy changes using the Steward Agent Semantic Governance AI. It checks downstream/upstream lineage against the data ontology, parses the risk using an LLM, and creates enforcement suggestions.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "pr_title": {
+                    "type": "string",
+                    "description": "A title for this change."
+                },
+                "changeset_type": {
+                    "type": "string",
+                    "enum": ["code", "policy"],
+                    "description": "Are they changing an sql 'code' model, or a 'policy' business term?"
+                },
+                "changed_entity": {
+                    "type": "string",
+                    "description": "The exact name of the entity modified, e.g. 'gold_fct_approvals' or 'BT_001'."
+                },
+                "diff_text": {
+                    "type": "string",
+                    "description": "The unified diff containing the changes."
+                }
+            },
+            "required": ["pr_title", "changeset_type", "changed_entity", "diff_text"]
+        }
+    },
+    {
+        "name": "review_pull_request",
+        "description": "Reviews a whole pull request at once. The multi-file unified diff is split per dbt model (models/*.sql) and policy (policies/*.yaml), lineage is resolved for all of them together and a single consolidated report is returned.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "pr_title": {
+                    "type": "string",
+                    "description": "A title for this pull request."
+                },
+                "diff_text": {
+                    "type": "string",
+                    "description": "The full multi-file unified diff of the pull request."
+                }
+            },
+            "required": ["pr_title", "diff_text"]
+        }
+    },
+    {
+        "name": "lineage_of",
+        "description": "Read-only, cached lookup. For a dbt model: its upstream and downstream models and every TDE / business term it feeds, with hop counts. For a TDE id: the columns bound to it and the models they are built from.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "entity": {
+                    "type": "string",
+                    "description": "A dbt model name, e.g. 'silver_stg_loans', or a TDE id, e.g. 'TDE_003'."
+                }
+            },
+            "required": ["entity"]
+        }
+    },
+    {
+        "name": "dq_history",
+        "description": "Read-only, cached lookup of a TDE's recent data quality scores with a trend summary and the thresholds of the rules governing it.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "tde_id": {
+                    "type": "string",
+                    "description": "The TDE id, e.g. 'TDE_003'."
+                },
+                "days": {
+                    "type": "integer",
+                    "description": "How many of the most recent daily scores to return (default 30)."
+                }
+            },
+            "required": ["tde_id"]
+        }
+    },
+    {
+        "name": "open_recommendations",
+        "description": "Read-only, cached list of open enforcement recommendations tracked in AGENT_MEMORY, newest first, each with its predicted DQ impact when one was computed.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "tde_id": {
+                    "type": "string",
+                    "description": "Only recommendations for this TDE."
+                },
+                "model": {
+                    "type": "string",
+                    "description": "Only recommendations for this dbt model."
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "Maximum number of recommendations to return (default 50)."
+                }
+            }
+        }
+    }
+]
 
+REVIEW_TOOLS = ("review_changeset", "review_pull_request")
+QUERY_TOOLS = ("lineage_of", "dq_history", "open_recommendations")
 
-def send_response(response_obj):
-    """Write standard JSON RPC back to the IDE via stdout."""
-    sys.stdout.write(json.dumps(response_obj) + "\n")
-    sys.stdout.flush()
-    logger.debug(f"SENT: {json.dumps(response_obj)}")
+class MCPServer:
+    """
+    asyncio JSON-RPC loop for the IDE. Protocol messages are answered on the loop;
+    tool calls run on a worker pool and their responses are written as each one
+    completes, correlated by request id. In-flight calls can be cancelled.
+    """
 
-def handle_message(message_str):
-    try:
-        msg = json.loads(message_str)
-        logger.debug(f"RECEIVED: {msg}")
-    except json.JSONDecodeError:
-        return
-
-    msg_id = msg.get("id")
-    method = msg.get("method")
-    
-    if method == "initialize":
-        # Handshake with IDE
-        send_response({
+    def __init__(self, out=None, max_workers: int = MAX_WORKERS):
+        self.out = out or sys.stdout
+        # One reviewer shared by all workers: it keeps a connection per worker thread
+        self.reviewer = CodeReviewer()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mcp-tool")
+        # Query tools get their own thread so they never wait behind long reviews
+        self.queries = QueryCache()
+        self.query_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mcp-query")
+        # request id -> (asyncio task, cancel event checked by the reviewer between stages)
+        self.in_flight = {}
+
+    def send_response(self, response_obj):
+        """Write standard JSON RPC back to the IDE via stdout. Only called from the event loop."""
+        payload = json.dumps(response_obj)
+        self.out.write(payload + "\n")
+        self.out.flush()
+        logger.debug(f"SENT: {payload}")
+
+    def send_error(self, msg_id, code, message):
+        self.send_response({
             "jsonrpc": "2.0",
             "id": msg_id,
-            "result": {
-                "protocolVersion": "2024-11-05", # Standard
-                "serverInfo": {
-                    "name": "StewardAgent Server",
-                    "version": "1.0.0"
-                },
-                "capabilities": {
-                    "tools": {} # Expose tools capability
+            "error": {
+                "code": code,
+                "message": message
+            }
+        })
+
+    async def handle_message(self, message_str):
+        try:
+            msg = json.loads(message_str)
+            logger.debug(f"RECEIVED: {msg}")
+        except json.JSONDecodeError:
+            return
+
+        msg_id = msg.get("id")
+        method = msg.get("method")
+
+        if method == "initialize":
+            # Handshake with IDE
+            self.send_response({
+                "jsonrpc": "2.0",
+                "id": msg_id,
+                "result": {
+                    "protocolVersion": "2024-11-05", # Standard
+                    "serverInfo": {
+                        "name": "StewardAgent Server",
+                        "version": "1.0.0"
+                    },
+                    "capabilities": {
+                        "tools": {} # Expose tools capability
+                    }
                 }
+            })
+        elif method == "notifications/initialized":
+            # IDE acknowledged handshake, nothing to send back
+            pass
+
+        elif method == "notifications/cancelled":
+            # IDE no longer wants the result of an in-flight request; no response is sent for it
+            request_id = msg.get("params", {}).get("requestId")
+            entry = self.in_flight.get(request_id)
+            if entry:
+                logger.info(f"Cancelling request {request_id}: {msg.get('params', {}).get('reason')}")
+                task, cancel_event = entry
+                cancel_event.set()
+                task.cancel()
+
+        elif method == "tools/list":
+            # IDE asks what tools we have available
+            self.send_response({
+                "jsonrpc": "2.0",
+                "id": msg_id,
+                "result": {
+                    "tools": TOOLS
+                }
+            })
+
+        elif method == "tools/call":
+            # IDE AI is asking us to run a tool; answer later, when the worker finishes
+            params = msg.get("params", {})
+            progress_token = (params.get("_meta") or {}).get("progressToken")
+            cancel_event = threading.Event()
+            task = asyncio.create_task(
+                self._run_tool(msg_id, params.get("name"), params.get("arguments", {}), cancel_event, progress_token)
+            )
+            self.in_flight[msg_id] = (task, cancel_event)
+            task.add_done_callback(lambda _: self.in_flight.pop(msg_id, None))
+
+        elif msg_id is not None:
+            self.send_error(msg_id, -32601, f"Method not found: {method}")
+
+    def send_progress(self, progress_token, progress, total, message, data, cancel_event):
+        """MCP progress notification for an in-flight tool call; partial findings ride along in _meta."""
+        if cancel_event.is_set():
+            return
+        self.send_response({
+            "jsonrpc": "2.0",
+            "method": "notifications/progress",
+            "params": {
+                "progressToken": progress_token,
+                "progress": progress,
+                "total": total,
+                "message": message,
+                "_meta": {"steward/partialResult": data}
             }
         })
-    elif method == "notifications/initialized":
-        # IDE acknowledged handshake, nothing to send back
-        pass
-        
-    elif method == "tools/list":
-        # IDE asks what tools we have available
-        send_response({
+
+    async def _run_tool(self, msg_id, tool_name, args, cancel_event, progress_token=None):
+        if tool_name in QUERY_TOOLS:
+            await self._run_query(msg_id, tool_name, args)
+            return
+        if tool_name not in REVIEW_TOOLS:
+            self.send_error(msg_id, -32602, f"Unknown tool: {tool_name}")
+            return
+
+        logger.debug(f"Calling CodeReviewer.{tool_name} for {args}")
+        loop = asyncio.get_running_loop()
+        progress_callback = None
+        if progress_token is not None:
+            # Called on the worker thread; notifications are written from the loop, in order,
+            # and always ahead of the final response
+            def progress_callback(stage, progress, total, message, data):
+                logger.debug(f"Progress {msg_id} {stage}: {progress}/{total}")
+                loop.call_soon_threadsafe(
+                    self.send_progress, progress_token, progress, total, message, data, cancel_event
+                )
+        try:
+            # The reviewer natively uses Gemini to reason code changes to business term linking and rules
+            review = await loop.run_in_executor(
+                self.executor, self._call_reviewer, tool_name, args, cancel_event, progress_callback
+            )
+        except (asyncio.CancelledError, ReviewCancelled):
+            logger.info(f"Request {msg_id} cancelled")
+            return
+        except Exception as e:
+            logger.error(f"Error running reviewer: {e}")
+            self.send_error(msg_id, -32603, str(e))
+            return
+
+        # The reviewer returns the rendered markdown report in memory
+        self.send_response({
             "jsonrpc": "2.0",
             "id": msg_id,
             "result": {
-                "tools": [
+                "content": [
                     {
-                        "name": "review_changeset",
-                        "description": "Reviews code (SQL) or policy changes using the Steward Agent Semantic Governance AI. It checks downstream/upstream lineage against the data ontology, parses the risk using an LLM, and creates enforcement suggestions.",
-                        "inputSchema": {
-                            "type": "object",
-                            "properties": {
-                                "pr_title": {
-                                    "type": "string",
-                                    "description": "A title for this change."
-                                },
-                                "changeset_type": {
-                                    "type": "string",
-                                    "enum": ["code", "policy"],
-                                    "description": "Are they changing an sql 'code' model, or a 'policy' business term?"
-                                },
-                                "changed_entity": {
-                                    "type": "string",
-                                    "description": "The exact name of the entity modified, e.g. 'gold_fct_approvals' or 'BT_001'."
-                                },
-                                "diff_text": {
-                                    "type": "string",
-                                    "description": "The unified diff containing the changes."
-                                }
-                            },
-                            "required": ["pr_title", "changeset_type", "changed_entity", "diff_text"]
-                        }
+                        "type": "text",
+                        "text": f"Steward Agent successfully reviewed the change!\\n\\n{review['markdown']}"
                     }
                 ]
             }
         })
-        
-    elif method == "tools/call":
-        # IDE AI is asking us to run a tool
-        params = msg.get("params", {})
-        tool_name = params.get("name")
-        args = params.get("arguments", {})
-        
-        if tool_name == "review_changeset":
-            logger.debug(f"Calling CodeReviewer for {args}")
-            try:
-                # The reviewer natively uses Gemini to reason code changes to business term linking and rules
-                reviewer = CodeReviewer()
-                
-                # The reviewer writes a markdown file to disk containing the AI report
-                reviewer.review_changeset(
-                    pr_title=args.get("pr_title"),
-                    changeset_type=args.get("changeset_type"),
-                    changed_entity=args.get("changed_entity"),
-                    diff_text=args.get("diff_text")
-                )
-                
-                # We read the generated report to pass it back to the IDE
-                with open("pr_review_report.md", "r") as f:
-                    report_text = f.read()
-                    
-                send_response({
-                    "jsonrpc": "2.0",
-                    "id": msg_id,
-                    "result": {
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": f"Steward Agent successfully reviewed the change!\\n\\n{report_text}"
-                            }
-                        ]
-                    }
-                })
-            except Exception as e:
-                logger.error(f"Error running reviewer: {e}")
-                send_response({
-                    "jsonrpc": "2.0",
-                    "id": msg_id,
-                    "error": {
-                        "code": -32603,
-                        "message": str(e)
-                    }
-                })
 
-def start():
-    logger.info("Starting up MCP JSON-RPC Server...")
-    while True:
+    async def _run_query(self, msg_id, tool_name, args):
+        loop = asyncio.get_running_loop()
         try:
-            line = sys.stdin.readline()
-            if not line:
+            result = await loop.run_in_executor(self.query_executor, self._call_query, tool_name, args)
+        except asyncio.CancelledError:
+            return
+        except Exception as e:
+            logger.error(f"Error running {tool_name}: {e}")
+            self.send_error(msg_id, -32603, str(e))
+            return
+
+        self.send_response({
+            "jsonrpc": "2.0",
+            "id": msg_id,
+            "result": {
+                "content": [
+                    {
+                        "type": "text",
+                        "text": json.dumps(result)
+                    }
+                ]
+            }
+        })
+
+    def _call_query(self, tool_name, args):
+        """Runs on the query thread; answered from the in-memory cache."""
+        if tool_name == "lineage_of":
+            return self.queries.lineage_of(args.get("entity"))
+        if tool_name == "dq_history":
+            return self.queries.dq_history(args.get("tde_id"), int(args.get("days", 30)))
+        return self.queries.open_recommendations(
+            tde_id=args.get("tde_id"),
+            model=args.get("model"),
+            limit=int(args.get("limit", 50))
+        )
+
+    def _call_reviewer(self, tool_name, args, cancel_event, progress_callback=None):
+        """Runs on a worker thread."""
+        if tool_name == "review_changeset":
+            return self.reviewer.review_changeset(
+                pr_title=args.get("pr_title"),
+                changeset_type=args.get("changeset_type"),
+                changed_entity=args.get("changed_entity"),
+                diff_text=args.get("diff_text"),
+                cancel_event=cancel_event,
+                progress_callback=progress_callback
+            )
+        return self.reviewer.review_pull_request(
+            pr_title=args.get("pr_title"),
+            diff_text=args.get("diff_text"),
+            cancel_event=cancel_event,
+            progress_callback=progress_callback
+        )
+
+    async def serve(self, stdin=None):
+        stdin = stdin or sys.stdin
+        loop = asyncio.get_running_loop()
+        lines = asyncio.Queue()
+
+        # Blocking reads happen on a daemon thread so the loop stays responsive
+        def read_lines():
+            for line in iter(stdin.readline, ""):
+                loop.call_soon_threadsafe(lines.put_nowait, line)
+            loop.call_soon_threadsafe(lines.put_nowait, None)
+        threading.Thread(target=read_lines, name="mcp-stdin", daemon=True).start()
+
+        while True:
+            line = await lines.get()
+            if line is None:
                 break
             line = line.strip()
             if not line:
                 continue
-            handle_message(line)
-        except KeyboardInterrupt:
-            break
-        except Exception as e:
-            logger.error(f"Unexpected error: {e}")
-            break
+            try:
+                await self.handle_message(line)
+            except Exception as e:
+                logger.error(f"Unexpected error: {e}")
+
+        # stdin closed: let in-flight calls finish and flush their responses
+        pending = [task for task, _ in self.in_flight.values()]
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        self.executor.shutdown(wait=True)
+        self.query_executor.shutdown(wait=True)
+
+def start():
+    _log_listener.start()
+    logger.info("Starting up MCP JSON-RPC Server...")
+    # Make sure the change counters the query cache relies on exist
+    init_db()
+    # Keep the real stdout for JSON-RPC; progress prints from the reviewer go to stderr
+    server = MCPServer(out=sys.stdout)
+    sys.stdout = sys.stderr
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sys.stdout = server.out
+        _log_listener.stop()
 
 if __name__ == "__main__":
     start()
@@ -1,4 +1,5 @@
 from src.db import get_connection, init_db
+from src.lineage_extractor import MODELS_DIR, extract_lineage
 import os
 
 def populate_mock_data():
@@ -40,7 +41,7 @@ def populate_mock_data():
     cursor.executemany("INSERT OR REPLACE INTO DBT_COLUMN_MAPPING VALUES (?, ?, ?)", mappings)
     
     # 5. Load SQL Models (and save files)
-    models_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "models")
+    models_dir = MODELS_DIR
     os.makedirs(models_dir, exist_ok=True)
     
     sql_models = {
@@ -58,6 +59,9 @@ def populate_mock_data():
             
     conn.commit()
     conn.close()
+    
+    # Derive column-level lineage from the SQL just written
+    extract_lineage()
     print("Mock data populated with Medallion Architecture (Home Loan Journey).")
 
 if __name__ == "__main__":
@@ -0,0 +1,218 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import numpy as np
+from src.db import get_connection, init_db
+
+# Knobs of the simulated world and of the intervention policy being evaluated
+DEFAULT_PARAMS = {
+    "base_score": 0.85,          # centre of the daily score without intervention
+    "noise": 0.1,                # half-width of the uniform daily fluctuation
+    "fix_uplift": [0.13, 0.17],  # score gain range while an intervention is in effect
+    "fix_success_rate": 1.0,     # probability that an intervention takes effect
+    "fix_duration_days": None,   # how long a fix lasts; None = for good
+    "threshold_offset": 0.0,     # added to every rule threshold
+    "trend_factor": 1.1,
+    "min_risk": 0.0,             # breaches below this risk score are left alone
+    "interventions_per_day": 1   # the agent investigates one focus a day
+}
+# Seeds simulated together as one array batch (and one process pool task)
+CHUNK_SEEDS = 250
+MAX_WORKERS = int(os.environ.get("STEWARD_SIMULATION_WORKERS", str(os.cpu_count() or 1)))
+
+def load_catalog(conn) -> dict:
+    """TDEs with the strictest rule threshold and the criticality of their business term."""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT t.tde_id, max(r.threshold), b.criticality
+        FROM TDE t
+        JOIN BUSINESS_TERMS b ON b.term_id = t.business_term_id
+        JOIN RULES r ON r.business_term_id = b.term_id
+        GROUP BY t.tde_id
+        ORDER BY t.tde_id
+    ''')
+    rows = cursor.fetchall()
+    return {
+        "tde_ids": [row[0] for row in rows],
+        "thresholds": [row[1] for row in rows],
+        "criticality": [row[2] for row in rows]
+    }
+
+def simulate_chunk(catalog: dict, params: dict, days: int, n_seeds: int, seed_seq, sample_seeds: int = 0) -> dict:
+    """
+    Runs n_seeds independent simulations at once. State is held as (seed, tde)
+    arrays and advanced one day at a time: scores evolve, breaches are detected,
+    the riskiest breaches get interventions that lift the score from the next day.
+    Returns per-seed metrics, plus the events of the first `sample_seeds` seeds.
+    """
+    rng = np.random.default_rng(seed_seq)
+    thresholds = np.asarray(catalog["thresholds"], dtype=float) + params["threshold_offset"]
+    criticality = np.asarray(catalog["criticality"], dtype=float)
+    shape = (n_seeds, len(thresholds))
+    base, noise = params["base_score"], params["noise"]
+    uplift_low, uplift_high = params["fix_uplift"]
+    per_day = min(params["interventions_per_day"], len(thresholds))
+    duration = params["fix_duration_days"]
+
+    fixed_until = np.full(shape, -1.0)       # last day a fix is in effect
+    first_fix_day = np.full(shape, -1)
+    breach_days = np.zeros(shape, dtype=np.int32)
+    streak = np.zeros(shape, dtype=np.int32)
+    longest_breach = np.zeros(shape, dtype=np.int32)
+    score_sum = np.zeros(shape)
+    interventions = np.zeros(n_seeds, dtype=np.int32)
+    events = []
+
+    for day in range(1, days + 1):
+        # 1. Score evolution
+        natural = np.clip(base + rng.uniform(-noise, noise, shape), 0.0, 1.0)
+        improved = np.minimum(1.0, base + rng.uniform(uplift_low, uplift_high, shape))
+        scores = np.where(fixed_until >= day, improved, natural)
+        score_sum += scores
+
+        # 2. Breach detection
+        breached = scores < thresholds
+        breach_days += breached
+        streak = np.where(breached, streak + 1, 0)
+        np.maximum(longest_breach, streak, out=longest_breach)
+
+        # 3. Risk, focus and intervention
+        risk = np.where(breached, criticality * (thresholds - scores) * params["trend_factor"], -np.inf)
+        if per_day == 1:
+            focus = risk.argmax(axis=1)[:, None]
+        else:
+            focus = np.argsort(-risk, axis=1)[:, :per_day]
+        focus_risk = np.take_along_axis(risk, focus, axis=1)
+        attempted = np.isfinite(focus_risk) & (focus_risk >= params["min_risk"])
+        succeeded = attempted & (rng.random(focus.shape) < params["fix_success_rate"])
+        interventions += attempted.sum(axis=1, dtype=np.int32)
+
+        seeds, slots = np.nonzero(succeeded)
+        tdes = focus[seeds, slots]
+        until = np.inf if duration is None else day + duration
+        fixed_until[seeds, tdes] = np.maximum(fixed_until[seeds, tdes], until)
+        first_fix_day[seeds, tdes] = np.where(first_fix_day[seeds, tdes] < 0, day, first_fix_day[seeds, tdes])
+
+        if sample_seeds:
+            events += _sample_events(day, catalog["tde_ids"], scores, risk, breached, focus, attempted, succeeded, sample_seeds)
+
+    return {
+        "breach_days": breach_days,
+        "longest_breach": longest_breach,
+        "mean_score": score_sum / days,
+        "interventions": interventions,
+        "first_fix_day": first_fix_day,
+        "events": events
+    }
+
+def _sample_events(day, tde_ids, scores, risk, breached, focus, attempted, succeeded, sample_seeds) -> list[tuple]:
+    """(seed, day, event_type, tde_id, score, risk_score) rows for the sampled seeds."""
+    events = []
+    for seed, tde in zip(*np.nonzero(breached[:sample_seeds])):
+        events.append((int(seed), day, "rule_breached", tde_ids[tde], float(scores[seed, tde]), float(risk[seed, tde])))
+    for seed, slot in zip(*np.nonzero(attempted[:sample_seeds])):
+        tde = focus[seed, slot]
+        event_type = "intervention_applied" if succeeded[seed, slot] else "intervention_failed"
+        events.append((int(seed), day, event_type, tde_ids[tde], float(scores[seed, tde]), float(risk[seed, tde])))
+    return events
+
+def _distribution(values) -> dict:
+    values = np.asarray(values, dtype=float)
+    p5, p50, p95 = np.percentile(values, [5, 50, 95])
+    return {
+        "mean": float(values.mean()), "std": float(values.std()),
+        "p5": float(p5), "p50": float(p50), "p95": float(p95)
+    }
+
+def summarize(catalog: dict, metrics: dict, days: int) -> dict:
+    """Aggregate statistics across seeds; this is all a run keeps."""
+    breach_days = metrics["breach_days"]
+    first_fix_day = metrics["first_fix_day"]
+    per_tde = {}
+    for i, tde_id in enumerate(catalog["tde_ids"]):
+        fixed = first_fix_day[:, i][first_fix_day[:, i] >= 0]
+        per_tde[tde_id] = {
+            "breach_rate": float(breach_days[:, i].mean() / days),
+            "mean_score": float(metrics["mean_score"][:, i].mean()),
+            "fixed_share": float(len(fixed) / len(first_fix_day)),
+            "median_first_fix_day": float(np.median(fixed)) if len(fixed) else None
+        }
+    return {
+        "breach_rate": _distribution(breach_days.sum(axis=1) / (days * breach_days.shape[1])),
+        "mean_score": _distribution(metrics["mean_score"].mean(axis=1)),
+        "interventions": _distribution(metrics["interventions"]),
+        "longest_breach_days": _distribution(metrics["longest_breach"].max(axis=1)),
+        "per_tde": per_tde
+    }
+
+def run_monte_carlo(seeds: int = 1000, days: int = 365, params: dict = None, base_seed: int = 0,
+                    sample_seeds: int = 0, workers: int = MAX_WORKERS, save: bool = True) -> dict:
+    """
+    Simulates `seeds` independent runs of `days` days against the current catalog.
+    Seeds are split into chunks spread over a process pool; each chunk has its own
+    child of one SeedSequence, so results depend only on base_seed. Aggregates
+    are stored in SIMULATION_RUNS, and only the first `sample_seeds` seeds log events.
+    """
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    conn = get_connection()
+    catalog = load_catalog(conn)
+    if not catalog["tde_ids"]:
+        conn.close()
+        raise ValueError("No TDEs with rules in the catalog; populate the database first.")
+
+    sizes = [min(CHUNK_SEEDS, seeds - start) for start in range(0, seeds, CHUNK_SEEDS)]
+    seed_seqs = np.random.SeedSequence(base_seed).spawn(len(sizes))
+    # Sampled seeds are the first ones, all in the first chunk
+    samples = [min(sample_seeds, sizes[0])] + [0] * (len(sizes) - 1)
+    args = (
+        [catalog] * len(sizes), [params] * len(sizes), [days] * len(sizes), sizes, seed_seqs, samples
+    )
+
+    started = time.perf_counter()
+    if workers > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(sizes))) as pool:
+            chunks = list(pool.map(simulate_chunk, *args))
+    else:
+        chunks = list(map(simulate_chunk, *args))
+    metrics = {
+        key: np.concatenate([chunk[key] for chunk in chunks])
+        for key in ("breach_days", "longest_breach", "mean_score", "interventions", "first_fix_day")
+    }
+    summary = summarize(catalog, metrics, days)
+    duration_s = time.perf_counter() - started
+
+    run = {"seeds": seeds, "days": days, "base_seed": base_seed, "params": params,
+           "summary": summary, "duration_s": duration_s}
+    if save:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO SIMULATION_RUNS (created_at, seeds, days, base_seed, params, summary, duration_s)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (datetime.utcnow().isoformat(), seeds, days, base_seed, json.dumps(params), json.dumps(summary), duration_s))
+        run["run_id"] = cursor.lastrowid
+        cursor.executemany(
+            "INSERT INTO SIMULATION_EVENTS (run_id, seed, day, event_type, tde_id, score, risk_score) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(run["run_id"], *event) for event in chunks[0]["events"]]
+        )
+        conn.commit()
+    conn.close()
+    return run
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 3:
+        print("Usage: python -m src.monte_carlo <seeds> <days> [sample_seeds] [params_json]")
+        sys.exit(1)
+
+    init_db()
+    run = run_monte_carlo(
+        int(sys.argv[1]), int(sys.argv[2]),
+        params=json.loads(sys.argv[4]) if len(sys.argv) > 4 else None,
+        sample_seeds=int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    )
+    print(f"Simulated {run['seeds']} seeds x {run['days']} days in {run['duration_s']:.2f}s"
+          + (f" (run {run['run_id']})" if "run_id" in run else "") + ":")
+    print(json.dumps(run["summary"], indent=2))
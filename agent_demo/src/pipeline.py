@@ -2,16 +2,20 @@ import random
 import sqlite3
 import os
 from datetime import datetime, timedelta
-from src.db import get_connection, init_db
+from src.db import init_db
+from src.dq_series import write_scores
 from src.mock_data import populate_mock_data
+from src.lineage_extractor import extract_lineage
+from src.lineage_graph import build_order, referenced_tables
+from src.shards import DEFAULT_DOMAIN, LANDING_TABLES, domain_models, get_shard_connection, register_tables
 
-def generate_bronze_data(conn, day: int, date_str: str):
+def generate_bronze_data(conn, day: int, date_str: str, domain: str = DEFAULT_DOMAIN):
     """
-    Simulates daily ingestion of raw application data.
+    Simulates daily ingestion of raw application data into the domain's landing tables.
     """
     cursor = conn.cursor()
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS ext_application_source (
+        CREATE TABLE IF NOT EXISTS main.ext_application_source (
             application_id TEXT,
             income_reported TEXT,
             requested_amount REAL,
@@ -64,7 +68,7 @@ def generate_bronze_data(conn, day: int, date_str: str):
     
     # Add a reference table for the gold join if it doesn't exist
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS reference_decisions (
+        CREATE TABLE IF NOT EXISTS main.reference_decisions (
             app_id TEXT,
             status TEXT
         )
@@ -75,110 +79,129 @@ def generate_bronze_data(conn, day: int, date_str: str):
     cursor.executemany("INSERT INTO reference_decisions VALUES (?, ?)", ref_rows)
     
     conn.commit()
+    register_tables(conn, domain, "landing", LANDING_TABLES)
 
-def run_dbt_models(conn):
+def run_dbt_models(conn, domain: str = DEFAULT_DOMAIN) -> list[str]:
     """
-    Executes the SQL content of the dbt models directly against the SQLite DB.
+    Executes the SQL content of the domain's dbt models in DBT_SQL_MODELS directly
+    against the SQLite DB, each after the models it reads, materializing them next to
+    the landing tables (the domain's shard, if sharded). Returns the models built.
     """
     cursor = conn.cursor()
     
-    # Read models from DB to execute in order: Bronze -> Silver -> Gold
-    models = ['bronze_raw_loans', 'silver_stg_loans', 'gold_fct_approvals']
+    # Read models from DB to execute in lineage order: Bronze -> Silver -> Gold
+    sql = domain_models(conn, domain)
+    models = build_order(set(sql), {model: referenced_tables(text) for model, text in sql.items()})
     
     for model in models:
-        cursor.execute("SELECT sql_text FROM DBT_SQL_MODELS WHERE model_name = ?", (model,))
-        row = cursor.fetchone()
-        if not row:
-            continue
-            
-        sql = row['sql_text']
         # We need to wrap it into a CREATE TABLE AS statement to simulate dbt materialization
-        cursor.execute(f"DROP TABLE IF EXISTS {model}")
-        cursor.execute(f"CREATE TABLE {model} AS {sql}")
+        cursor.execute(f'DROP TABLE IF EXISTS main."{model}"')
+        cursor.execute(f'CREATE TABLE main."{model}" AS {sql[model]}')
         
     conn.commit()
+    register_tables(conn, domain, "model", models)
+    return models
+
+# Scoring check per TDE of the loan journey: the materialized table it is measured on and
+# the row condition a valid row satisfies. Checks of other TDEs (e.g. the synthetic
+# catalog's) are stored in TDE_CHECKS. Shared with the what-if sandbox (src/whatif.py).
+DQ_CHECKS = {
+    # R_001 (bronze_raw_loans.income_str): must be positive and explicitly numeric.
+    'TDE_001': ('bronze_raw_loans', "income_str IS NOT NULL AND income_str != '0'"),
+    # R_002 (silver_stg_loans.verified_income): Applicant income must be positive and implicitly numeric
+    'TDE_002': ('silver_stg_loans', "verified_income > 0"),
+    # R_003 (gold_fct_approvals.loan_amount): strictly numeric within approved range (> 0)
+    'TDE_003': ('gold_fct_approvals', "loan_amount > 0"),
+    # R_004 (gold_fct_approvals.final_status): allowed values (APPROVED, REJECTED, PENDING)
+    'TDE_004': ('gold_fct_approvals', "final_status IN ('APPROVED', 'REJECTED', 'PENDING')"),
+}
+
+def load_dq_checks(cursor) -> dict:
+    """tde_id -> (table, condition) for every TDE with a check: DQ_CHECKS plus TDE_CHECKS."""
+    checks = dict(DQ_CHECKS)
+    cursor.execute("SELECT tde_id, table_name, condition FROM TDE_CHECKS")
+    checks.update({row[0]: (row[1], row[2]) for row in cursor.fetchall()})
+    return checks
+
+def score_tde(cursor, tde_id: str, checks: dict = DQ_CHECKS) -> float:
+    """Share of valid rows in the TDE's table; 1.0 when the table is empty."""
+    table, condition = checks[tde_id]
+    cursor.execute(f'SELECT COUNT(*), SUM(CASE WHEN {condition} THEN 1 ELSE 0 END) FROM "{table}"')
+    total, valid = cursor.fetchone()
+    return valid / total if total > 0 else 1.0
 
-def assess_actual_dq_scores(conn, date_str: str):
+def assess_actual_dq_scores(conn, date_str: str, models: list[str]):
     """
-    Compute real DQ scores by executing aggregate queries on the materialized tables.
+    Compute real DQ scores by executing aggregate queries on the materialized tables,
+    for every TDE whose check reads one of `models`.
     """
     cursor = conn.cursor()
-    scores = []
-    
-    # RULES:
-    # R_001 (TDE_001 / bronze_raw_loans.income_str): must be positive and explicitly numeric.
-    # R_002 (TDE_002 / silver_stg_loans.verified_income): Applicant income must be positive and implicitly numeric
-    # R_003 (TDE_003 / gold_fct_approvals.loan_amount): strictly numeric within approved range (> 0)
-    # R_004 (TDE_004 / gold_fct_approvals.final_status): allowed values (APPROVED, REJECTED, PENDING)
-    
-    # Bronze Income Score
-    cursor.execute("SELECT COUNT(*) as total, SUM(CASE WHEN income_str IS NOT NULL AND income_str != '0' THEN 1 ELSE 0 END) as valid FROM bronze_raw_loans")
-    row = cursor.fetchone()
-    score_tde_1 = row['valid'] / row['total'] if row['total'] > 0 else 1.0
-    scores.append((date_str, 'TDE_001', score_tde_1))
-    
-    # Silver Income Score
-    cursor.execute("SELECT COUNT(*) as total, SUM(CASE WHEN verified_income > 0 THEN 1 ELSE 0 END) as valid FROM silver_stg_loans")
-    row = cursor.fetchone()
-    score_tde_2 = row['valid'] / row['total'] if row['total'] > 0 else 1.0
-    scores.append((date_str, 'TDE_002', score_tde_2))
-    
-    # Gold Amount Score
-    cursor.execute("SELECT COUNT(*) as total, SUM(CASE WHEN loan_amount > 0 THEN 1 ELSE 0 END) as valid FROM gold_fct_approvals")
-    row = cursor.fetchone()
-    score_tde_3 = row['valid'] / row['total'] if row['total'] > 0 else 1.0
-    scores.append((date_str, 'TDE_003', score_tde_3))
-    
-    # Gold Status Score
-    cursor.execute("SELECT COUNT(*) as total, SUM(CASE WHEN final_status IN ('APPROVED', 'REJECTED', 'PENDING') THEN 1 ELSE 0 END) as valid FROM gold_fct_approvals")
-    row = cursor.fetchone()
-    score_tde_4 = row['valid'] / row['total'] if row['total'] > 0 else 1.0
-    scores.append((date_str, 'TDE_004', score_tde_4))
+    checks = load_dq_checks(cursor)
+    scores = [
+        (date_str, tde_id, score_tde(cursor, tde_id, checks))
+        for tde_id, (table, _) in sorted(checks.items()) if table in models
+    ]
+
+    # Insert, updating the packed series and weekly/monthly rollups in the same transaction
+    write_scores(cursor, scores)
 
-    # Insert
-    for s in scores:
-        cursor.execute('''
-            INSERT OR REPLACE INTO DQ_SCORES (date, tde_id, score) 
-            VALUES (?, ?, ?)
-        ''', s)
-        
     conn.commit()
     return scores
 
-def run_pipeline(day: int):
+def record_watermarks(conn, date_str: str, domain: str = DEFAULT_DOMAIN):
+    """
+    Moves the domain's 'ingested' and 'scored' watermarks (src/daemon.py) to a day
+    run by hand when it directly follows them, so a daemon's agent, which waits for
+    every domain's scores, picks the day up. Days past a gap leave them where they are.
+    """
+    now = datetime.utcnow().isoformat()
+    with conn:
+        conn.executemany('''
+            INSERT INTO PIPELINE_WATERMARKS (domain, stage, value, updated_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(domain, stage) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+            WHERE excluded.value > PIPELINE_WATERMARKS.value
+              AND excluded.value <= date(PIPELINE_WATERMARKS.value, '+1 day')
+        ''', [(domain, stage, date_str, now) for stage in ("ingested", "scored")])
+
+def run_pipeline(day: int, domain: str = DEFAULT_DOMAIN):
     base_date = datetime(2026, 1, 1)
     current_date = base_date + timedelta(days=day)
     date_str = current_date.strftime("%Y-%m-%d")
     
     print(f"\n[{date_str}] --- PIPELINE STARTING ---")
-    conn = get_connection()
+    conn = get_shard_connection(domain)
     
     # Generate data
-    generate_bronze_data(conn, day, date_str)
+    generate_bronze_data(conn, day, date_str, domain)
     print(f"[{date_str}] Bronze data ingested.")
     
+    # Refresh column lineage (only models whose SQL changed are re-parsed)
+    extract_lineage()
+    
     # Run dbt logic natively
-    run_dbt_models(conn)
-    print(f"[{date_str}] DBT models executed natively.")
+    models = run_dbt_models(conn, domain)
+    print(f"[{date_str}] {len(models)} DBT models executed natively.")
     
     # Compute real scores
-    scores = assess_actual_dq_scores(conn, date_str)
+    scores = assess_actual_dq_scores(conn, date_str, models)
     print(f"[{date_str}] Computed Actual DQ Scores:")
     for s in scores:
          print(f"   {s[1]}: {s[2]:.3f}")
     
+    record_watermarks(conn, date_str, domain)
     conn.close()
     
 if __name__ == "__main__":
     import sys
     if len(sys.argv) < 2:
-        print("Usage: python src/pipeline.py <day_number>")
+        print("Usage: python src/pipeline.py <day_number> [domain]")
         sys.exit(1)
         
     day_num = int(sys.argv[1])
+    # Schema creation is idempotent, so new tables also reach existing databases
+    init_db()
     # Setup if this is Day 1
     if day_num == 1:
-        init_db()
         populate_mock_data()
         
-    run_pipeline(day_num)
+    run_pipeline(day_num, sys.argv[2] if len(sys.argv) > 2 else DEFAULT_DOMAIN)
@@ -1,35 +1,121 @@
 import yaml
+import hashlib
+import json
 import os
+import threading
+import time
+
+ONTOLOGY_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)),
+    "ontology",
+    "policy_ontology.yaml"
+)
+
+# Minimum seconds between mtime checks of an ontology file
+RELOAD_CHECK_INTERVAL = 1.0
+
+class PolicyIndex:
+    """
+    Parsed ontology with every semantic type's required validations compiled
+    into matchers, so checking a rule is one dict lookup plus a few substring tests.
+    """
+
+    def __init__(self, ontology: dict, mtime: float):
+        self.ontology = ontology or {}
+        self.mtime = mtime
+        # semantic_type -> ((requirement, spellings, gap message), ...)
+        self.matchers = {}
+        # semantic_type -> digest of its ontology entry, used to detect changed policies
+        self.entry_hashes = {}
+        for semantic_type, entry in self.ontology.items():
+            self.entry_hashes[semantic_type] = hashlib.sha1(
+                json.dumps(entry, sort_keys=True, default=str).encode('utf-8')
+            ).hexdigest()
+            required = (entry or {}).get('required_validations', []) or []
+            self.matchers[semantic_type] = tuple(
+                (req, _spellings(req), f"Missing required validation: {req}")
+                for req in required
+            )
+
+    def evaluate(self, semantic_type: str, desc_lower: str) -> list[tuple[str, bool]]:
+        """Returns (requirement, covered) for each required validation of the type."""
+        return [
+            (req, any(s in desc_lower for s in spellings))
+            for req, spellings, _ in self.matchers.get(semantic_type, ())
+        ]
+
+    def gaps(self, semantic_type: str, desc_lower: str) -> list[str]:
+        return [
+            message
+            for _, spellings, message in self.matchers.get(semantic_type, ())
+            if not any(s in desc_lower for s in spellings)
+        ]
+
+def _spellings(req: str) -> tuple[str, ...]:
+    # A requirement is satisfied when named either as-is or with spaces ('not_null' / 'not null')
+    spaced = req.replace('_', ' ')
+    return (spaced,) if spaced == req else (spaced, req)
+
+# Process-wide cache: ontology path -> [PolicyIndex, last mtime check]
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_policy_index(ontology_path: str = ONTOLOGY_PATH) -> PolicyIndex:
+    """
+    Returns the compiled index for an ontology file, parsing it only on first use
+    and again whenever the file's mtime changes.
+    """
+    now = time.monotonic()
+    cached = _indexes.get(ontology_path)
+    if cached and now - cached[1] < RELOAD_CHECK_INTERVAL:
+        return cached[0]
+
+    with _indexes_lock:
+        cached = _indexes.get(ontology_path)
+        mtime = os.stat(ontology_path).st_mtime
+        if cached and cached[0].mtime == mtime:
+            cached[1] = now
+            return cached[0]
 
-class PolicyChecker:
-    def __init__(self):
-        ontology_path = os.path.join(
-            os.path.dirname(os.path.dirname(__file__)), 
-            "ontology", 
-            "policy_ontology.yaml"
-        )
         with open(ontology_path, "r") as f:
-            self.ontology = yaml.safe_load(f)
-            
+            index = PolicyIndex(yaml.safe_load(f), mtime)
+        _indexes[ontology_path] = [index, now]
+        return index
+
+class PolicyChecker:
+    def __init__(self, ontology_path: str = ONTOLOGY_PATH):
+        self.ontology_path = ontology_path
+        # Parse eagerly so a broken ontology fails at construction, as before
+        get_policy_index(ontology_path)
+
+    @property
+    def index(self) -> PolicyIndex:
+        return get_policy_index(self.ontology_path)
+
+    @property
+    def ontology(self) -> dict:
+        return self.index.ontology
+
     def check_policy_gaps(self, semantic_type: str, assigned_rule_description: str) -> list[str]:
         """
-        Deterministically checks if the actual validations assigned cover the 
+        Deterministically checks if the actual validations assigned cover the
         required validations for the inferred semantic type.
         """
-        gaps = []
-        
-        if semantic_type not in self.ontology:
-            # If unknown, we can't deterministically verify policy
-            return gaps
-            
-        required_validations = self.ontology[semantic_type].get('required_validations', [])
-        
-        # Simple heuristic to see if required validations are mentioned in the rule description
-        desc_lower = assigned_rule_description.lower()
-        
-        for req in required_validations:
-            # Very naive string matching to simulate checking if validation exists
-            if req.replace('_', ' ') not in desc_lower and req not in desc_lower:
-                gaps.append(f"Missing required validation: {req}")
-                
-        return gaps
+        # Unknown semantic types have no matchers: we can't deterministically verify policy
+        return self.index.gaps(semantic_type, assigned_rule_description.lower())
+
+    def check_all(self, rules) -> dict[str, list[str]]:
+        """
+        Evaluates a whole RULES table in one pass. Each rule is a mapping with
+        'rule_id', 'description' and the inferred 'semantic_type'; returns rule_id -> gaps.
+        """
+        index = self.index
+        results = {}
+        # Rules often share descriptions and types, so identical checks are evaluated once
+        seen = {}
+        for rule in rules:
+            key = (rule['semantic_type'], rule['description'])
+            if key not in seen:
+                seen[key] = index.gaps(key[0], key[1].lower())
+            results[rule['rule_id']] = list(seen[key])
+        return results
@@ -0,0 +1,118 @@
+import hashlib
+from datetime import datetime
+from src.db import get_connection, init_db
+from src.llm_scanner import LLMScanner
+from src.policy_checker import PolicyChecker
+
+def rule_input_hash(column_name: str, rule_description: str) -> str:
+    """Digest of everything semantic type inference and policy matching read from a (TDE, rule) pair."""
+    return hashlib.sha1(f"{column_name}\n{rule_description}".encode('utf-8')).hexdigest()
+
+def _load_pairs(cursor):
+    """Every (TDE, rule) pair governed by the same business term, with the TDE's column name."""
+    cursor.execute('''
+        SELECT t.tde_id, t.name as tde_name, r.rule_id, r.description,
+               (SELECT MIN(m.column_name) FROM DBT_COLUMN_MAPPING m WHERE m.tde_id = t.tde_id) as column_name
+        FROM TDE t
+        JOIN RULES r ON r.business_term_id = t.business_term_id
+    ''')
+    pairs = []
+    for row in cursor.fetchall():
+        # Unmapped TDEs fall back to the column part of their physical name
+        column = row['column_name'] or row['tde_name'].split('.')[-1]
+        pairs.append((row['tde_id'], row['rule_id'], column, row['description']))
+    return pairs
+
+def run_coverage_job(llm_scanner: LLMScanner = None, policy_checker: PolicyChecker = None) -> dict:
+    """
+    Materializes POLICY_COVERAGE for the whole catalog: one row per
+    (TDE, rule, required validation) marked 'covered' or 'missing'.
+    Pairs whose rule/column and ontology entry are unchanged since the last run are skipped.
+    """
+    llm_scanner = llm_scanner or LLMScanner()
+    policy_checker = policy_checker or PolicyChecker()
+    index = policy_checker.index
+
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT tde_id, rule_id, semantic_type, rule_hash, ontology_hash FROM POLICY_COVERAGE_STATE")
+    previous = {(r['tde_id'], r['rule_id']): r for r in cursor.fetchall()}
+
+    stats = {"pairs": 0, "recomputed": 0, "removed": 0}
+    timestamp = datetime.utcnow().isoformat()
+    state_rows = []
+    coverage_rows = []
+    stale_pairs = []
+
+    for tde_id, rule_id, column, description in _load_pairs(cursor):
+        stats["pairs"] += 1
+        rule_hash = rule_input_hash(column, description)
+        prev = previous.pop((tde_id, rule_id), None)
+        if (prev and prev['rule_hash'] == rule_hash
+                and prev['ontology_hash'] == index.entry_hashes.get(prev['semantic_type'])):
+            continue
+
+        semantic_type = llm_scanner.infer_semantic_type(column, description)
+        stats["recomputed"] += 1
+        stale_pairs.append((tde_id, rule_id))
+        state_rows.append((tde_id, rule_id, semantic_type, rule_hash,
+                           index.entry_hashes.get(semantic_type), timestamp))
+        for req, covered in index.evaluate(semantic_type, description.lower()):
+            coverage_rows.append((tde_id, rule_id, req, semantic_type,
+                                  'covered' if covered else 'missing', timestamp))
+
+    # Pairs left over no longer exist (TDE or rule removed, or re-assigned to another term)
+    stale_pairs.extend(previous.keys())
+    stats["removed"] = len(previous)
+
+    cursor.executemany("DELETE FROM POLICY_COVERAGE WHERE tde_id = ? AND rule_id = ?", stale_pairs)
+    cursor.executemany("DELETE FROM POLICY_COVERAGE_STATE WHERE tde_id = ? AND rule_id = ?", previous.keys())
+    cursor.executemany('''
+        INSERT OR REPLACE INTO POLICY_COVERAGE_STATE
+            (tde_id, rule_id, semantic_type, rule_hash, ontology_hash, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', state_rows)
+    cursor.executemany('''
+        INSERT OR REPLACE INTO POLICY_COVERAGE
+            (tde_id, rule_id, required_validation, semantic_type, status, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', coverage_rows)
+
+    conn.commit()
+    conn.close()
+    return stats
+
+def get_coverage_gaps(cursor, tde_id: str, rule_id: str, semantic_type: str,
+                      column_name: str, rule_description: str, policy_checker: PolicyChecker):
+    """
+    Reads the gaps of one (TDE, rule) pair from POLICY_COVERAGE.
+    Returns None when the materialized row is missing or stale, so the caller computes inline.
+    """
+    cursor.execute('''
+        SELECT semantic_type, rule_hash, ontology_hash FROM POLICY_COVERAGE_STATE
+        WHERE tde_id = ? AND rule_id = ?
+    ''', (tde_id, rule_id))
+    state = cursor.fetchone()
+    if (not state
+            or state['semantic_type'] != semantic_type
+            or state['rule_hash'] != rule_input_hash(column_name, rule_description)
+            or state['ontology_hash'] != policy_checker.index.entry_hashes.get(semantic_type)):
+        return None
+
+    cursor.execute('''
+        SELECT required_validation FROM POLICY_COVERAGE
+        WHERE tde_id = ? AND rule_id = ? AND status = 'missing'
+    ''', (tde_id, rule_id))
+    missing = {r['required_validation'] for r in cursor.fetchall()}
+    # Keep the ontology's requirement order and message wording
+    return [
+        message
+        for req, _, message in policy_checker.index.matchers.get(semantic_type, ())
+        if req in missing
+    ]
+
+if __name__ == "__main__":
+    init_db()
+    stats = run_coverage_job()
+    print(f"Policy coverage refreshed: {stats['recomputed']} of {stats['pairs']} (TDE, rule) pairs recomputed, {stats['removed']} removed.")
@@ -0,0 +1,169 @@
+import json
+import threading
+from src.db import get_connection, get_table_versions
+from src.dq_series import get_rollups, latest_scores
+from src.lineage_graph import get_lineage_graph
+
+# Each cached view and the tables it is derived from
+MEMORY_TABLES = ('AGENT_MEMORY',)
+CATALOG_TABLES = ('TDE', 'BUSINESS_TERMS', 'RULES')
+
+class QueryCache:
+    """
+    Read-only lookups over the catalog, DQ score history, open recommendations and
+    lineage. Catalog and recommendations are held in memory: every call checks the
+    TABLE_VERSIONS counters and reloads only the views whose tables changed, so
+    repeated queries never rescan. Score history is read from the packed DQ_SERIES.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # view name -> (versions it was loaded at, data)
+        self._views = {}
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = get_connection()
+            self._local.conn = conn
+        return conn
+
+    def _view(self, name, tables, loader):
+        version = get_table_versions(self.conn, tables)
+        cached = self._views.get(name)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        with self._lock:
+            cached = self._views.get(name)
+            if cached is None or cached[0] != version:
+                cursor = self.conn.cursor()
+                cursor.row_factory = None
+                cached = (version, loader(cursor))
+                self._views[name] = cached
+            return cached[1]
+
+    def _catalog(self):
+        def load(cursor):
+            cursor.execute('''
+                SELECT t.tde_id, t.name, b.term_id, b.name, b.criticality
+                FROM TDE t
+                LEFT JOIN BUSINESS_TERMS b ON t.business_term_id = b.term_id
+            ''')
+            tdes = {
+                tde_id: {"tde_id": tde_id, "name": name, "term_id": term_id, "term": term, "criticality": criticality}
+                for tde_id, name, term_id, term, criticality in cursor.fetchall()
+            }
+            cursor.execute("SELECT rule_id, business_term_id, description, threshold FROM RULES")
+            rules_by_term = {}
+            for rule_id, term_id, description, threshold in cursor.fetchall():
+                rules_by_term.setdefault(term_id, []).append(
+                    {"rule_id": rule_id, "description": description, "threshold": threshold}
+                )
+            return tdes, rules_by_term
+        return self._view("catalog", CATALOG_TABLES, load)
+
+    def _open_recommendations(self):
+        def load(cursor):
+            cursor.execute('''
+                SELECT pr_id, timestamp, tde_id, model_name, suggestion, predicted_impact
+                FROM AGENT_MEMORY
+                WHERE status = 'open'
+                ORDER BY pr_id DESC
+            ''')
+            return [
+                {"pr_id": pr_id, "timestamp": ts, "tde_id": tde_id, "model": model, "suggestion": suggestion,
+                 "predicted_impact": json.loads(impact) if impact else None}
+                for pr_id, ts, tde_id, model, suggestion, impact in cursor.fetchall()
+            ]
+        return self._view("open_recommendations", MEMORY_TABLES, load)
+
+    def lineage_of(self, entity: str) -> dict:
+        """
+        Lineage of a model (upstream/downstream models and the TDEs it feeds, with hops)
+        or of a TDE (the columns bound to it and the models those are built from).
+        """
+        graph = get_lineage_graph(self.conn)
+        tdes, _ = self._catalog()
+
+        if entity in tdes or entity in graph.mappings_by_tde:
+            columns = graph.mappings_by_tde.get(entity, [])
+            upstream = {}
+            for model, _ in columns:
+                for table, hops in graph.upstream_of(model).items():
+                    upstream[table] = min(hops, upstream.get(table, hops))
+            return {
+                "entity": entity,
+                "kind": "tde",
+                "tde": tdes.get(entity),
+                "columns": [{"model": model, "column": column} for model, column in columns],
+                "upstream": _by_hops(upstream)
+            }
+
+        if entity in graph.upstream or entity in graph.models:
+            return {
+                "entity": entity,
+                "kind": "model",
+                "upstream": _by_hops(graph.upstream_of(entity)),
+                "downstream": _by_hops(graph.downstream_of(entity)),
+                "feeds": [
+                    {**c, "term": (tdes.get(c["tde"]) or {}).get("term")}
+                    for c in graph.impacted_columns(entity)
+                ]
+            }
+
+        return {"entity": entity, "kind": "unknown"}
+
+    def dq_history(self, tde_id: str, days: int = 30) -> dict:
+        """
+        The last `days` scores of a TDE with a short trend summary, its rule thresholds
+        and monthly rollups; scores come from the packed series, not a DQ_SCORES scan.
+        """
+        tdes, rules_by_term = self._catalog()
+        cursor = self.conn.cursor()
+        history = latest_scores(cursor, tde_id, days)
+        tde = tdes.get(tde_id)
+        scores = [score for _, score in history]
+        return {
+            "tde": tde,
+            "rules": rules_by_term.get(tde["term_id"], []) if tde else [],
+            "history": [{"date": date, "score": score} for date, score in history],
+            "monthly": get_rollups(cursor, tde_id, "month", start=history[0][0][:8] + "01") if history else [],
+            "summary": {
+                "latest": scores[-1],
+                "min": min(scores),
+                "max": max(scores),
+                "mean": sum(scores) / len(scores),
+                "change": scores[-1] - scores[0]
+            } if scores else None
+        }
+
+    def open_recommendations(self, tde_id: str = None, model: str = None, limit: int = 50) -> list[dict]:
+        """Open AGENT_MEMORY recommendations, newest first, optionally for one TDE and/or model."""
+        recs = self._open_recommendations()
+        if tde_id:
+            recs = [r for r in recs if r["tde_id"] == tde_id]
+        if model:
+            recs = [r for r in recs if r["model"] == model]
+        return recs[:limit]
+
+def _by_hops(hops: dict) -> list[dict]:
+    return [{"table": table, "hops": n} for table, n in sorted(hops.items(), key=lambda x: (x[1], x[0]))]
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 3:
+        print("Usage: python -m src.query_cache <lineage_of|dq_history|open_recommendations> <entity|tde_id|->")
+        sys.exit(1)
+
+    cache = QueryCache()
+    action, arg = sys.argv[1], sys.argv[2]
+    if action == "lineage_of":
+        result = cache.lineage_of(arg)
+    elif action == "dq_history":
+        result = cache.dq_history(arg)
+    else:
+        result = cache.open_recommendations(tde_id=None if arg == "-" else arg)
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,311 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+from src.blobs import resolve
+from src.db import DB_PATH, get_connection
+
+ARCHIVE_DIR = os.path.join(os.path.dirname(DB_PATH), "archive", "event_log")
+MANIFEST_NAME = "manifest.json"
+# Segment path -> investigation ids, for manifest entries written before they were recorded
+_segment_investigations = {}
+
+# Events older than this many days move out of EVENT_LOG into archive segments
+RETENTION_DAYS = int(os.environ.get("STEWARD_EVENT_RETENTION_DAYS", "90"))
+# Events moved per transaction; keeps each write lock short so the agent is never blocked for long
+ARCHIVE_BATCH_SIZE = 2000
+
+EVENT_COLUMNS = (
+    "event_id", "timestamp", "event_type", "entity_type", "entity_id", "entity_name",
+    "context", "metrics", "explanation", "investigation_id"
+)
+
+def load_manifest(archive_dir: str = ARCHIVE_DIR) -> dict:
+    path = os.path.join(archive_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {"segments": []}
+    with open(path, "r") as f:
+        return json.load(f)
+
+def _write_atomic(path: str, data: bytes):
+    """Writes to a temporary file in the same directory, fsyncs it and renames it into place."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp_")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _save_manifest(manifest: dict, archive_dir: str):
+    manifest["updated_at"] = datetime.utcnow().isoformat()
+    _write_atomic(os.path.join(archive_dir, MANIFEST_NAME), json.dumps(manifest, indent=2).encode("utf-8"))
+
+def _write_segment(events: list[dict], archive_dir: str) -> dict:
+    """
+    Writes one immutable, gzip-compressed JSONL segment for events of a single day
+    and returns its manifest entry. The name carries the id range, so it never collides.
+    """
+    date = events[0]["timestamp"][:10]
+    name = f"events_{date}_{events[0]['event_id']}-{events[-1]['event_id']}.jsonl.gz"
+    payload = gzip.compress("".join(json.dumps(e) + "\n" for e in events).encode("utf-8"))
+    _write_atomic(os.path.join(archive_dir, name), payload)
+    return {
+        "file": name,
+        "date": date,
+        "min_event_id": events[0]["event_id"],
+        "max_event_id": events[-1]["event_id"],
+        "min_timestamp": min(e["timestamp"] for e in events),
+        "max_timestamp": max(e["timestamp"] for e in events),
+        "count": len(events),
+        # focus_selected event ids: the investigations opened in this segment
+        "investigation_ids": [e["event_id"] for e in events if e["event_type"] == "focus_selected"],
+        "sha256": hashlib.sha256(payload).hexdigest()
+    }
+
+def read_segment(entry: dict, archive_dir: str = ARCHIVE_DIR) -> list[dict]:
+    with gzip.open(os.path.join(archive_dir, entry["file"]), "rt") as f:
+        return [json.loads(line) for line in f]
+
+def _archive_boundary(cursor, cutoff: str):
+    """
+    First event id that must stay hot: the first event at or after the cutoff, moved
+    back to the start of its investigation so investigations are never split.
+    """
+    cursor.execute(
+        "SELECT event_id, investigation_id FROM EVENT_LOG WHERE timestamp >= ? ORDER BY event_id LIMIT 1",
+        (cutoff,)
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return None  # everything is older than the cutoff
+    return min(row[0], row[1]) if row[1] is not None else row[0]
+
+def archive_events(retention_days: int = RETENTION_DAYS, archive_dir: str = ARCHIVE_DIR,
+                   batch_size: int = ARCHIVE_BATCH_SIZE) -> dict:
+    """
+    Moves events older than retention_days from EVENT_LOG into date-partitioned
+    segments listed in manifest.json. Runs online: each batch is written and
+    fsynced, the manifest is swapped atomically, and only then are the batch's rows
+    deleted in one short transaction. Blob references are resolved so segments
+    are self-contained.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    conn = get_connection()
+    conn.row_factory = None
+    cursor = conn.cursor()
+
+    cutoff = (datetime.utcnow() - timedelta(days=retention_days)).isoformat()
+    boundary = _archive_boundary(cursor, cutoff)
+    manifest = load_manifest(archive_dir)
+    stats = {"archived": 0, "segments": 0}
+
+    # Archival proceeds in event_id order, so hot rows at or below the highest archived
+    # id were archived by a run that stopped before deleting them
+    archived_upto = max((s["max_event_id"] for s in manifest["segments"]), default=0)
+    with conn:
+        conn.execute("DELETE FROM EVENT_LOG WHERE event_id <= ?", (archived_upto,))
+
+    while True:
+        cursor.execute(f'''
+            SELECT {", ".join(EVENT_COLUMNS)} FROM EVENT_LOG
+            WHERE (? IS NULL OR event_id < ?)
+            ORDER BY event_id LIMIT ?
+        ''', (boundary, boundary, batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+
+        events = []
+        for row in rows:
+            event = dict(zip(EVENT_COLUMNS, row))
+            for key in ("context", "metrics"):
+                event[key] = json.loads(event[key]) if event[key] else {}
+            events.append(event)
+        events = resolve(cursor, events)
+
+        by_date = {}
+        for event in events:
+            by_date.setdefault(event["timestamp"][:10], []).append(event)
+        for day_events in by_date.values():
+            manifest["segments"].append(_write_segment(day_events, archive_dir))
+            stats["segments"] += 1
+        manifest["segments"].sort(key=lambda s: (s["date"], s["min_event_id"]))
+        _save_manifest(manifest, archive_dir)
+
+        # Only now that the segments are durable do the rows leave the hot table
+        with conn:
+            conn.execute(
+                "DELETE FROM EVENT_LOG WHERE event_id BETWEEN ? AND ?",
+                (events[0]["event_id"], events[-1]["event_id"])
+            )
+        stats["archived"] += len(events)
+
+    stats["blobs_removed"] = _collect_unreferenced_blobs(conn)
+    conn.close()
+    return stats
+
+def _collect_unreferenced_blobs(conn) -> int:
+    """Deletes blobs no hot event references any more (archived events carry their content)."""
+    with conn:
+        # Immediate transaction: no event can start referencing a blob while we decide
+        conn.execute("BEGIN IMMEDIATE")
+        referenced = set()
+        for (context,) in conn.execute("SELECT context FROM EVENT_LOG WHERE context LIKE '%\"$blob\"%'"):
+            referenced.update(_blob_hashes(json.loads(context)))
+        hashes = [h for (h,) in conn.execute("SELECT hash FROM BLOBS") if h not in referenced]
+        conn.executemany("DELETE FROM BLOBS WHERE hash = ?", [(h,) for h in hashes])
+    return len(hashes)
+
+def _blob_hashes(value):
+    if isinstance(value, dict):
+        if "$blob" in value:
+            yield value["$blob"]
+        else:
+            for v in value.values():
+                yield from _blob_hashes(v)
+    elif isinstance(value, list):
+        for v in value:
+            yield from _blob_hashes(v)
+
+def compact_segments(archive_dir: str = ARCHIVE_DIR) -> int:
+    """
+    Merges the segments of each day into one. The merged segment is written and
+    the manifest swapped before the old files are removed, so readers always see
+    a complete archive. Returns the number of segments merged away.
+    """
+    manifest = load_manifest(archive_dir)
+    by_date = {}
+    for entry in manifest["segments"]:
+        by_date.setdefault(entry["date"], []).append(entry)
+
+    merged_away, obsolete = 0, []
+    segments = []
+    for date, entries in sorted(by_date.items()):
+        if len(entries) == 1:
+            segments += entries
+            continue
+        events = sorted(
+            (e for entry in entries for e in read_segment(entry, archive_dir)),
+            key=lambda e: e["event_id"]
+        )
+        segments.append(_write_segment(events, archive_dir))
+        obsolete += [entry["file"] for entry in entries]
+        merged_away += len(entries) - 1
+
+    if obsolete:
+        manifest["segments"] = segments
+        _save_manifest(manifest, archive_dir)
+        for name in obsolete:
+            if name not in {s["file"] for s in segments}:
+                os.remove(os.path.join(archive_dir, name))
+    return merged_away
+
+def read_events(start: str = None, end: str = None, archive_dir: str = ARCHIVE_DIR) -> list[dict]:
+    """
+    Events with start <= timestamp < end (either bound optional) from the archive
+    and the hot table together, ordered by event_id. Only segments whose date
+    range overlaps the request are opened.
+    """
+    events = []
+    for entry in load_manifest(archive_dir)["segments"]:
+        if (start and entry["max_timestamp"] < start) or (end and entry["min_timestamp"] >= end):
+            continue
+        events += [
+            e for e in read_segment(entry, archive_dir)
+            if (not start or e["timestamp"] >= start) and (not end or e["timestamp"] < end)
+        ]
+
+    conn = get_connection()
+    conn.row_factory = None
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT {", ".join(EVENT_COLUMNS)} FROM EVENT_LOG
+        WHERE (? IS NULL OR timestamp >= ?) AND (? IS NULL OR timestamp < ?)
+        ORDER BY event_id
+    ''', (start, start, end, end))
+    hot = []
+    for row in cursor.fetchall():
+        event = dict(zip(EVENT_COLUMNS, row))
+        for key in ("context", "metrics"):
+            event[key] = json.loads(event[key]) if event[key] else {}
+        hot.append(event)
+    hot = resolve(cursor, hot)
+    conn.close()
+
+    # An event is in exactly one place, but a crash between the manifest swap and
+    # the delete can leave a batch in both; the hot copy is then dropped
+    archived_ids = {e["event_id"] for e in events}
+    events += [e for e in hot if e["event_id"] not in archived_ids]
+    events.sort(key=lambda e: e["event_id"])
+    return events
+
+def read_event_range(first_id: int, last_id: int = None, archive_dir: str = ARCHIVE_DIR) -> list[dict]:
+    """
+    Archived events with first_id <= event_id <= last_id (None: to the end of the
+    archive), ordered by event_id. Only segments whose id range overlaps are opened.
+    """
+    events = []
+    for entry in load_manifest(archive_dir)["segments"]:
+        if entry["max_event_id"] < first_id or (last_id is not None and entry["min_event_id"] > last_id):
+            continue
+        events += [
+            e for e in read_segment(entry, archive_dir)
+            if e["event_id"] >= first_id and (last_id is None or e["event_id"] <= last_id)
+        ]
+    events.sort(key=lambda e: e["event_id"])
+    return events
+
+def archived_investigation_ids(archive_dir: str = ARCHIVE_DIR) -> list[int]:
+    """
+    Ids of the archived investigations, oldest first, from the manifest. Segments
+    listed before the manifest recorded them are read once per process; they never change.
+    """
+    ids = []
+    for entry in load_manifest(archive_dir)["segments"]:
+        if "investigation_ids" not in entry:
+            path = os.path.join(archive_dir, entry["file"])
+            if path not in _segment_investigations:
+                _segment_investigations[path] = [
+                    e["event_id"] for e in read_segment(entry, archive_dir) if e["event_type"] == "focus_selected"
+                ]
+            ids += _segment_investigations[path]
+        else:
+            ids += entry["investigation_ids"]
+    return sorted(ids)
+
+def last_event_id_at(timestamp: str, archive_dir: str = ARCHIVE_DIR) -> int:
+    """
+    Id of the last archived event at or before `timestamp` (0 when there is none).
+    Only the segments whose time range straddles it are opened.
+    """
+    last_id = 0
+    for entry in load_manifest(archive_dir)["segments"]:
+        if entry["min_timestamp"] > timestamp:
+            continue
+        if entry["max_timestamp"] <= timestamp:
+            last_id = max(last_id, entry["max_event_id"])
+        else:
+            last_id = max([last_id] + [
+                e["event_id"] for e in read_segment(entry, archive_dir) if e["timestamp"] <= timestamp
+            ])
+    return last_id
+
+if __name__ == "__main__":
+    import sys
+
+    from src.state_snapshots import write_state_snapshots
+
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else RETENTION_DAYS
+    snapshots = write_state_snapshots()
+    stats = archive_events(days)
+    merged = compact_segments()
+    print(f"Archived {stats['archived']} events older than {days} days into {stats['segments']} segment(s); "
+          f"merged {merged} segment(s); removed {stats['blobs_removed']} unreferenced blob(s); "
+          f"wrote {snapshots} state snapshot(s).")
@@ -1,169 +1,612 @@
 import json
+import re
 import sqlite3
 import os
+import tempfile
+import threading
+import uuid
+import yaml
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from src.db import get_connection
+from src.lineage_graph import get_lineage_graph
+from src.llm_scanner import LLMScanner
+from src.llm_telemetry import SIMULATED_MODEL, Stopwatch, hash_prompt, record_llm_call
+from src.policy_checker import ONTOLOGY_PATH
+from src.whatif import apply_unified_diff, predict_diff_impact
+
+class ReviewCancelled(Exception):
+    """Raised between review stages once the caller has cancelled the review."""
+
+def _check_cancelled(cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        raise ReviewCancelled()
+
+def _notify(progress_callback, stage, progress, total, message, data=None):
+    if progress_callback is not None:
+        progress_callback(stage, progress, total, message, data or {})
 
 class CodeReviewer:
+    """
+    Reviews code and policy changes. One instance can serve concurrent reviews:
+    each thread gets its own SQLite connection and reports are built in memory.
+    """
+    
     def __init__(self):
-        self.conn = get_connection()
-        self.conn.row_factory = sqlite3.Row
+        self._local = threading.local()
+        
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = get_connection()
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
 
-    def review_changeset(self, pr_title: str, changeset_type: str, changed_entity: str, diff_text: str):
+    def review_changeset(self, pr_title: str, changeset_type: str, changed_entity: str, diff_text: str,
+                         report_dir: str = None, cancel_event: threading.Event = None,
+                         progress_callback=None):
+        """
+        Reviews one changed model or policy. Returns the analysis with the impacted
+        paths and the rendered markdown; the report is only written to disk
+        (under a unique name) when report_dir is given. Setting cancel_event stops
+        the review at the next stage or path boundary, before anything is saved.
+        progress_callback(stage, progress, total, message, data) is called as each
+        stage completes, with the partial findings of that stage.
+        """
         print(f"\n--- STARTING PR REVIEW: {pr_title} ---")
         
-        impacted_paths = []
-        
         # 1. Trace Lineage
+        impacted_paths = self._trace_impacted_paths(changeset_type, changed_entity)
+        _check_cancelled(cancel_event)
+        total = len(impacted_paths) + 2
+        _notify(progress_callback, "lineage_traced", 1, total,
+                f"Traced {len(impacted_paths)} impacted path(s) for `{changed_entity}`.",
+                {"impacted_paths": impacted_paths})
+        
+        # 2. Mock LLM Analysis, streamed one path at a time
+        print("Analyzing enforcement opportunities using LLM...")
+        def on_path(i, path, recs):
+            _check_cancelled(cancel_event)
+            _notify(progress_callback, "path_analyzed", i + 2, total,
+                    render_path_finding(changeset_type, changed_entity, path, recs),
+                    {"path": path, "recommendations": recs})
+            
+        with Stopwatch() as timer:
+            llm_reasoning = self._mock_llm_analyze(changeset_type, diff_text, impacted_paths, on_path)
+        record_llm_call(
+            "reviewer.review_changeset",
+            hash_prompt(f"{changeset_type}\n{diff_text}"),
+            SIMULATED_MODEL,
+            timer.elapsed_ms
+        )
+        _check_cancelled(cancel_event)
+        
+        # 3. What-if: the DQ scores the change would produce, when its diff applies
+        predicted_impact = predict_diff_impact(changed_entity, diff_text) if changeset_type == "code" else None
+        
+        # 4. Store Enforcement Opportunity in Memory
+        print("Saving enforcement opportunities to Persistent AGENT_MEMORY...")
+        self._save_to_memory(llm_reasoning["recommendations"], predicted_impact)
+        _notify(progress_callback, "recommendations_saved", total, total,
+                f"Saved {len(llm_reasoning['recommendations'])} recommendation(s) to AGENT_MEMORY.",
+                {"observations": llm_reasoning["observations"]})
+            
+        # 5. Generate GitHub-style PR Comment (Markdown), in memory
+        markdown = render_markdown_report(pr_title, changeset_type, changed_entity, impacted_paths, llm_reasoning,
+                                          predicted_impact)
+        report_path = write_report(markdown, report_dir) if report_dir else None
+        
+        print(f"--- PR REVIEW COMPLETE ---")
+        return {
+            **llm_reasoning,
+            "impacted_paths": impacted_paths,
+            "predicted_impact": predicted_impact,
+            "markdown": markdown,
+            "report_path": report_path
+        }
+        
+    def review_pull_request(self, pr_title: str, diff_text: str, max_workers: int = 8,
+                            report_dir: str = None, cancel_event: threading.Event = None,
+                            progress_callback=None):
+        """
+        Reviews a whole multi-file unified diff in one pass: the diff is split per
+        model or policy file, lineage for every piece is resolved together, the pieces
+        are analyzed concurrently and all recommendations are stored in one transaction.
+        Progress is reported like review_changeset, with paths of all changes counted together.
+        """
+        print(f"\n--- STARTING BATCH PR REVIEW: {pr_title} ---")
+        
+        # 1. Split the PR into per-entity changes
+        changes, unmapped = split_unified_diff(diff_text)
+        changes = self._expand_ontology_changes(changes)
+        print(f"Split PR into {len(changes)} reviewable change(s), {len(unmapped)} unmapped file(s).")
+        
+        # 2. Trace lineage for all changes at once
+        impacts = self._trace_impacted_paths_bulk([(c["changeset_type"], c["entity"]) for c in changes])
+        _check_cancelled(cancel_event)
+        total = sum(len(impacts[(c["changeset_type"], c["entity"])]) for c in changes) + 2
+        _notify(progress_callback, "lineage_traced", 1, total,
+                f"Traced {total - 2} impacted path(s) across {len(changes)} change(s).",
+                {"changes": [{"path": c["path"], "impacted_paths": impacts[(c["changeset_type"], c["entity"])]}
+                             for c in changes]})
+        
+        # 3. Analyze each change concurrently
+        print("Analyzing enforcement opportunities using LLM...")
+        done = [1]
+        done_lock = threading.Lock()
+        def analyze(change):
+            def on_path(i, path, recs):
+                _check_cancelled(cancel_event)
+                with done_lock:
+                    done[0] += 1
+                    _notify(progress_callback, "path_analyzed", done[0], total,
+                            render_path_finding(change["changeset_type"], change["entity"], path, recs),
+                            {"file": change["path"], "path": path, "recommendations": recs})
+            return self._mock_llm_analyze(
+                change["changeset_type"], change["diff"],
+                impacts[(change["changeset_type"], change["entity"])], on_path
+            )
+            
+        with Stopwatch() as timer:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                analyses = list(pool.map(analyze, changes))
+        record_llm_call(
+            "reviewer.review_pull_request",
+            hash_prompt(diff_text),
+            SIMULATED_MODEL,
+            timer.elapsed_ms
+        )
+        
+        _check_cancelled(cancel_event)
+        
+        # 4. What-if per changed model, each in its own sandbox
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            predictions = list(pool.map(
+                lambda c: predict_diff_impact(c["entity"], c["diff"]) if c["changeset_type"] == "code" else None,
+                changes
+            ))
+        
+        results = []
+        for change, analysis, predicted_impact in zip(changes, analyses, predictions):
+            results.append({
+                **change,
+                "impacted_paths": impacts[(change["changeset_type"], change["entity"])],
+                **analysis,
+                "predicted_impact": predicted_impact
+            })
+        recommendations = [r for result in results for r in result["recommendations"]]
+        _check_cancelled(cancel_event)
+        
+        # 5. Store every recommendation in one transaction
+        print(f"Saving {len(recommendations)} enforcement opportunities to Persistent AGENT_MEMORY...")
+        self._save_to_memory(recommendations, [result["predicted_impact"] for result in results
+                                               for _ in result["recommendations"]])
+        _notify(progress_callback, "recommendations_saved", total, total,
+                f"Saved {len(recommendations)} recommendation(s) to AGENT_MEMORY.",
+                {"observations": {r["path"]: r["observations"] for r in results}})
+        
+        # 6. Consolidated PR comment, in memory
+        markdown = render_batch_markdown_report(pr_title, results, unmapped)
+        report_path = write_report(markdown, report_dir) if report_dir else None
+        
+        print(f"--- BATCH PR REVIEW COMPLETE ---")
+        return {
+            "changes": results,
+            "unmapped_files": unmapped,
+            "recommendations": recommendations,
+            "markdown": markdown,
+            "report_path": report_path
+        }
+        
+    def _terms_by_semantic_type(self):
+        """
+        Business terms per ontology entry (semantic type), through the semantic types of
+        their TDEs: as recorded by the coverage job, or inferred the same way it does.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT t.business_term_id, t.name as tde_name, r.description, s.semantic_type,
+                   (SELECT MIN(m.column_name) FROM DBT_COLUMN_MAPPING m WHERE m.tde_id = t.tde_id) as column_name
+            FROM TDE t
+            JOIN RULES r ON r.business_term_id = t.business_term_id
+            LEFT JOIN POLICY_COVERAGE_STATE s ON s.tde_id = t.tde_id AND s.rule_id = r.rule_id
+        ''')
+        scanner = LLMScanner()
+        terms = {}
+        for row in cursor.fetchall():
+            semantic_type = row["semantic_type"] or scanner.infer_semantic_type(
+                row["column_name"] or row["tde_name"].split('.')[-1], row["description"]
+            )
+            terms.setdefault(semantic_type, set()).add(row["business_term_id"])
+        return terms
+
+    def _expand_ontology_changes(self, changes):
+        """
+        Replaces each change to the policy ontology by one policy change per business
+        term governed by the entries it edits, so the policy review traces those terms.
+        An edit that touches no term's entries is still reviewed, under the file's name.
+        """
+        if not any(c["changeset_type"] == "ontology" for c in changes):
+            return changes
+        terms_by_type = self._terms_by_semantic_type()
+        expanded = []
+        for change in changes:
+            if change["changeset_type"] != "ontology":
+                expanded.append(change)
+                continue
+            current_path = os.path.join(os.path.dirname(ONTOLOGY_PATH), os.path.basename(change["path"]))
+            current = None
+            if os.path.exists(current_path):
+                with open(current_path) as f:
+                    current = f.read()
+            entries = changed_ontology_entries(current, change["diff"])
+            if entries is None:
+                # Edits that cannot be placed may affect any entry
+                entries = sorted(terms_by_type)
+            terms = sorted({term for entry in entries for term in terms_by_type.get(entry, ())})
+            for entity in terms or [change["entity"]]:
+                expanded.append({**change, "changeset_type": "policy", "entity": entity, "ontology_entries": entries})
+        return expanded
+        
+    def _trace_impacted_paths(self, changeset_type, changed_entity):
         if changeset_type == "policy":
             # Policy Rule changed. Trace Rule -> Term -> TDE -> Model
             print(f"Tracing downstream impact for modified policy on '{changed_entity}'...")
+        elif changeset_type == "code":
+            # DBT Model changed. Trace Model -> downstream Models -> TDE -> Term -> Policy Rule
+            print(f"Tracing upstream policy impact for modified DBT model '{changed_entity}'...")
             
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT m.model_name, m.column_name, t.tde_id, b.name as term_name
+        impacts = self._trace_impacted_paths_bulk([(changeset_type, changed_entity)])
+        return impacts.get((changeset_type, changed_entity), [])
+        
+    def _trace_impacted_paths_bulk(self, changes):
+        """
+        Resolves the impacted paths of many (changeset_type, entity) changes at once:
+        model reachability comes from the in-memory lineage graph, and terms/rules
+        for every affected TDE are fetched with one set-based query per change type.
+        """
+        impacts = {change: [] for change in changes}
+        graph = get_lineage_graph(self.conn)
+        cursor = self.conn.cursor()
+        
+        policies = sorted({entity for c_type, entity in changes if c_type == "policy"})
+        if policies:
+            placeholders = ','.join('?' * len(policies))
+            cursor.execute(f'''
+                SELECT t.tde_id, b.term_id, b.name as term_name
                 FROM BUSINESS_TERMS b
                 JOIN TDE t ON t.business_term_id = b.term_id
-                JOIN DBT_COLUMN_MAPPING m ON m.tde_id = t.tde_id
-                WHERE b.term_id = ? OR b.name = ?
-            ''', (changed_entity, changed_entity))
+                WHERE b.term_id IN ({placeholders}) OR b.name IN ({placeholders})
+            ''', policies + policies)
             
             for row in cursor.fetchall():
-                impacted_paths.append({
-                    "model": row["model_name"],
-                    "column": row["column_name"],
-                    "tde": row["tde_id"],
-                    "term": row["term_name"]
-                })
-                
-        elif changeset_type == "code":
-            # DBT Model changed. Trace Model -> TDE -> Term -> Policy Rule
-            print(f"Tracing upstream policy impact for modified DBT model '{changed_entity}'...")
-            
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT m.column_name, t.tde_id, b.name as term_name, r.description as rule
-                FROM DBT_COLUMN_MAPPING m
-                JOIN TDE t ON m.tde_id = t.tde_id
+                for entity in (row["term_id"], row["term_name"]):
+                    paths = impacts.get(("policy", entity))
+                    if paths is None:
+                        continue
+                    for model, column in graph.mappings_by_tde.get(row["tde_id"], ()):
+                        paths.append({
+                            "model": model,
+                            "column": column,
+                            "tde": row["tde_id"],
+                            "term": row["term_name"]
+                        })
+                        
+        models = sorted({entity for c_type, entity in changes if c_type == "code"})
+        impacted_by_model = {model: graph.impacted_columns(model) for model in models}
+        tde_ids = sorted({c["tde"] for impacted in impacted_by_model.values() for c in impacted})
+        if tde_ids:
+            cursor.execute(f'''
+                SELECT t.tde_id, b.name as term_name, r.description as rule
+                FROM TDE t
                 JOIN BUSINESS_TERMS b ON t.business_term_id = b.term_id
                 JOIN RULES r ON r.business_term_id = b.term_id
-                WHERE m.model_name = ?
-            ''', (changed_entity,))
-            
+                WHERE t.tde_id IN ({','.join('?' * len(tde_ids))})
+            ''', tde_ids)
+            rules_by_tde = {}
             for row in cursor.fetchall():
-                impacted_paths.append({
-                    "model": changed_entity,
-                    "column": row["column_name"],
-                    "tde": row["tde_id"],
-                    "term": row["term_name"],
-                    "rule": row["rule"]
-                })
-        
-        # 2. Mock LLM Analysis
-        print("Analyzing enforcement opportunities using LLM...")
-        llm_reasoning = self._mock_llm_analyze(changeset_type, diff_text, impacted_paths)
-        
-        # 3. Store Enforcement Opportunity in Memory
-        print("Saving enforcement opportunities to Persistent AGENT_MEMORY...")
-        for rec in llm_reasoning["recommendations"]:
-            self._save_to_memory(rec["tde_id"], rec["model"], rec["suggestion"])
-            
-        # 4. Generate GitHub-style PR Comment (Markdown)
-        self._generate_markdown_report(pr_title, changeset_type, changed_entity, diff_text, impacted_paths, llm_reasoning)
-        
-        print(f"--- PR REVIEW COMPLETE ---")
-        return llm_reasoning
-        
-    def _mock_llm_analyze(self, c_type, diff, paths):
-        # Simulated LLM logic interpreting the diff against the lineage paths
-        recs = []
-        observations = []
+                rules_by_tde.setdefault(row["tde_id"], []).append(row)
+                
+            for model, impacted in impacted_by_model.items():
+                paths = impacts[("code", model)]
+                for c in impacted:
+                    for row in rules_by_tde.get(c["tde"], ()):
+                        paths.append({
+                            "model": c["model"],
+                            "column": c["column"],
+                            "tde": c["tde"],
+                            "term": row["term_name"],
+                            "rule": row["rule"],
+                            "hops": c["hops"]
+                        })
+                        
+        return impacts
         
+    def _mock_llm_findings(self, c_type, diff):
+        # Simulated LLM reading of the diff: (kind, observation) pairs
+        findings = []
         if c_type == "code":
-            if "LEFT JOIN" in diff.upper() or "JOIN" in diff.upper():
-                observations.append("LLM detected a new JOIN introduced in the model. This risks fan-out multiplying rows.")
-                for p in paths:
-                    recs.append({
-                        "tde_id": p["tde"],
-                        "model": p["model"],
-                        "suggestion": f"Enforce distinct validation on `{p['column']}` post-join to guarantee '{p['rule']}' rule isn't broken by duplicates."
-                    })
+            if "JOIN" in diff.upper():
+                findings.append(("join", "LLM detected a new JOIN introduced in the model. This risks fan-out multiplying rows."))
             if "COALESCE" in diff.upper():
-                observations.append("LLM detected COALESCE being used to mask NULLs.")
-                for p in paths:
-                     recs.append({
-                        "tde_id": p["tde"],
-                        "model": p["model"],
-                        "suggestion": f"Determine root cause of nulls in upstream model instead of relying on COALESCE for `{p['column']}`."
-                    })
-                    
+                findings.append(("coalesce", "LLM detected COALESCE being used to mask NULLs."))
         elif c_type == "policy":
-             observations.append("LLM detected a policy threshold tightening.")
-             for p in paths:
-                 recs.append({
-                     "tde_id": p["tde"],
-                     "model": p["model"],
-                     "suggestion": f"Add stricter dbt tests on `{p['model']}.{p['column']}` to enforce the new strict threshold for '{p['term']}'."
-                 })
-                 
+            findings.append(("policy", "LLM detected a policy threshold tightening."))
+        return findings
+
+    def _mock_llm_suggest(self, kind, p):
+        # Simulated LLM suggestion for one finding on one lineage path
+        if kind == "join":
+            return f"Enforce distinct validation on `{p['column']}` post-join to guarantee '{p['rule']}' rule isn't broken by duplicates."
+        if kind == "coalesce":
+            return f"Determine root cause of nulls in upstream model instead of relying on COALESCE for `{p['column']}`."
+        return f"Add stricter dbt tests on `{p['model']}.{p['column']}` to enforce the new strict threshold for '{p['term']}'."
+
+    def _mock_llm_analyze(self, c_type, diff, paths, on_path=None):
+        """
+        Simulated LLM logic interpreting the diff against the lineage paths. Paths are
+        analyzed one at a time and on_path(index, path, recommendations) is called
+        after each, so callers can stream partial findings.
+        """
+        findings = self._mock_llm_findings(c_type, diff)
+        recs_by_finding = [[] for _ in findings]
+        
+        for i, p in enumerate(paths):
+            path_recs = []
+            for group, (kind, _) in zip(recs_by_finding, findings):
+                rec = {
+                    "tde_id": p["tde"],
+                    "model": p["model"],
+                    "suggestion": self._mock_llm_suggest(kind, p)
+                }
+                group.append(rec)
+                path_recs.append(rec)
+            if on_path:
+                on_path(i, p, path_recs)
+                
+        # Recommendations stay grouped by finding, as in the rendered report
+        recs = [rec for group in recs_by_finding for rec in group]
+        observations = [text for _, text in findings]
         if not recs:
             observations.append("Looks good. No critical policy gaps introduced.")
             
         return {"observations": observations, "recommendations": recs}
 
-    def _save_to_memory(self, tde_id, model, suggestion):
-       cursor = self.conn.cursor()
+    def _save_to_memory(self, recommendations, predicted_impact=None):
+       """
+       Inserts all recommendations into AGENT_MEMORY in a single transaction. predicted_impact
+       is the what-if result of the change they came from, or a list with one per recommendation.
+       """
        timestamp = datetime.utcnow().isoformat()
-       cursor.execute('''
-           INSERT INTO AGENT_MEMORY (timestamp, tde_id, model_name, suggestion, status)
-           VALUES (?, ?, ?, ?, 'open')
-       ''', (timestamp, tde_id, model, suggestion))
-       self.conn.commit()
+       if not isinstance(predicted_impact, list):
+           predicted_impact = [predicted_impact] * len(recommendations)
+       with self.conn:
+           self.conn.executemany('''
+               INSERT INTO AGENT_MEMORY (timestamp, tde_id, model_name, suggestion, status, predicted_impact)
+               VALUES (?, ?, ?, ?, 'open', ?)
+           ''', [(timestamp, r["tde_id"], r["model"], r["suggestion"], json.dumps(impact) if impact else None)
+                 for r, impact in zip(recommendations, predicted_impact)])
        
-    def _generate_markdown_report(self, title, c_type, entity, diff, paths, llm_reasoning):
-        report_path = "pr_review_report.md"
-        with open(report_path, "w") as f:
-            f.write(f"## 🤖 Steward Agent Code Review\n\n")
-            f.write(f"**PR:** {title}\n")
-            f.write(f"**Type:** {c_type.capitalize()} Update on `{entity}`\n\n")
-            
-            f.write("### 🔍 Lineage Impact Analysis\n")
-            if not paths:
-                f.write("No direct lineage impact found to regulated Business Terms.\n\n")
-            else:
-                f.write("I traced this change through our data semantic graph and found the following impacted paths:\n")
-                for p in paths:
-                    if c_type == "code":
-                         f.write(f"- DB Model `{p['model']}.{p['column']}` -> TDE `{p['tde']}` -> Business Term **{p['term']}** (governed by rule: _{p['rule']}_)\n")
-                    else:
-                         f.write(f"- Policy **{p['term']}** -> TDE `{p['tde']}` -> downstream DB Model `{p['model']}.{p['column']}`\n")
-                f.write("\n")
-                
-            f.write("### 🧠 LLM Reasoning & Observations\n")
-            for obs in llm_reasoning["observations"]:
-                f.write(f"- {obs}\n")
-            f.write("\n")
-            
-            f.write("### 💡 Enforcement Opportunities\n")
-            if llm_reasoning["recommendations"]:
-                f.write("I have noted the following recommendations into `AGENT_MEMORY` so that they can be tracked during our daily governance pipeline runs:\n")
-                for r in llm_reasoning["recommendations"]:
-                    f.write(f"- [Tracked] For `{r['model']}`: {r['suggestion']}\n")
-            else:
-                f.write("No specific enforcement actions required.\n")
-                
-        print(f"Generated PR Comment Markdown Document: {report_path}")
+def _render_lineage_lines(c_type, entity, paths, heading, intro=None):
+    lines = [heading]
+    if not paths:
+        lines.append("No direct lineage impact found to regulated Business Terms.\n")
+        return lines
+    if intro:
+        lines.append(intro)
+    for p in paths:
+        if c_type == "code":
+            via = f" ({p['hops']} hop(s) downstream of `{entity}`)" if p.get('hops') else ""
+            lines.append(f"- DB Model `{p['model']}.{p['column']}`{via} -> TDE `{p['tde']}` -> Business Term **{p['term']}** (governed by rule: _{p['rule']}_)")
+        else:
+            lines.append(f"- Policy **{p['term']}** -> TDE `{p['tde']}` -> downstream DB Model `{p['model']}.{p['column']}`")
+    lines.append("")
+    return lines
+
+def render_path_finding(c_type, entity, path, recommendations) -> str:
+    """Renders the findings for a single impacted path as a short markdown snippet."""
+    lines = _render_lineage_lines(c_type, entity, [path], f"Analyzed `{path['model']}.{path['column']}`:")[:2]
+    lines += [f"- [Tracked] For `{r['model']}`: {r['suggestion']}" for r in recommendations]
+    return "\n".join(lines)
+
+def _render_recommendation_lines(recommendations):
+    lines = ["### 💡 Enforcement Opportunities"]
+    if recommendations:
+        lines.append("I have noted the following recommendations into `AGENT_MEMORY` so that they can be tracked during our daily governance pipeline runs:")
+        for r in recommendations:
+            lines.append(f"- [Tracked] For `{r['model']}`: {r['suggestion']}")
+    else:
+        lines.append("No specific enforcement actions required.")
+    return lines
+
+def _render_impact_lines(predicted_impact, heading):
+    """What-if DQ score deltas of a code change, or why none could be predicted."""
+    if not predicted_impact:
+        return []
+    lines = [heading]
+    if "error" in predicted_impact:
+        lines.append(f"No prediction: {predicted_impact['error']}\n")
+        return lines
+    if not predicted_impact["tdes"]:
+        lines.append("No scored TDE is built from the changed models.\n")
+        return lines
+    sample = " (on a sample of the inputs)" if predicted_impact.get("sampled") else ""
+    lines.append(f"Rebuilt {', '.join(f'`{m}`' for m in predicted_impact['changed_models'])} in a sandbox{sample}:")
+    for tde, p in predicted_impact["tdes"].items():
+        lines.append(f"- TDE `{tde}`: {p['baseline']:.3f} -> {p['predicted']:.3f} ({p['delta']:+.3f})")
+    lines.append("")
+    return lines
+
+def render_markdown_report(title, c_type, entity, paths, llm_reasoning, predicted_impact=None) -> str:
+    """Renders a single-change review as a GitHub-style PR comment."""
+    lines = [
+        "## 🤖 Steward Agent Code Review\n",
+        f"**PR:** {title}",
+        f"**Type:** {c_type.capitalize()} Update on `{entity}`\n"
+    ]
+    lines += _render_lineage_lines(
+        c_type, entity, paths, "### 🔍 Lineage Impact Analysis",
+        intro="I traced this change through our data semantic graph and found the following impacted paths:"
+    )
+    lines += _render_impact_lines(predicted_impact, "### 🧪 Predicted DQ Impact")
+    lines.append("### 🧠 LLM Reasoning & Observations")
+    lines += [f"- {obs}" for obs in llm_reasoning["observations"]]
+    lines.append("")
+    lines += _render_recommendation_lines(llm_reasoning["recommendations"])
+    return "\n".join(lines) + "\n"
+
+def render_batch_markdown_report(title, results, unmapped) -> str:
+    """Renders a whole-PR review as one consolidated PR comment."""
+    lines = [
+        "## 🤖 Steward Agent Code Review\n",
+        f"**PR:** {title}",
+        f"**Changes reviewed:** {len(results)}\n"
+    ]
+    for result in results:
+        c_type, entity = result["changeset_type"], result["entity"]
+        lines.append(f"### {c_type.capitalize()} Update on `{entity}` (`{result['path']}`)\n")
+        if result.get("ontology_entries"):
+            lines.append(f"Changed ontology entries: {', '.join(f'`{e}`' for e in result['ontology_entries'])}\n")
+        lines += _render_lineage_lines(c_type, entity, result["impacted_paths"], "#### 🔍 Lineage Impact Analysis")
+        lines += _render_impact_lines(result.get("predicted_impact"), "#### 🧪 Predicted DQ Impact")
+        lines.append("#### 🧠 LLM Reasoning & Observations")
+        lines += [f"- {obs}" for obs in result["observations"]]
+        lines.append("")
+    lines += _render_recommendation_lines([r for result in results for r in result["recommendations"]])
+    if unmapped:
+        lines.append("\n### 📁 Files Without Governance Mapping")
+        lines += [f"- `{path}`" for path in unmapped]
+    return "\n".join(lines) + "\n"
+
+def write_report(markdown: str, report_dir: str) -> str:
+    """
+    Writes a rendered report under a unique name, atomically: the content goes to a
+    temporary file in the same directory which is then renamed into place.
+    """
+    os.makedirs(report_dir, exist_ok=True)
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    report_path = os.path.join(report_dir, f"pr_review_report_{stamp}_{uuid.uuid4().hex[:8]}.md")
+    fd, tmp_path = tempfile.mkstemp(dir=report_dir, prefix=".pr_review_", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(markdown)
+        os.replace(tmp_path, report_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    print(f"Generated PR Comment Markdown Document: {report_path}")
+    return report_path
+
+def _classify_diff_path(path: str):
+    """
+    Maps a changed file to the (changeset_type, entity) the reviewer understands, or None.
+    Ontology files come back as 'ontology' changes, which the review expands per business term.
+    """
+    name, ext = os.path.splitext(os.path.basename(path))
+    parts = path.replace('\\', '/').split('/')
+    if ext == '.sql' and 'models' in parts:
+        return "code", name
+    if ext in ('.yml', '.yaml') and 'ontology' in parts:
+        return "ontology", name
+    return None
+
+_YAML_KEY = re.compile(r'^([A-Za-z_][\w-]*)\s*:')
+
+def changed_ontology_entries(current_text, diff_text: str):
+    """
+    Top-level ontology entries (semantic types) a diff adds, removes or edits. When the
+    diff applies to the current file, the parsed entries before and after are compared;
+    otherwise each changed line is attributed to the entry it follows within its hunk.
+    Returns None when a changed line cannot be placed.
+    """
+    proposed = apply_unified_diff(current_text, diff_text) if current_text is not None else None
+    if proposed is not None:
+        try:
+            before = yaml.safe_load(current_text) or {}
+            after = yaml.safe_load(proposed) or {}
+        except yaml.YAMLError:
+            before = after = None
+        if isinstance(before, dict) and isinstance(after, dict):
+            return sorted(k for k in set(before) | set(after) if before.get(k) != after.get(k))
+
+    entries, key, in_hunk = set(), None, False
+    for line in diff_text.splitlines():
+        if line.startswith('@@'):
+            in_hunk, key = True, None
+            continue
+        if not in_hunk or line[:1] not in (' ', '+', '-'):
+            continue
+        match = _YAML_KEY.match(line[1:])
+        if match:
+            key = match.group(1)
+        if line[0] in '+-':
+            if key is None:
+                return None
+            entries.add(key)
+    return sorted(entries)
+
+def split_unified_diff(diff_text: str):
+    """
+    Splits a multi-file unified diff into one change per file.
+    Returns (changes, unmapped_paths); each change has path, changeset_type, entity and diff.
+    """
+    files = []
+    current = None
+    lines = diff_text.splitlines(keepends=True)
+    for i, line in enumerate(lines):
+        header = re.match(r'^diff --git a/(\S+) b/(\S+)', line)
+        # Without git headers a file starts at a '---' line directly followed by '+++'
+        # (a removed SQL comment inside a hunk also starts with '---')
+        plain_header = (
+            line.startswith('--- ') and i + 1 < len(lines) and lines[i + 1].startswith('+++ ')
+            and (current is None or current["hunks_started"])
+        )
+        if header or plain_header:
+            current = {"path": header.group(2) if header else None, "lines": [], "hunks_started": False}
+            files.append(current)
+        if current is None:
+            continue
+        if line.startswith('+++ ') and not current["hunks_started"]:
+            target = line[4:].strip().split('\t')[0]
+            if target != '/dev/null':
+                current["path"] = re.sub(r'^b/', '', target)
+        elif line.startswith('--- ') and not current["hunks_started"] and current["path"] is None:
+            source = line[4:].strip().split('\t')[0]
+            current["path"] = re.sub(r'^a/', '', source)
+        elif line.startswith('@@'):
+            current["hunks_started"] = True
+        current["lines"].append(line)
+        
+    changes, unmapped = [], []
+    for f in files:
+        if not f["path"]:
+            continue
+        classified = _classify_diff_path(f["path"])
+        if classified is None:
+            unmapped.append(f["path"])
+            continue
+        changes.append({
+            "path": f["path"],
+            "changeset_type": classified[0],
+            "entity": classified[1],
+            "diff": "".join(f["lines"])
+        })
+    return changes, unmapped
 
 # --- Example usages ---
 if __name__ == "__main__":
     import sys
     
     if len(sys.argv) < 2:
-        print("Usage: python src/reviewer.py <demo1|demo2>")
+        print("Usage: python src/reviewer.py <demo1|demo2|demo3>")
         sys.exit(1)
         
     action = sys.argv[1]
     reviewer = CodeReviewer()
+    report_dir = os.getcwd()
     
     if action == "demo1":
         # Simulate an engineer adding a risky JOIN to a DBT Model
@@ -171,7 +614,8 @@ if __name__ == "__main__":
             pr_title="Feat: Add external enrichment join to Gold layer",
             changeset_type="code",
             changed_entity="gold_fct_approvals",
-            diff_text="+ LEFT JOIN external_credit_bureau c ON a.ssn = c.ssn"
+            diff_text="+ LEFT JOIN external_credit_bureau c ON a.ssn = c.ssn",
+            report_dir=report_dir
         )
     elif action == "demo2":
         # Simulate a Data Steward changing a policy definition
@@ -179,5 +623,35 @@ if __name__ == "__main__":
             pr_title="Policy: Tighten validation on Applicant Income",
             changeset_type="policy",
             changed_entity="BT_001",
-            diff_text="threshold: changed from 0.95 to 0.99"
+            diff_text="threshold: changed from 0.95 to 0.99",
+            report_dir=report_dir
+        )
+    elif action == "demo3":
+        # Simulate a multi-file PR touching two models and the policy ontology
+        reviewer.review_pull_request(
+            pr_title="Feat: Credit bureau enrichment across layers",
+            diff_text=(
+                "diff --git a/models/silver_stg_loans.sql b/models/silver_stg_loans.sql\n"
+                "--- a/models/silver_stg_loans.sql\n"
+                "+++ b/models/silver_stg_loans.sql\n"
+                "@@ -1 +1 @@\n"
+                "-SELECT application_id as id FROM bronze_raw_loans\n"
+                "+SELECT application_id as id, coalesce(score, 0) as score FROM bronze_raw_loans\n"
+                "diff --git a/models/gold_fct_approvals.sql b/models/gold_fct_approvals.sql\n"
+                "--- a/models/gold_fct_approvals.sql\n"
+                "+++ b/models/gold_fct_approvals.sql\n"
+                "@@ -1 +1,2 @@\n"
+                " SELECT a.id FROM silver_stg_loans a\n"
+                "+LEFT JOIN external_credit_bureau c ON a.ssn = c.ssn\n"
+                "diff --git a/ontology/policy_ontology.yaml b/ontology/policy_ontology.yaml\n"
+                "--- a/ontology/policy_ontology.yaml\n"
+                "+++ b/ontology/policy_ontology.yaml\n"
+                "@@ -1,4 +1,5 @@\n"
+                " income:\n"
+                "   required_validations:\n"
+                "     - positive\n"
+                "     - numeric\n"
+                "+    - range\n"
+            ),
+            report_dir=report_dir
         )
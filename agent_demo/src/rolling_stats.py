@@ -0,0 +1,139 @@
+import json
+import math
+import os
+from datetime import datetime
+
+# Windows (in daily observations) of the exponentially weighted statistics
+EWMA_SPAN = int(os.environ.get("STEWARD_TREND_EWMA_SPAN", "7"))
+SLOPE_SPAN = int(os.environ.get("STEWARD_TREND_SLOPE_SPAN", "14"))
+VOLATILITY_SPAN = int(os.environ.get("STEWARD_TREND_VOLATILITY_SPAN", "14"))
+
+# Days ahead the current slope is projected when weighing a breach
+TREND_HORIZON_DAYS = 7
+# Used until a TDE has enough history for a trend (the factor the agent always used before)
+DEFAULT_TREND_FACTOR = 1.1
+MIN_OBSERVATIONS = 3
+MAX_TREND_FACTOR = 3.0
+
+STATE_FIELDS = ("last_date", "count", "ewma", "level", "slope", "variance")
+
+def _alpha(span: int) -> float:
+    return 2.0 / (span + 1)
+
+def step(state: dict, date_str: str, score: float) -> dict:
+    """
+    Folds one daily score into the statistics: an EWMA of the score, Holt's linear
+    level/slope (score change per day) and the EW variance of the one-step forecast
+    error, whose square root is the volatility. Constant time per observation.
+    """
+    if state is None:
+        return {"last_date": date_str, "count": 1, "ewma": score, "level": score, "slope": 0.0, "variance": 0.0}
+    a, b, v = _alpha(EWMA_SPAN), _alpha(SLOPE_SPAN), _alpha(VOLATILITY_SPAN)
+    error = score - (state["level"] + state["slope"])
+    level = a * score + (1 - a) * (state["level"] + state["slope"])
+    return {
+        "last_date": date_str,
+        "count": state["count"] + 1,
+        "ewma": a * score + (1 - a) * state["ewma"],
+        "level": level,
+        "slope": b * (level - state["level"]) + (1 - b) * state["slope"],
+        "variance": (1 - v) * state["variance"] + v * error * error
+    }
+
+def _load_states(cursor, tde_ids) -> dict:
+    tde_ids = list(tde_ids)
+    cursor.execute(f'''
+        SELECT tde_id, {", ".join(STATE_FIELDS)}, prev_state FROM DQ_ROLLING_STATS
+        WHERE tde_id IN ({','.join('?' * len(tde_ids))})
+    ''', tde_ids)
+    states = {}
+    for row in cursor.fetchall():
+        row = tuple(row)
+        states[row[0]] = (dict(zip(STATE_FIELDS, row[1:-1])), json.loads(row[-1]) if row[-1] else None)
+    return states
+
+def _fold_history(cursor, tde_id: str):
+    """(state, state before the last day) from the full DQ_SCORES history of one TDE."""
+    cursor.execute("SELECT date, score FROM DQ_SCORES WHERE tde_id = ? ORDER BY date", (tde_id,))
+    state = prev = None
+    for date_str, score in cursor.fetchall():
+        prev, state = state, step(state, date_str, score)
+    return state, prev
+
+def update_rolling_stats(cursor, scores):
+    """
+    Advances the per-TDE statistics with newly written (date, tde_id, score) rows.
+    A new day is one step from the stored state; a rewrite of the latest day
+    re-applies it to the stored previous state. Only a correction to an older day
+    replays that TDE's history.
+    """
+    by_tde = {}
+    for date_str, tde_id, score in scores:
+        by_tde.setdefault(tde_id, {})[date_str] = score
+    if not by_tde:
+        return
+    stored = _load_states(cursor, by_tde)
+
+    rows = []
+    for tde_id, points in by_tde.items():
+        state, prev = stored.get(tde_id, (None, None))
+        for date_str, score in sorted(points.items()):
+            if state is None or date_str > state["last_date"]:
+                prev, state = state, step(state, date_str, score)
+            elif date_str == state["last_date"]:
+                state = step(prev, date_str, score)
+            else:
+                state, prev = _fold_history(cursor, tde_id)
+                break
+        rows.append((tde_id, *(state[f] for f in STATE_FIELDS), json.dumps(prev) if prev else None,
+                     datetime.utcnow().isoformat()))
+    cursor.executemany(f'''
+        INSERT OR REPLACE INTO DQ_ROLLING_STATS (tde_id, {", ".join(STATE_FIELDS)}, prev_state, updated_at)
+        VALUES ({','.join('?' * (len(STATE_FIELDS) + 3))})
+    ''', rows)
+
+def rebuild_rolling_stats(cursor) -> int:
+    """Recomputes the statistics of every TDE from DQ_SCORES (after changing the spans)."""
+    cursor.execute("DELETE FROM DQ_ROLLING_STATS")
+    cursor.execute("SELECT DISTINCT tde_id FROM DQ_SCORES")
+    tde_ids = [row[0] for row in cursor.fetchall()]
+    rows = []
+    for tde_id in tde_ids:
+        state, prev = _fold_history(cursor, tde_id)
+        rows.append((tde_id, *(state[f] for f in STATE_FIELDS), json.dumps(prev) if prev else None,
+                     datetime.utcnow().isoformat()))
+    cursor.executemany(f'''
+        INSERT INTO DQ_ROLLING_STATS (tde_id, {", ".join(STATE_FIELDS)}, prev_state, updated_at)
+        VALUES ({','.join('?' * (len(STATE_FIELDS) + 3))})
+    ''', rows)
+    return len(rows)
+
+def load_rolling_stats(conn, tde_ids) -> dict:
+    """tde_id -> {last_date, count, ewma, slope, volatility} for the given TDEs."""
+    tde_ids = list(tde_ids)
+    if not tde_ids:
+        return {}
+    cursor = conn.cursor()
+    # Plain tuples regardless of the row factory the caller configured
+    cursor.row_factory = None
+    return {
+        tde_id: {
+            "last_date": state["last_date"],
+            "count": state["count"],
+            "ewma": state["ewma"],
+            "slope": state["slope"],
+            "volatility": math.sqrt(state["variance"])
+        }
+        for tde_id, (state, _) in _load_states(cursor, tde_ids).items()
+    }
+
+def trend_factor(stats: dict, delta: float) -> float:
+    """
+    Multiplier for a breach of size `delta`: 1 plus the shortfall expected on top of
+    it within TREND_HORIZON_DAYS (the declining slope projected forward, plus one
+    volatility of noise), relative to the breach. Improving, steady TDEs stay near 1.
+    """
+    if not stats or stats["count"] < MIN_OBSERVATIONS:
+        return DEFAULT_TREND_FACTOR
+    expected_decline = max(0.0, -stats["slope"]) * TREND_HORIZON_DAYS + stats["volatility"]
+    return min(MAX_TREND_FACTOR, 1.0 + expected_decline / max(delta, 0.01))
@@ -0,0 +1,91 @@
+import os
+from datetime import datetime
+
+# Opt-in: emit rule_breached / risk_assessed only on state transitions instead of
+# for every breaching TDE every day. Full daily detail stays in DQ_SCORES.
+EDGE_TRIGGERED = os.environ.get("STEWARD_EDGE_TRIGGERED_EVENTS", "0") == "1"
+# Relative change against the last emitted risk score that counts as significant
+RISK_CHANGE_THRESHOLD = 0.25
+
+def daily_rule_scores(cursor, date_str: str) -> list:
+    """
+    Every (rule, TDE) pair with its score on the given date. This is the full
+    daily detail edge-triggered events are derived from, rebuildable at any time.
+    """
+    cursor.execute('''
+        SELECT r.rule_id, r.threshold, r.description, d.score, t.tde_id, t.name as tde_name, b.term_id, b.criticality
+        FROM RULES r
+        JOIN BUSINESS_TERMS b ON r.business_term_id = b.term_id
+        JOIN TDE t ON t.business_term_id = b.term_id
+        JOIN DQ_SCORES d ON d.tde_id = t.tde_id
+        WHERE d.date = ?
+    ''', (date_str,))
+    return cursor.fetchall()
+
+def load_rule_states(conn) -> dict:
+    """(rule_id, tde_id) -> current RULE_STATE row as a dict."""
+    cursor = conn.cursor()
+    # Plain tuples regardless of the row factory the caller configured
+    cursor.row_factory = None
+    cursor.execute('''
+        SELECT rule_id, tde_id, status, since_date, last_date, days_in_status, last_score, emitted_risk_score
+        FROM RULE_STATE
+    ''')
+    columns = ("rule_id", "tde_id", "status", "since_date", "last_date", "days_in_status", "last_score", "emitted_risk_score")
+    states = {}
+    for row in cursor.fetchall():
+        state = dict(zip(columns, row))
+        states[(state["rule_id"], state["tde_id"])] = state
+    return states
+
+def transition(previous: dict, status: str, date_str: str, score: float) -> tuple:
+    """
+    New RULE_STATE for a (rule, TDE) observed with `status` on `date_str`, and the
+    transition it represents: 'breached', 'recovered' or None when unchanged.
+    A pair seen for the first time counts as newly breached only if it breaches.
+    """
+    if previous is None or previous["status"] != status:
+        kind = None
+        if status == "breached":
+            kind = "breached"
+        elif previous is not None:
+            kind = "recovered"
+        return {
+            "status": status,
+            "since_date": date_str,
+            "days_in_status": 1,
+            "last_date": date_str,
+            "last_score": score,
+            "emitted_risk_score": None
+        }, kind
+    days = previous["days_in_status"] + (1 if previous["last_date"] != date_str else 0)
+    return {**previous, "days_in_status": days, "last_date": date_str, "last_score": score}, None
+
+def risk_changed(state: dict, risk_score: float) -> bool:
+    """Whether risk moved enough since it was last emitted to be worth an event."""
+    emitted = state.get("emitted_risk_score")
+    if emitted is None or emitted == 0:
+        return True
+    return abs(risk_score - emitted) / abs(emitted) >= RISK_CHANGE_THRESHOLD
+
+def save_rule_states(cursor, states: dict):
+    """Upserts the given (rule_id, tde_id) -> state entries in one statement."""
+    now = datetime.utcnow().isoformat()
+    cursor.executemany('''
+        INSERT INTO RULE_STATE (
+            rule_id, tde_id, status, since_date, last_date, days_in_status,
+            last_score, emitted_risk_score, updated_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(rule_id, tde_id) DO UPDATE SET
+            status = excluded.status,
+            since_date = excluded.since_date,
+            last_date = excluded.last_date,
+            days_in_status = excluded.days_in_status,
+            last_score = excluded.last_score,
+            emitted_risk_score = excluded.emitted_risk_score,
+            updated_at = excluded.updated_at
+    ''', [
+        (rule_id, tde_id, s["status"], s["since_date"], s["last_date"], s["days_in_status"],
+         s["last_score"], s["emitted_risk_score"], now)
+        for (rule_id, tde_id), s in states.items()
+    ])
@@ -0,0 +1,190 @@
+import os
+import sqlite3
+from datetime import datetime
+from src.db import DB_PATH, DEFAULT_DOMAIN, SHARDING, get_connection
+
+# Where a domain's landing and model tables live:
+#   'off'       - in the governance database itself (the single-file layout)
+#   'warehouse' - all domains in one data/warehouse.db next to it
+#   'domain'    - one data/shards/<domain>.db per business domain
+LANDING_TABLES = ("ext_application_source", "reference_decisions")
+
+def shard_path(domain: str) -> str:
+    """Path of the domain's shard relative to the governance database's directory; None when unsharded."""
+    if SHARDING == "warehouse":
+        return "warehouse.db"
+    if SHARDING == "domain":
+        return os.path.join("shards", f"{domain}.db")
+    return None
+
+def shard_file(domain: str = DEFAULT_DOMAIN) -> str:
+    """File holding the domain's landing and model tables: its shard, or the governance database."""
+    path = shard_path(domain)
+    return DB_PATH if path is None else os.path.join(os.path.dirname(DB_PATH), path)
+
+def get_shard_connection(domain: str = DEFAULT_DOMAIN):
+    """
+    Connection for the pipeline of one domain: its shard as `main`, with the
+    governance database attached as `gov`. Unqualified names resolve to the shard
+    first, so landing and model tables are read and written there while metadata
+    (DBT_SQL_MODELS, DQ_SCORES, ...) resolves to governance. A pipeline therefore
+    holds the governance write lock only while it writes scores.
+    """
+    if shard_path(domain) is None:
+        return get_connection()
+    full_path = shard_file(domain)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    conn = sqlite3.connect(full_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("ATTACH DATABASE ? AS gov", (DB_PATH,))
+    return conn
+
+def domain_models(conn, domain: str = DEFAULT_DOMAIN) -> dict:
+    """model_name -> SQL of the models the domain's pipeline builds (MODEL_DOMAINS, else the default domain)."""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute('''
+        SELECT m.model_name, m.sql_text FROM DBT_SQL_MODELS m
+        LEFT JOIN MODEL_DOMAINS d ON d.model_name = m.model_name
+        WHERE coalesce(d.domain, ?) = ?
+    ''', (DEFAULT_DOMAIN, domain))
+    return dict(cursor.fetchall())
+
+def model_domain(conn, model_name: str) -> str:
+    row = conn.execute("SELECT domain FROM MODEL_DOMAINS WHERE model_name = ?", (model_name,)).fetchone()
+    return row[0] if row else DEFAULT_DOMAIN
+
+def register_tables(conn, domain: str, kind: str, tables):
+    """
+    Records that the domain's shard holds the given 'landing' or 'model' tables.
+    Only writes when something is new, and then commits on its own, so the
+    governance write lock is not held across the pipeline work that follows.
+    """
+    tables = list(tables)
+    registered = {row[0] for row in conn.execute(
+        "SELECT t.table_name FROM SHARD_TABLES t JOIN DATA_SHARDS s ON s.domain = t.domain "
+        "WHERE t.domain = ? AND s.path IS ?", (domain, shard_path(domain))
+    ).fetchall()}
+    if tables and registered.issuperset(tables):
+        return
+    now = datetime.utcnow().isoformat()
+    with conn:
+        conn.execute('''
+            INSERT INTO DATA_SHARDS (domain, path, updated_at) VALUES (?, ?, ?)
+            ON CONFLICT(domain) DO UPDATE SET path = excluded.path, updated_at = excluded.updated_at
+            WHERE DATA_SHARDS.path IS NOT excluded.path
+        ''', (domain, shard_path(domain), now))
+        conn.executemany(
+            "INSERT OR IGNORE INTO SHARD_TABLES (domain, table_name, kind) VALUES (?, ?, ?)",
+            [(domain, table, kind) for table in tables]
+        )
+
+def attach_shards(conn) -> dict:
+    """
+    Attaches every registered shard to a governance connection and exposes each
+    sharded table under its own name as a TEMP view, a UNION ALL over the shards
+    that hold it. Queries then read across domains as if the tables were local.
+    Returns alias -> shard path. SQLite attaches at most 10 databases by default.
+    """
+    cursor = conn.cursor()
+    # Plain tuples regardless of the row factory the caller configured
+    cursor.row_factory = None
+    cursor.execute('''
+        SELECT s.path, t.table_name FROM SHARD_TABLES t
+        JOIN DATA_SHARDS s ON s.domain = t.domain
+        WHERE s.path IS NOT NULL
+        ORDER BY s.path, t.table_name
+    ''')
+    rows = cursor.fetchall()
+    # Databases already attached (a second call reuses them): real path -> schema name
+    attached = {os.path.realpath(row[2]): row[1] for row in cursor.execute("PRAGMA database_list").fetchall() if row[2]}
+
+    aliases = {}
+    sources = {}
+    for path, table in rows:
+        full_path = os.path.realpath(os.path.join(os.path.dirname(DB_PATH), path))
+        if not os.path.exists(full_path):
+            continue
+        alias = attached.get(full_path)
+        if alias is None:
+            alias = f"shard_{len(attached)}"
+            cursor.execute(f"ATTACH DATABASE ? AS {alias}", (full_path,))
+            attached[full_path] = alias
+        aliases[alias] = path
+        exists = cursor.execute(f"SELECT 1 FROM {alias}.sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+        if exists and alias not in sources.setdefault(table, []):
+            sources[table].append(alias)
+
+    for table, shard_aliases in sources.items():
+        union = " UNION ALL ".join(f'SELECT * FROM {alias}."{table}"' for alias in shard_aliases)
+        cursor.execute(f'DROP VIEW IF EXISTS temp."{table}"')
+        cursor.execute(f'CREATE TEMP VIEW "{table}" AS {union}')
+    return aliases
+
+def migrate_to_shards(domain: str = DEFAULT_DOMAIN, tables=None) -> list[str]:
+    """
+    Moves the domain's landing and model tables out of the governance database
+    into its shard (for databases created before sharding was switched on) and
+    vacuums the governance file. Returns the tables moved.
+    """
+    if shard_path(domain) is None:
+        raise ValueError("Sharding is off; set STEWARD_SHARDING to 'warehouse' or 'domain'.")
+    conn = get_shard_connection(domain)
+    cursor = conn.cursor()
+    if tables is None:
+        tables = list(LANDING_TABLES) + list(domain_models(conn, domain))
+    moved = []
+    for table in tables:
+        if not cursor.execute("SELECT 1 FROM gov.sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone():
+            continue
+        cursor.execute(f'DROP TABLE IF EXISTS main."{table}"')
+        cursor.execute(f'CREATE TABLE main."{table}" AS SELECT * FROM gov."{table}"')
+        cursor.execute(f'DROP TABLE gov."{table}"')
+        moved.append(table)
+    conn.commit()
+    conn.close()
+
+    conn = get_connection()
+    register_tables(conn, domain, "landing", [t for t in moved if t in LANDING_TABLES])
+    register_tables(conn, domain, "model", [t for t in moved if t not in LANDING_TABLES])
+    conn.execute("VACUUM")
+    conn.close()
+    return moved
+
+def shard_status(conn) -> list[dict]:
+    """Row counts of every sharded table per domain, read through the attached shards."""
+    aliases = attach_shards(conn)
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute('''
+        SELECT t.domain, s.path, t.table_name, t.kind FROM SHARD_TABLES t
+        JOIN DATA_SHARDS s ON s.domain = t.domain
+        ORDER BY t.domain, t.kind, t.table_name
+    ''')
+    by_path = {path: alias for alias, path in aliases.items()}
+    status = []
+    for domain, path, table, kind in cursor.fetchall():
+        schema = "main" if path is None else by_path.get(path)
+        rows = None
+        if schema and cursor.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone():
+            rows = cursor.execute(f'SELECT count(*) FROM {schema}."{table}"').fetchone()[0]
+        status.append({"domain": domain, "shard": path or os.path.basename(DB_PATH), "table": table, "kind": kind, "rows": rows})
+    return status
+
+if __name__ == "__main__":
+    import json
+    import sys
+    from src.db import init_db
+
+    init_db()
+    if len(sys.argv) > 1 and sys.argv[1] == "migrate":
+        domain = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_DOMAIN
+        moved = migrate_to_shards(domain)
+        print(f"Moved {len(moved)} tables of domain '{domain}' to {shard_path(domain)}: {moved}")
+    elif len(sys.argv) > 1 and sys.argv[1] == "status":
+        conn = get_connection()
+        print(json.dumps(shard_status(conn), indent=2))
+        conn.close()
+    else:
+        print("Usage: python -m src.shards migrate [domain] | status")
@@ -0,0 +1,128 @@
+import json
+import sqlite3
+from datetime import datetime
+from src.db import get_connection
+from src.retention import ARCHIVE_DIR, load_manifest, read_segment
+
+# Event ids between persisted latest_state snapshots, read by the dashboard's ?as_of= queries
+STATE_SNAPSHOT_INTERVAL = 500
+# Event types the latest_state projection reacts to
+STATE_EVENT_TYPES = ("risk_assessed", "focus_selected", "rule_recovered")
+
+def apply_latest_state(term_states: dict, event: dict) -> dict:
+    """Folds one event into the per-term state (the dashboard's latest_state projection)."""
+    evt_type = event["event_type"]
+    if evt_type not in STATE_EVENT_TYPES:
+        return term_states
+
+    # rule_recovered is about a rule; the term it guards is in its context
+    term_id = event["context"]["term_id"] if evt_type == "rule_recovered" else event["entity_id"]
+    if term_id not in term_states:
+        term_states[term_id] = {"status": "stable", "last_update": event["timestamp"]}
+    term_states[term_id]["last_update"] = event["timestamp"]
+
+    if evt_type == "risk_assessed":
+        risk_score = event["metrics"].get("risk_score", 0)
+        delta = event["context"].get("delta", 0)
+        if risk_score > 0.1:
+            term_states[term_id]["status"] = "breached"
+        elif delta > 0:
+            term_states[term_id]["status"] = "declining"
+        else:
+            term_states[term_id]["status"] = "stable"
+    elif evt_type == "focus_selected":
+        term_states[term_id]["status"] = "under_investigation"
+    elif evt_type == "rule_recovered":
+        term_states[term_id]["status"] = "stable"
+    return term_states
+
+def _state_events_after(cursor, after_id: int, archive_dir: str, upto_id: int = None) -> list[dict]:
+    """State events with after_id < event_id <= upto_id (None: the newest), archived and hot, in id order."""
+    events = []
+    archived_upto = 0
+    for entry in load_manifest(archive_dir)["segments"]:
+        archived_upto = max(archived_upto, entry["max_event_id"])
+        if entry["max_event_id"] <= after_id or (upto_id is not None and entry["min_event_id"] > upto_id):
+            continue
+        events += [e for e in read_segment(entry, archive_dir)
+                   if after_id < e["event_id"] and (upto_id is None or e["event_id"] <= upto_id)
+                   and e["event_type"] in STATE_EVENT_TYPES]
+    # A batch left in both places by an interrupted archive run counts once
+    cursor.execute(f'''
+        SELECT event_id, timestamp, event_type, entity_id, context, metrics FROM EVENT_LOG
+        WHERE event_type IN ({','.join('?' * len(STATE_EVENT_TYPES))}) AND event_id > ? AND (? IS NULL OR event_id <= ?)
+        ORDER BY event_id
+    ''', STATE_EVENT_TYPES + (max(after_id, archived_upto), upto_id, upto_id))
+    for event_id, timestamp, event_type, entity_id, context, metrics in cursor.fetchall():
+        events.append({
+            "event_id": event_id, "timestamp": timestamp, "event_type": event_type, "entity_id": entity_id,
+            "context": json.loads(context) if context else {}, "metrics": json.loads(metrics) if metrics else {}
+        })
+    events.sort(key=lambda e: e["event_id"])
+    return events
+
+def state_as_of(conn, as_of_id: int, archive_dir: str = ARCHIVE_DIR) -> dict:
+    """
+    latest_state as it was right after event `as_of_id`: the nearest persisted
+    snapshot at or before it, plus a replay of only the state events since. Read-only.
+    """
+    cursor = conn.cursor()
+    # Plain tuples regardless of the row factory the caller configured
+    cursor.row_factory = None
+    try:
+        row = cursor.execute('''
+            SELECT event_id, state FROM STATE_SNAPSHOTS
+            WHERE projection = 'latest_state' AND event_id <= ?
+            ORDER BY event_id DESC LIMIT 1
+        ''', (as_of_id,)).fetchone()
+    except sqlite3.OperationalError:
+        # Databases created before snapshots existed: replay from the start
+        row = None
+    base_id, state = (row[0], json.loads(row[1])) if row else (0, {})
+    for event in _state_events_after(cursor, base_id, archive_dir, as_of_id):
+        apply_latest_state(state, event)
+    return state
+
+def write_state_snapshots(interval: int = STATE_SNAPSHOT_INTERVAL, archive_dir: str = ARCHIVE_DIR) -> int:
+    """
+    Persists the latest_state projection at every multiple of `interval` event ids
+    the log has passed since the last snapshot, replaying only the events after it.
+    Runs on the writer side (daemon, retention job or this module's CLI), so the
+    dashboard's ?as_of= queries only ever read. Returns the number of snapshots written.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    # Plain tuples regardless of the row factory the caller configured
+    cursor.row_factory = None
+    row = cursor.execute('''
+        SELECT event_id, state FROM STATE_SNAPSHOTS
+        WHERE projection = 'latest_state' ORDER BY event_id DESC LIMIT 1
+    ''').fetchone()
+    base_id, state = (row[0], json.loads(row[1])) if row else (0, {})
+    hot_max = cursor.execute("SELECT max(event_id) FROM EVENT_LOG").fetchone()[0] or 0
+    archived_max = max((s["max_event_id"] for s in load_manifest(archive_dir)["segments"]), default=0)
+    latest_id = max(hot_max, archived_max)
+
+    # Only points the log has fully passed: a later event could still land before an open one
+    snapshots = []
+    next_point = base_id + interval - base_id % interval
+    now = datetime.utcnow().isoformat()
+    for event in _state_events_after(cursor, base_id, archive_dir) + [None]:
+        upto = event["event_id"] - 1 if event else latest_id
+        while next_point <= upto:
+            snapshots.append(("latest_state", next_point, json.dumps(state, sort_keys=True), now))
+            next_point += interval
+        if event:
+            apply_latest_state(state, event)
+
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO STATE_SNAPSHOTS VALUES (?, ?, ?, ?)", snapshots)
+    conn.close()
+    return len(snapshots)
+
+if __name__ == "__main__":
+    from src.db import init_db
+
+    init_db()
+    written = write_state_snapshots()
+    print(f"Wrote {written} latest_state snapshot(s).")
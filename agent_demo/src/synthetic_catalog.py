@@ -0,0 +1,263 @@
+import json
+import math
+import os
+import random
+from datetime import datetime, timedelta
+from src.db import DEFAULT_DOMAIN, get_connection, init_db
+from src.dq_series import write_scores
+from src.lineage_extractor import MODELS_DIR, extract_lineage
+from src.mock_data import populate_mock_data
+
+# Day numbers count from here, as in `python -m src.pipeline N`
+BASE_DATE = datetime(2026, 1, 1)
+# Column kinds every synthetic model carries, in the vocabulary the scanner and ontology know
+COLUMN_KINDS = ("income", "amount", "status", "score")
+RULE_TEMPLATES = {
+    "income": "Applicant income must be positive and explicitly numeric",
+    "amount": "Loan amount strictly numeric within approved range",
+    "status": "Application status must be one of allowed values and not null",
+    "score": "Risk score must be present and within range"
+}
+# Condition a valid value of each column kind meets, scored by the pipeline through TDE_CHECKS
+CHECK_TEMPLATES = {
+    "income": "{column} IS NOT NULL AND {column} != '0'",
+    "amount": "{column} > 0",
+    "status": "{column} IN ('APPROVED', 'REJECTED', 'PENDING')",
+    "score": "{column} IS NOT NULL"
+}
+LAYERS = ("bronze", "silver", "gold")
+
+def _layer_sizes(models: int) -> dict:
+    """Models per medallion layer: a third each, gold taking the remainder, at least one each."""
+    per_layer = max(1, models // 3)
+    return {"bronze": per_layer, "silver": per_layer, "gold": max(1, models - 2 * per_layer)}
+
+def _columns(tdes: int, models: int) -> list[str]:
+    """Output columns shared by every synthetic model: enough slots for one TDE each."""
+    count = max(len(COLUMN_KINDS), math.ceil(tdes / models))
+    return [f"{COLUMN_KINDS[j % len(COLUMN_KINDS)]}_{j}" for j in range(count)]
+
+def _bronze_sql(columns) -> str:
+    exprs = {
+        "income": lambda j: f"coalesce(income_reported, '0') as income_{j}",
+        "amount": lambda j: f"requested_amount * {1 + j % 3} as amount_{j}",
+        "status": lambda j: f"upper(app_status) as status_{j}",
+        "score": lambda j: f"length(application_id) + {j} as score_{j}"
+    }
+    selects = ["application_id"] + [exprs[c.split("_")[0]](int(c.split("_")[1])) for c in columns]
+    return f"SELECT {', '.join(selects)} FROM ext_application_source"
+
+def _silver_sql(columns, upstream: str) -> str:
+    exprs = {
+        "income": lambda c: f"cast(u.{c} as decimal(18,2)) as {c}",
+        "amount": lambda c: f"u.{c} as {c}",
+        "status": lambda c: f"trim(u.{c}) as {c}",
+        "score": lambda c: f"u.{c} / 10.0 as {c}"
+    }
+    selects = ["u.application_id"] + [exprs[c.split("_")[0]](c) for c in columns]
+    return f"SELECT {', '.join(selects)} FROM {upstream} u"
+
+def _gold_sql(columns, left: str, right: str) -> str:
+    exprs = {
+        "income": lambda c: f"a.{c} as {c}",
+        "amount": lambda c: f"a.{c} + coalesce(b.{c}, 0) as {c}",
+        "status": lambda c: f"coalesce(a.{c}, b.{c}) as {c}",
+        "score": lambda c: f"max(a.{c}, b.{c}) as {c}"
+    }
+    selects = ["a.application_id"] + [exprs[c.split("_")[0]](c) for c in columns]
+    return f"SELECT {', '.join(selects)} FROM {left} a LEFT JOIN {right} b ON a.application_id = b.application_id"
+
+def generate_models(tdes: int, models: int) -> dict:
+    """
+    model_name -> SQL for a chained medallion catalog: bronze models read the landing
+    table, each silver model casts and trims one bronze model, each gold model joins
+    two silver models.
+    """
+    columns = _columns(tdes, models)
+    sizes = _layer_sizes(models)
+    names = {layer: [f"syn_{layer}_{i:04d}" for i in range(sizes[layer])] for layer in LAYERS}
+    sql = {}
+    for name in names["bronze"]:
+        sql[name] = _bronze_sql(columns)
+    for i, name in enumerate(names["silver"]):
+        sql[name] = _silver_sql(columns, names["bronze"][i % len(names["bronze"])])
+    silver = names["silver"]
+    for i, name in enumerate(names["gold"]):
+        sql[name] = _gold_sql(columns, silver[i % len(silver)], silver[(i + 1) % len(silver)])
+    return sql
+
+def _score_walks(rng, tde_ids, thresholds, days):
+    """Yields (date, [(date, tde_id, score)]) per day: a mean-reverting walk around each TDE's threshold."""
+    levels = {tde_id: thresholds[tde_id] + rng.uniform(-0.02, 0.03) for tde_id in tde_ids}
+    for day in range(1, days + 1):
+        date_str = (BASE_DATE + timedelta(days=day)).strftime("%Y-%m-%d")
+        rows = []
+        for tde_id in tde_ids:
+            target = thresholds[tde_id] + 0.01
+            levels[tde_id] += 0.2 * (target - levels[tde_id]) + rng.gauss(0, 0.01)
+            rows.append((date_str, tde_id, min(1.0, max(0.0, levels[tde_id]))))
+        yield date_str, rows
+
+def _day_events(next_id: int, date_str: str, rows, rules: dict, mappings: dict, investigation_id: int) -> list[tuple]:
+    """
+    The events an agent run would log for one day of scores: rule_breached and
+    risk_assessed per breach (joining the open investigation), then one
+    investigation of the riskiest breach ending in a recommendation. Rows carry
+    explicit event ids so investigations link up.
+    """
+    events = []
+    breaches = []
+    for _, tde_id, score in rows:
+        rule_id, threshold, description, term_id, criticality = rules[tde_id]
+        if score < threshold:
+            delta = threshold - score
+            risk_score = criticality * delta * 1.1
+            breaches.append((risk_score, tde_id))
+            events.append(("rule_breached", "rule", rule_id, description,
+                           {"score": score, "threshold": threshold}, {"delta": delta},
+                           f"DQ rule breached on {tde_id} (Score: {score:.3f} < {threshold})"))
+            events.append(("risk_assessed", "business_term", term_id, term_id,
+                           {"criticality": criticality, "delta": delta, "tde_id": tde_id, "trend": None},
+                           {"risk_score": risk_score, "trend_factor": 1.1},
+                           f"Assessed risk score of {risk_score:.3f} for term {term_id} (trend factor 1.10)"))
+    investigation = []
+    if breaches:
+        risk_score, tde_id = max(breaches)
+        rule_id, _, _, term_id, _ = rules[tde_id]
+        model_name, column_name = mappings[tde_id]
+        investigation = [
+            ("focus_selected", "business_term", term_id, term_id,
+             {"highest_risk_score": risk_score, "term": term_id}, {},
+             f"Agent selected {term_id} as primary investigation focus based on risk."),
+            ("investigation_started", "tde", tde_id, tde_id, {"rule_id": rule_id}, {},
+             f"Started investigation targeting TDE {tde_id}"),
+            ("lineage_traced", "dbt_model", model_name, model_name,
+             {"column": column_name, "upstream_models": [], "upstream_columns": []}, {"upstream_depth": 0},
+             f"Traced lineage to DBT model {model_name}, column {column_name}"),
+            ("recommendation_created", "tde", tde_id, tde_id,
+             {"suggestion": "Add rigorous validation upstream.", "diff": "", "pr_id": None}, {},
+             "Generated pull request: Add rigorous validation upstream.")
+        ]
+
+    start = datetime.fromisoformat(date_str) + timedelta(hours=6)
+    rows_out = []
+    for i, (event_type, entity_type, entity_id, entity_name, context, metrics, explanation) in enumerate(events + investigation):
+        event_id = next_id + i
+        if event_type == "focus_selected":
+            investigation_id = event_id
+        rows_out.append((
+            event_id, (start + timedelta(milliseconds=i)).isoformat(), event_type, entity_type, entity_id, entity_name,
+            json.dumps(context), json.dumps(metrics), explanation, investigation_id
+        ))
+    return rows_out
+
+def populate_synthetic_catalog(terms: int, tdes: int, models: int, days: int, seed: int = 0,
+                               models_dir: str = MODELS_DIR, domain: str = DEFAULT_DOMAIN) -> dict:
+    """
+    Builds a large catalog on top of the mock loan journey: `terms` business terms
+    with one rule each, `models` chained SQL models (written to the DB and to
+    models_dir, built by `domain`'s pipeline), `tdes` TDEs mapped to model columns, and `days` days of DQ scores
+    with the events and open PRs the agent would have produced for them.
+    """
+    rng = random.Random(seed)
+    populate_mock_data()
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    # 1. Business terms and their rules
+    kinds = [COLUMN_KINDS[i % len(COLUMN_KINDS)] for i in range(terms)]
+    term_rows = [(f"BT_S{i:05d}", f"Synthetic {kinds[i].title()} {i}", round(rng.uniform(0.5, 1.0), 2)) for i in range(terms)]
+    rule_rows = [
+        (f"R_S{i:05d}", term_rows[i][0], RULE_TEMPLATES[kinds[i]], round(rng.uniform(0.9, 0.995), 3))
+        for i in range(terms)
+    ]
+    cursor.executemany("INSERT OR REPLACE INTO BUSINESS_TERMS VALUES (?, ?, ?)", term_rows)
+    cursor.executemany("INSERT OR REPLACE INTO RULES VALUES (?, ?, ?, ?)", rule_rows)
+
+    # 2. Chained models, in the DB and on disk like the mock ones
+    sql_models = generate_models(tdes, models)
+    os.makedirs(models_dir, exist_ok=True)
+    cursor.executemany("INSERT OR REPLACE INTO DBT_SQL_MODELS VALUES (?, ?)", list(sql_models.items()))
+    cursor.executemany("INSERT OR REPLACE INTO MODEL_DOMAINS VALUES (?, ?)", [(m, domain) for m in sql_models])
+    for model_name, sql_text in sql_models.items():
+        with open(os.path.join(models_dir, f"{model_name}.sql"), "w") as f:
+            f.write(sql_text)
+
+    # 3. TDEs, each on one model column and a term whose rule fits the column's kind,
+    # with the check the pipeline scores it by
+    model_names = list(sql_models)
+    columns = _columns(tdes, models)
+    tde_rows, mapping_rows, check_rows = [], [], []
+    for i in range(tdes):
+        model_name = model_names[i % len(model_names)]
+        column = columns[(i // len(model_names)) % len(columns)]
+        kind = column.split("_")[0]
+        candidates = [t for t in range(terms) if kinds[t] == kind] or list(range(terms))
+        term = candidates[i % len(candidates)]
+        tde_rows.append((f"TDE_S{i:05d}", f"{model_name}.{column}", term_rows[term][0]))
+        mapping_rows.append((model_name, column, f"TDE_S{i:05d}"))
+        check_rows.append((f"TDE_S{i:05d}", model_name, CHECK_TEMPLATES[kind].format(column=column)))
+    cursor.executemany("INSERT OR REPLACE INTO TDE VALUES (?, ?, ?)", tde_rows)
+    cursor.executemany("INSERT OR REPLACE INTO DBT_COLUMN_MAPPING VALUES (?, ?, ?)", mapping_rows)
+    cursor.executemany("INSERT OR REPLACE INTO TDE_CHECKS VALUES (?, ?, ?)", check_rows)
+    conn.commit()
+    conn.close()
+    extract_lineage(models_dir)
+
+    # 4. Score history with the matching events and one open PR per investigated day
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT t.tde_id, r.rule_id, r.threshold, r.description, b.term_id, b.criticality
+        FROM TDE t
+        JOIN BUSINESS_TERMS b ON b.term_id = t.business_term_id
+        JOIN RULES r ON r.business_term_id = b.term_id
+        GROUP BY t.tde_id
+    ''')
+    rules = {row[0]: tuple(row[1:]) for row in cursor.fetchall()}
+    cursor.execute("SELECT tde_id, model_name, column_name FROM DBT_COLUMN_MAPPING")
+    mappings = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+    tde_ids = sorted(t for t in rules if t in mappings)
+    thresholds = {tde_id: rules[tde_id][1] for tde_id in tde_ids}
+
+    next_id = (cursor.execute("SELECT max(event_id) FROM EVENT_LOG").fetchone()[0] or 0) + 1
+    investigation_id = cursor.execute("SELECT max(investigation_id) FROM EVENT_LOG").fetchone()[0]
+    event_count = 0
+    scores = []
+    for date_str, rows in _score_walks(rng, tde_ids, thresholds, days):
+        scores.extend(rows)
+        events = _day_events(next_id, date_str, rows, rules, mappings, investigation_id)
+        cursor.executemany('''
+            INSERT INTO EVENT_LOG (
+                event_id, timestamp, event_type, entity_type, entity_id, entity_name,
+                context, metrics, explanation, investigation_id
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', events)
+        focus = next((e for e in events if e[2] == "investigation_started"), None)
+        if focus:
+            investigation_id = focus[9]
+            model_name, _ = mappings[focus[4]]
+            cursor.execute('''
+                INSERT OR IGNORE INTO AGENT_MEMORY (timestamp, tde_id, model_name, suggestion, status, run_date)
+                VALUES (?, ?, ?, 'Add rigorous validation upstream.', 'open', ?)
+            ''', (f"{date_str}T06:00:00", focus[4], model_name, date_str))
+        next_id += len(events)
+        event_count += len(events)
+    # One write for the whole history: each rollup period is computed once, not once a day
+    write_scores(cursor, scores)
+    conn.commit()
+    conn.close()
+    return {"terms": terms, "tdes": tdes, "models": len(sql_models), "days": days,
+            "scores": days * len(tde_ids), "events": event_count}
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 5:
+        print("Usage: python -m src.synthetic_catalog <terms> <tdes> <models> <days> [seed] [domain]")
+        sys.exit(1)
+
+    init_db()
+    stats = populate_synthetic_catalog(*(int(a) for a in sys.argv[1:5]), seed=int(sys.argv[5]) if len(sys.argv) > 5 else 0,
+                                       domain=sys.argv[6] if len(sys.argv) > 6 else DEFAULT_DOMAIN)
+    print(f"Synthetic catalog: {json.dumps(stats)}")
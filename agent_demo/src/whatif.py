@@ -0,0 +1,199 @@
+import json
+import os
+import re
+import sqlite3
+import time
+from pathlib import Path
+from src.db import get_connection
+from src.lineage_extractor import MODELS_DIR
+from src.lineage_graph import build_order, get_lineage_graph, referenced_tables
+from src.pipeline import load_dq_checks, score_tde
+from src.shards import domain_models, model_domain, shard_file
+
+# Input tables larger than this are sampled into the sandbox: newest ingest_date
+# partitions first when the table has them, an even rowid stride otherwise
+SAMPLE_ROWS = int(os.environ.get("STEWARD_WHATIF_SAMPLE_ROWS", "50000"))
+
+_HUNK = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+\d+(?:,\d+)? @@')
+
+def _current_sql(conn, model_name: str) -> str:
+    """SQL the pipeline materializes the model from, falling back to its file in models/."""
+    row = conn.execute("SELECT sql_text FROM DBT_SQL_MODELS WHERE model_name = ?", (model_name,)).fetchone()
+    if row:
+        return row[0]
+    try:
+        with open(os.path.join(MODELS_DIR, f"{model_name}.sql")) as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def _copy_input(cursor, table: str, limit: int) -> dict:
+    """Copies a source table into the sandbox, sampled down to about `limit` rows."""
+    total = cursor.execute(f'SELECT count(*) FROM src."{table}"').fetchone()[0]
+    where, params = "", ()
+    if total > limit:
+        columns = {row[1] for row in cursor.execute(f'PRAGMA src.table_info("{table}")').fetchall()}
+        if 'ingest_date' in columns:
+            # Whole partitions, newest first, so every row of a day keeps its neighbours
+            kept, cutoff = 0, None
+            for ingest_date, rows in cursor.execute(
+                f'SELECT ingest_date, count(*) FROM src."{table}" GROUP BY ingest_date ORDER BY ingest_date DESC'
+            ).fetchall():
+                kept, cutoff = kept + rows, ingest_date
+                if kept >= limit:
+                    break
+            where, params = " WHERE ingest_date >= ?", (cutoff,)
+        else:
+            where = f" WHERE rowid % {-(-total // limit)} = 0"
+    cursor.execute(f'CREATE TABLE main."{table}" AS SELECT * FROM src."{table}"{where}', params)
+    rows = cursor.execute(f'SELECT count(*) FROM main."{table}"').fetchone()[0]
+    return {"rows": rows, "of": total}
+
+def _materialize(cursor, order: list[str], sqls: dict):
+    for model in order:
+        cursor.execute(f'DROP TABLE IF EXISTS main."{model}"')
+        cursor.execute(f'CREATE TABLE main."{model}" AS {sqls[model]}')
+
+def predict_impact(model_name: str, proposed_sql: str, domain: str = None,
+                   sample_rows: int = SAMPLE_ROWS) -> dict:
+    """
+    Predicts how replacing a model's SQL would move the DQ scores, before the change
+    is merged. The model's inputs are copied (sampled when large) from the domain's
+    data (by default the domain the model belongs to) into an in-memory sandbox; the
+    model and the domain's models downstream of it are built there with the current SQL and again with the proposed one, and the TDEs scored
+    on those tables are scored both times. Both builds read the same sample, so the
+    delta reflects the change rather than the sampling. Nothing outside the sandbox
+    is written. SQLite errors (e.g. proposed SQL that does not run) come back under
+    'error' instead of being raised.
+    """
+    started = time.perf_counter()
+    conn = get_connection()
+    cursor = conn.cursor()
+    # Plain tuples regardless of the row factory the caller configured
+    cursor.row_factory = None
+    graph = get_lineage_graph(conn)
+    domain = domain or model_domain(conn, model_name)
+    current = domain_models(conn, domain)
+    if model_name not in current:
+        current[model_name] = _current_sql(conn, model_name)
+    latest = dict(cursor.execute('''
+        SELECT tde_id, score FROM DQ_SCORES WHERE date = (SELECT max(date) FROM DQ_SCORES)
+    ''').fetchall())
+    checks = load_dq_checks(cursor)
+    conn.close()
+
+    result = {"model": model_name, "domain": domain}
+    if current[model_name] is None:
+        return {**result, "error": f"No SQL found for model {model_name}."}
+
+    # 1. The changed model and every pipeline model downstream of it
+    changed = {model_name} | {m for m in graph.downstream_of(model_name) if m in current}
+    order = build_order(changed, graph.upstream)
+    proposed = {**current, model_name: proposed_sql}
+    inputs = set()
+    for model in changed:
+        inputs |= referenced_tables(current[model]) | referenced_tables(proposed[model])
+    inputs -= changed
+    tdes = sorted(tde for tde, (table, _) in checks.items() if table in changed)
+    result.update({"changed_models": order, "tdes": {}})
+
+    sandbox = sqlite3.connect(":memory:", uri=True)
+    sandbox_cursor = sandbox.cursor()
+    try:
+        # 2. Read-only snapshot of the inputs the changed models read
+        sandbox_cursor.execute("ATTACH DATABASE ? AS src", (Path(shard_file(domain)).resolve().as_uri() + "?mode=ro",))
+        existing = {row[0] for row in sandbox_cursor.execute(
+            "SELECT name FROM src.sqlite_master WHERE type IN ('table', 'view')"
+        ).fetchall()}
+        result["inputs"] = {
+            table: _copy_input(sandbox_cursor, table, sample_rows) for table in sorted(inputs & existing)
+        }
+        result["sampled"] = any(i["rows"] < i["of"] for i in result["inputs"].values())
+        sandbox_cursor.execute("DETACH DATABASE src")
+
+        # 3. Baseline: the current SQL on the sample
+        _materialize(sandbox_cursor, order, current)
+        baseline = {tde: score_tde(sandbox_cursor, tde, checks) for tde in tdes}
+
+        # 4. What-if: the proposed SQL on the same sample
+        _materialize(sandbox_cursor, order, proposed)
+        for tde in tdes:
+            predicted = score_tde(sandbox_cursor, tde, checks)
+            result["tdes"][tde] = {
+                "baseline": round(baseline[tde], 4),
+                "predicted": round(predicted, 4),
+                "delta": round(predicted - baseline[tde], 4),
+                "current": latest.get(tde)
+            }
+    except sqlite3.Error as e:
+        result["error"] = str(e)
+    finally:
+        sandbox.close()
+    result["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+def apply_unified_diff(text: str, diff_text: str) -> str:
+    """
+    Applies a single-file unified diff to `text`. Returns None when a hunk's context
+    or removed lines do not match (the diff was made against other content).
+    """
+    source = text.splitlines()
+    out = []
+    pos = 0
+    hunk_seen = False
+    for line in diff_text.splitlines():
+        header = _HUNK.match(line)
+        if header:
+            hunk_seen = True
+            start = int(header.group(1))
+            # '-0,0' (nothing removed) inserts after line 0
+            start = start - 1 if header.group(2) != '0' else start
+            if start < pos or start > len(source):
+                return None
+            out += source[pos:start]
+            pos = start
+            continue
+        if not hunk_seen or line.startswith('\\'):
+            continue
+        tag, body = line[:1], line[1:]
+        if tag in (' ', ''):
+            if pos >= len(source) or source[pos].rstrip() != body.rstrip():
+                return None
+            out.append(source[pos])
+            pos += 1
+        elif tag == '-':
+            if pos >= len(source) or source[pos].rstrip() != body.rstrip():
+                return None
+            pos += 1
+        elif tag == '+':
+            out.append(body)
+    if not hunk_seen:
+        return None
+    return "\n".join(out + source[pos:])
+
+def predict_diff_impact(model_name: str, diff_text: str, domain: str = None) -> dict:
+    """predict_impact for a unified diff against the model's current SQL."""
+    conn = get_connection()
+    current = _current_sql(conn, model_name)
+    domain = domain or model_domain(conn, model_name)
+    conn.close()
+    proposed = apply_unified_diff(current, diff_text) if current is not None else None
+    if proposed is None:
+        return {"model": model_name, "domain": domain, "error": f"The diff does not apply to the current SQL of {model_name}."}
+    return predict_impact(model_name, proposed, domain)
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 3:
+        print("Usage: python -m src.whatif <model_name> <proposed_sql_file | unified_diff_file> [domain]")
+        sys.exit(1)
+
+    model_name, path = sys.argv[1], sys.argv[2]
+    domain = sys.argv[3] if len(sys.argv) > 3 else None
+    with open(path) as f:
+        content = f.read()
+    if re.search(r'^@@ ', content, re.MULTILINE):
+        print(json.dumps(predict_diff_impact(model_name, content, domain), indent=2))
+    else:
+        print(json.dumps(predict_impact(model_name, content, domain), indent=2))
@@ -1,8 +1,22 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import sqlite3
 import os
+import sys
 import json
+import zlib
+from datetime import date, datetime, timedelta
+
+AGENT_DEMO_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "agent_demo")
+# Projections and readers shared with the agent, so both sides compute the same thing
+sys.path.insert(0, AGENT_DEMO_DIR)
+from src.llm_telemetry import SIMULATED_MODEL
+from src.retention import (
+    ARCHIVE_DIR, archived_investigation_ids, last_event_id_at, load_manifest, read_event_range, read_events
+)
+from src.shards import shard_status
+from src.state_snapshots import apply_latest_state, state_as_of
 
 app = FastAPI(title="Cognition Playback API")
 
@@ -15,7 +29,7 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "agent_demo", "data", "governance.db")
+DB_PATH = os.environ.get("STEWARD_DB_PATH", os.path.join(AGENT_DEMO_DIR, "data", "governance.db"))
 
 def get_db():
     if not os.path.exists(DB_PATH):
@@ -24,39 +38,147 @@ def get_db():
     conn.row_factory = sqlite3.Row
     return conn
 
-@app.get("/events")
-def get_events():
-    """Returns all events ordered by timestamp."""
+# Hot events (EVENT_LOG, not the archive) are loaded once per EVENT_LOG version into a
+# shared snapshot; the investigation, state and learning views are derived from it at most once each.
+_event_snapshot = None
+# key -> task computing it, shared by every concurrent request for that key
+_in_flight = {}
+
+async def single_flight(key, fn, *args):
+    """
+    Runs fn(*args) in a worker thread, once for all concurrent callers with the
+    same key. A caller disconnecting does not cancel the work for the others.
+    """
+    task = _in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+        _in_flight[key] = task
+        task.add_done_callback(lambda _: _in_flight.pop(key, None))
+    return await asyncio.shield(task)
+
+class EventSnapshot:
+    """All events at one EVENT_LOG version, plus the views derived from them."""
+
+    def __init__(self, version, events):
+        self.version = version
+        self.events = events
+        self._derived = {}
+
+    def derive(self, name, build):
+        if name not in self._derived:
+            self._derived[name] = build(self.events)
+        return self._derived[name]
+
+def table_versions(conn, tables):
+    """TABLE_VERSIONS counters (bumped by the agent's triggers) of the given tables."""
+    try:
+        rows = conn.execute(
+            f"SELECT table_name, version FROM TABLE_VERSIONS WHERE table_name IN ({','.join('?' * len(tables))})",
+            tuple(tables)
+        ).fetchall()
+    except sqlite3.OperationalError:
+        # Databases created before change counters existed
+        rows = []
+    versions = {row[0]: row[1] for row in rows}
+    return tuple(versions.get(t, 0) for t in tables)
+
+def event_log_version():
+    """Cheap change marker for EVENT_LOG: its change counter together with the highest event id."""
+    conn = get_db()
+    try:
+        counters = table_versions(conn, ("EVENT_LOG",))
+        max_id = conn.execute("SELECT max(event_id) FROM EVENT_LOG").fetchone()[0]
+    finally:
+        conn.close()
+    return counters + (max_id,)
+
+def event_from_row(row):
+    return {
+        "event_id": row["event_id"],
+        "timestamp": row["timestamp"],
+        "event_type": row["event_type"],
+        "entity_type": row["entity_type"],
+        "entity_id": row["entity_id"],
+        "entity_name": row["entity_name"],
+        "context": json.loads(row["context"]) if row["context"] else {},
+        "metrics": json.loads(row["metrics"]) if row["metrics"] else {},
+        "explanation": row["explanation"]
+    }
+
+BLOB_KEY = "$blob"
+
+def _blob_refs(value, found):
+    if isinstance(value, dict):
+        if BLOB_KEY in value:
+            found.add(value[BLOB_KEY])
+        else:
+            for v in value.values():
+                _blob_refs(v, found)
+    elif isinstance(value, list):
+        for v in value:
+            _blob_refs(v, found)
+    return found
+
+def resolve_blobs(conn, value):
+    """
+    Replaces {"$blob": hash} references written by the agent with the stored
+    content, fetching every referenced blob in one query.
+    """
+    hashes = list(_blob_refs(value, set()))
+    if not hashes:
+        return value
+    rows = conn.execute(
+        f"SELECT hash, data FROM BLOBS WHERE hash IN ({','.join('?' * len(hashes))})", hashes
+    ).fetchall()
+    blobs = {row["hash"]: zlib.decompress(row["data"]).decode("utf-8") for row in rows}
+
+    def substitute(v):
+        if isinstance(v, dict):
+            if BLOB_KEY in v:
+                return blobs.get(v[BLOB_KEY], v)
+            return {k: substitute(x) for k, x in v.items()}
+        if isinstance(v, list):
+            return [substitute(x) for x in v]
+        return v
+    return substitute(value)
+
+def load_events():
+    """Returns the hot events (EVENT_LOG) ordered by timestamp."""
     conn = get_db()
     cursor = conn.cursor()
     cursor.execute("SELECT * FROM EVENT_LOG ORDER BY timestamp ASC")
     rows = cursor.fetchall()
     conn.close()
-    
-    events = []
-    for row in rows:
-        events.append({
-            "event_id": row["event_id"],
-            "timestamp": row["timestamp"],
-            "event_type": row["event_type"],
-            "entity_type": row["entity_type"],
-            "entity_id": row["entity_id"],
-            "entity_name": row["entity_name"],
-            "context": json.loads(row["context"]) if row["context"] else {},
-            "metrics": json.loads(row["metrics"]) if row["metrics"] else {},
-            "explanation": row["explanation"]
-        })
-    return events
+    return [event_from_row(row) for row in rows]
 
-@app.get("/investigations")
-def get_investigations():
+def archived_upto():
+    """Highest archived event id; archival proceeds in id order (src/retention.py)."""
+    return max((entry["max_event_id"] for entry in load_manifest(ARCHIVE_DIR)["segments"]), default=0)
+
+def _load_snapshot(version):
+    # A batch caught between archival and deletion is served from the archive only
+    upto = archived_upto()
+    return EventSnapshot(version, [e for e in load_events() if e["event_id"] > upto])
+
+async def get_event_snapshot():
+    global _event_snapshot
+    version = await asyncio.to_thread(event_log_version)
+    snapshot = _event_snapshot
+    if snapshot is None or snapshot.version != version:
+        snapshot = await single_flight(("events", version), _load_snapshot, version)
+        _event_snapshot = snapshot
+    return snapshot
+
+async def derived_view(name, build):
+    snapshot = await get_event_snapshot()
+    return await single_flight((name, snapshot.version), snapshot.derive, name, build)
+
+def build_investigations(events):
     """
     Groups events into investigation sessions.
     Chronological playback of events grouped into investigations.
     rule_breached → focus_selected → investigation_started → analysis → recommendation → outcome → learning
     """
-    events = get_events()
-    
     investigations = []
     current_investigation = None
     
@@ -90,50 +212,23 @@ def get_investigations():
         
     return investigations
 
-@app.get("/latest_state")
-def get_latest_state():
+def build_latest_state(events):
     """
-    Latest status per business term.
-    Aggregate latest events per business term.
-    Color states derived from: rule_breached, risk_assessed, focus_selected, outcome_measured
+    Latest status per business term: the state before the first hot event (nearest
+    persisted snapshot plus the archived events since), with the hot events folded in.
     """
-    events = get_events()
-    
-    # Track the state per business term
-    term_states = {}
-    
+    conn = get_db()
+    try:
+        first_hot = min((e["event_id"] for e in events), default=latest_event_id(conn) + 1)
+        term_states = state_as_of(conn, first_hot - 1, ARCHIVE_DIR)
+    finally:
+        conn.close()
     for event in events:
-        evt_type = event["event_type"]
-        term_id = None
-        
-        # Figure out the related business term for the state
-        if evt_type in ["risk_assessed", "focus_selected"]:
-            term_id = event["entity_id"]
-            if term_id not in term_states:
-                term_states[term_id] = {"status": "stable", "last_update": event["timestamp"]}
-                
-            term_states[term_id]["last_update"] = event["timestamp"]
-            
-            if evt_type == "risk_assessed":
-                risk_score = event["metrics"].get("risk_score", 0)
-                delta = event["context"].get("delta", 0)
-                if risk_score > 0.1:
-                    term_states[term_id]["status"] = "breached"
-                elif delta > 0:
-                    term_states[term_id]["status"] = "declining"
-                else:
-                    term_states[term_id]["status"] = "stable"
-                    
-            elif evt_type == "focus_selected":
-                term_states[term_id]["status"] = "under_investigation"
-                
+        apply_latest_state(term_states, event)
     return term_states
 
-@app.get("/learning_summary")
-def get_learning_summary():
+def build_learning_summary(events):
     """Aggregated learning effectiveness based on outcomes."""
-    events = get_events()
-    
     improvements = []
     
     for event in events:
@@ -143,7 +238,534 @@ def get_learning_summary():
                 "score_after": event["metrics"].get("score", 0),
                 "timestamp": event["timestamp"]
             })
-            return {"improvements": improvements}
+    return {"improvements": improvements}
+
+def latest_event_id(conn):
+    hot_max = conn.execute("SELECT max(event_id) FROM EVENT_LOG").fetchone()[0]
+    return max(hot_max or 0, archived_upto())
+
+def resolve_as_of(as_of):
+    """
+    ?as_of= takes an event id or an ISO timestamp; returns the id of the last event
+    it covers (0 when it precedes every event), never beyond the newest event.
+    """
+    if as_of.isdigit():
+        conn = get_db()
+        try:
+            return min(int(as_of), latest_event_id(conn))
+        finally:
+            conn.close()
+    try:
+        datetime.fromisoformat(as_of)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid as_of '{as_of}', expected an event id or ISO timestamp")
+    conn = get_db()
+    row = conn.execute(
+        "SELECT event_id FROM EVENT_LOG WHERE timestamp <= ? ORDER BY timestamp DESC, event_id DESC LIMIT 1",
+        (as_of,)
+    ).fetchone()
+    conn.close()
+    if row:
+        return row[0]
+    # Earlier than the hot table: look it up in the archive segments around that time
+    return last_event_id_at(as_of, ARCHIVE_DIR)
+
+def load_state_as_of(as_of_id):
+    """
+    latest_state as it was right after event `as_of_id`, from the nearest persisted
+    snapshot. Read-only; snapshots are written by the agent side (agent_demo/src/state_snapshots.py).
+    """
+    conn = get_db()
+    try:
+        return state_as_of(conn, as_of_id, ARCHIVE_DIR)
+    finally:
+        conn.close()
+
+def load_events_between(start, end):
+    """Events with start <= timestamp < end, opening only the archive segments the range touches."""
+    events = read_events(start, end, ARCHIVE_DIR)
+    for event in events:
+        event.pop("investigation_id", None)
+    return events
+
+@app.get("/events")
+async def get_events(start: str = None, end: str = None):
+    """
+    Returns the hot events (those still in EVENT_LOG) ordered by timestamp. With
+    start and/or end, the events with start <= timestamp < end instead, archived
+    ones included.
+    """
+    if start or end:
+        return await single_flight(("events_between", start, end), load_events_between, start, end)
+    return (await get_event_snapshot()).events
+
+def load_blob(blob_hash):
+    conn = get_db()
+    try:
+        row = conn.execute("SELECT data FROM BLOBS WHERE hash = ?", (blob_hash,)).fetchone()
+    except sqlite3.OperationalError:
+        # Databases created before the blob store existed
+        row = None
+    conn.close()
+    return zlib.decompress(row["data"]).decode("utf-8") if row else None
+
+@app.get("/blobs/{blob_hash}")
+async def get_blob(blob_hash: str):
+    """Content of a blob referenced from an event as {"$blob": hash}."""
+    content = await asyncio.to_thread(load_blob, blob_hash)
+    if content is None:
+        raise HTTPException(status_code=404, detail=f"Blob {blob_hash} not found")
+    return {"hash": blob_hash, "content": content}
+
+INVESTIGATION_PAGE_SIZE = 50
+INVESTIGATION_PAGE_MAX = 500
+
+def summarize_investigation(focus, events):
+    """
+    Lightweight card for the timeline. `events` need only event_type,
+    entity_name and metrics, so summaries can be built without payloads.
+    """
+    rule_breached, risk_score, recommended, outcomes = None, 0, False, 0
+    for event in events:
+        evt_type = event["event_type"]
+        if evt_type == "rule_breached":
+            rule_breached = event["entity_name"]
+        elif evt_type == "risk_assessed" and event["metrics"].get("risk_score"):
+            risk_score = event["metrics"]["risk_score"]
+        elif evt_type == "recommendation_created":
+            recommended = True
+        elif evt_type == "outcome_measured":
+            outcomes += 1
+    return {
+        "id": focus["event_id"],
+        "focus_term": focus["entity_id"],
+        "start_time": focus["timestamp"],
+        "status": "resolved" if outcomes else "actioned" if recommended else "scanning",
+        "event_count": len(events),
+        "rule_breached": rule_breached,
+        "risk_score": risk_score,
+        "has_recommendation": recommended,
+        "outcome_count": outcomes
+    }
+
+def _truncate(investigation, as_of_id):
+    """An investigation as it stood after event `as_of_id`."""
+    events = [e for e in investigation["events"] if e["event_id"] <= as_of_id]
+    return {**investigation, "events": events}
+
+def load_archived_investigations(ids, as_of_id=None):
+    """
+    The archived investigations with the given ids (ascending), reading only the
+    segments between the first of them and the next investigation after the last.
+    """
+    if not ids:
+        return []
+    later = [i for i in archived_investigation_ids(ARCHIVE_DIR) if i > ids[-1]]
+    events_by_investigation = {i: [] for i in ids}
+    for event in read_event_range(ids[0], later[0] - 1 if later else None, ARCHIVE_DIR):
+        investigation_id = event.pop("investigation_id", None)
+        if investigation_id in events_by_investigation and (as_of_id is None or event["event_id"] <= as_of_id):
+            events_by_investigation[investigation_id].append(event)
+    return [inv for i in ids for inv in build_investigations(events_by_investigation[i])]
+
+def load_investigation_page(before, limit, as_of_id=None):
+    """
+    The `limit` most recent investigations opened before event id `before`, oldest
+    first. Only the focus events of the page and the light columns of their events
+    are read, through the investigation_id index. With `as_of_id`, events after it
+    are ignored, so the page is the one the dashboard showed at that point.
+    """
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT event_id, entity_id, timestamp FROM EVENT_LOG
+        WHERE event_type = 'focus_selected' AND (? IS NULL OR event_id < ?) AND (? IS NULL OR event_id <= ?)
+        ORDER BY event_id DESC LIMIT ?
+    ''', (before, before, as_of_id, as_of_id, limit + 1))
+    focus_rows = cursor.fetchall()
+    has_more = len(focus_rows) > limit
+    focus_rows = list(reversed(focus_rows[:limit]))
+
+    events_by_investigation = {row["event_id"]: [] for row in focus_rows}
+    if focus_rows:
+        cursor.execute(f'''
+            SELECT investigation_id, event_type, entity_name, metrics FROM EVENT_LOG
+            WHERE investigation_id IN ({','.join('?' * len(focus_rows))}) AND (? IS NULL OR event_id <= ?)
+            ORDER BY event_id
+        ''', tuple(events_by_investigation) + (as_of_id, as_of_id))
+        for row in cursor.fetchall():
+            events_by_investigation[row["investigation_id"]].append({
+                "event_type": row["event_type"],
+                "entity_name": row["entity_name"],
+                "metrics": json.loads(row["metrics"]) if row["metrics"] else {}
+            })
+    cursor.execute(
+        "SELECT count(*) FROM EVENT_LOG WHERE event_type = 'focus_selected' AND (? IS NULL OR event_id <= ?)",
+        (as_of_id, as_of_id)
+    )
+    total = cursor.fetchone()[0]
+    conn.close()
+
+    summaries = [
+        summarize_investigation(focus, events_by_investigation[focus["event_id"]]) for focus in focus_rows
+    ]
+    next_before = focus_rows[0]["event_id"] if has_more else None
+
+    # Older pages continue into the archive, which only ever holds whole investigations
+    archived = archived_investigation_ids(ARCHIVE_DIR)
+    if as_of_id is not None:
+        archived = [i for i in archived if i <= as_of_id]
+    total += len(archived)
+    if not has_more and archived:
+        # The hot rows ran out: fill the page from the archive, and point past a full
+        # page at the newest archived investigation older than it
+        oldest = summaries[0]["id"] if summaries else before
+        older = [i for i in archived if oldest is None or i < oldest]
+        room = limit - len(summaries)
+        page = older[-room:] if room else []
+        summaries = [
+            summarize_investigation(inv["events"][0], inv["events"])
+            for inv in load_archived_investigations(page, as_of_id)
+        ] + summaries
+        if len(older) > len(page):
+            next_before = summaries[0]["id"]
+
+    return {
+        "investigations": summaries,
+        "total": total,
+        "next_before": next_before
+    }
+
+def load_investigation(investigation_id, as_of_id=None):
+    """
+    Full event chain of one investigation, read by its index instead of replaying
+    the log; with `as_of_id`, only the events up to it.
+    """
+    if as_of_id is not None and investigation_id > as_of_id:
+        return None
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT * FROM EVENT_LOG WHERE investigation_id = ? AND (? IS NULL OR event_id <= ?) ORDER BY event_id",
+        (investigation_id, as_of_id, as_of_id)
+    )
+    # The detail view shows diffs, so blob references are resolved here rather than in list views
+    events = resolve_blobs(conn, [event_from_row(row) for row in cursor.fetchall()])
+    conn.close()
+    investigations = build_investigations(events)
+    if investigations:
+        return investigations[0]
+    if investigation_id not in archived_investigation_ids(ARCHIVE_DIR):
+        return None
+    archived = load_archived_investigations([investigation_id], as_of_id)
+    return archived[0] if archived else None
+
+def page_from_snapshot(investigations, before, limit):
+    # Databases the agent has not migrated yet have no investigation_id column
+    older = [inv for inv in investigations if before is None or inv["id"] < before]
+    page = older[-limit:]
+    return {
+        "investigations": [summarize_investigation(inv["events"][0], inv["events"]) for inv in page],
+        "total": len(investigations),
+        "next_before": page[0]["id"] if len(older) > len(page) else None
+    }
+
+@app.get("/investigations")
+async def get_investigations(before: int = None, limit: int = INVESTIGATION_PAGE_SIZE, as_of: str = None):
+    """
+    Paginated investigation summaries (id, focus term, start time, status, counts),
+    newest page first; pass `next_before` back as `before` for older pages.
+    Events are fetched per investigation from /investigations/{id}.
+    ?as_of=<event id|timestamp> shows the investigations as they stood then.
+    """
+    limit = max(1, min(limit, INVESTIGATION_PAGE_MAX))
+    as_of_id = await asyncio.to_thread(resolve_as_of, as_of) if as_of is not None else None
+    version = await asyncio.to_thread(event_log_version)
+    try:
+        return await single_flight(
+            ("investigations", before, limit, as_of_id, version), load_investigation_page, before, limit, as_of_id
+        )
+    except sqlite3.OperationalError:
+        investigations = await derived_view("investigations", build_investigations)
+        if as_of_id is not None:
+            investigations = [_truncate(inv, as_of_id) for inv in investigations if inv["id"] <= as_of_id]
+        return page_from_snapshot(investigations, before, limit)
+
+@app.get("/investigations/{investigation_id}")
+async def get_investigation(investigation_id: int, as_of: str = None):
+    """One investigation with its full event chain, including diffs, optionally as of an event id or timestamp."""
+    as_of_id = await asyncio.to_thread(resolve_as_of, as_of) if as_of is not None else None
+    version = await asyncio.to_thread(event_log_version)
+    try:
+        investigation = await single_flight(
+            ("investigation", investigation_id, as_of_id, version), load_investigation, investigation_id, as_of_id
+        )
+    except sqlite3.OperationalError:
+        investigations = await derived_view("investigations", build_investigations)
+        investigation = next((inv for inv in investigations if inv["id"] == investigation_id), None)
+        if investigation is not None and as_of_id is not None:
+            investigation = _truncate(investigation, as_of_id) if investigation_id <= as_of_id else None
+    if investigation is None:
+        raise HTTPException(status_code=404, detail=f"Investigation {investigation_id} not found")
+    return investigation
+
+@app.get("/latest_state")
+async def get_latest_state(as_of: str = None):
+    """
+    Latest status per business term, or with ?as_of=<event id|timestamp> the
+    status as it was at that point, rebuilt from the nearest earlier snapshot.
+    """
+    if as_of is None:
+        return await derived_view("latest_state", build_latest_state)
+    as_of_id = await asyncio.to_thread(resolve_as_of, as_of)
+    return await single_flight(("latest_state_as_of", as_of_id), load_state_as_of, as_of_id)
+
+@app.get("/learning_summary")
+async def get_learning_summary(as_of: str = None):
+    """Aggregated learning effectiveness based on the hot events' outcomes, optionally as of an event id or timestamp."""
+    if as_of is None:
+        return await derived_view("learning_summary", build_learning_summary)
+    as_of_id = await asyncio.to_thread(resolve_as_of, as_of)
+    snapshot = await get_event_snapshot()
+    return build_learning_summary(e for e in snapshot.events if e["event_id"] <= as_of_id)
+
+@app.get("/policy_coverage")
+def get_policy_coverage():
+    """
+    Catalog-wide policy coverage matrix materialized by the coverage job:
+    TDE -> required validation -> 'covered' / 'missing'.
+    """
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            SELECT tde_id, rule_id, required_validation, semantic_type, status, updated_at
+            FROM POLICY_COVERAGE
+            ORDER BY tde_id, rule_id, required_validation
+        ''')
+        rows = cursor.fetchall()
+    except sqlite3.OperationalError:
+        # The coverage job has not run against this database yet
+        rows = []
+    conn.close()
+
+    matrix = {}
+    for row in rows:
+        tde = matrix.setdefault(row["tde_id"], {"semantic_type": row["semantic_type"], "validations": {}, "missing": 0})
+        tde["validations"][row["required_validation"]] = row["status"]
+        if row["status"] == "missing":
+            tde["missing"] += 1
+    return matrix
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize_llm_calls(rows):
+    """Call, token and spend totals of LLM_CALLS rows; latency percentiles of real, uncached calls only."""
+    # The reviewer's simulated analysis takes ~0 ms and would drag the percentiles down
+    latencies = sorted(r["latency_ms"] for r in rows if not r["cache_hit"] and r["model"] != SIMULATED_MODEL)
+    return {
+        "calls": len(rows),
+        "cache_hits": sum(r["cache_hit"] for r in rows),
+        "fallbacks": sum(r["fallback_used"] for r in rows),
+        "errors": sum(1 for r in rows if r["error_class"]),
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99)
+        },
+        "input_tokens": sum(r["input_tokens"] for r in rows),
+        "output_tokens": sum(r["output_tokens"] for r in rows),
+        "cost_usd": sum(r["cost_usd"] for r in rows)
+    }
+
+@app.get("/llm_usage")
+def get_llm_usage():
+    """
+    Latency percentiles, token counts and spend of recorded LLM calls: across all
+    calls under "total", and per model under "models".
+    """
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            SELECT model, latency_ms, input_tokens, output_tokens, cost_usd,
+                   cache_hit, fallback_used, error_class
+            FROM LLM_CALLS
+        ''')
+        rows = cursor.fetchall()
+    except sqlite3.OperationalError:
+        # Databases created before telemetry existed have no LLM_CALLS table
+        rows = []
+    conn.close()
+
+    by_model = {}
+    for row in rows:
+        by_model.setdefault(row["model"], []).append(row)
+    return {
+        "total": summarize_llm_calls(rows),
+        "models": {model: summarize_llm_calls(model_rows) for model, model_rows in by_model.items()}
+    }
+
+@app.get("/shards")
+def get_shards():
+    """Landing and model tables of every business domain with their row counts, read across the attached shards."""
+    conn = get_db()
+    try:
+        status = shard_status(conn)
+    except sqlite3.OperationalError:
+        # Databases from before sharding have no DATA_SHARDS table
+        status = []
+    finally:
+        conn.close()
+
+    domains = {}
+    for row in status:
+        if row["rows"] is None:
+            continue
+        domain = domains.setdefault(row["domain"], {"shard": row["shard"], "tables": {}})
+        domain["tables"][row["table"]] = {"kind": row["kind"], "rows": row["rows"]}
+    return domains
+
+# SQLite expression mapping DQ_SCORES.date to the first day of its bucket
+HEATMAP_BUCKETS = {
+    "day": "d.date",
+    "week": "date(d.date, 'weekday 0', '-6 days')",  # weeks start on Monday
+    "month": "strftime('%Y-%m-01', d.date)"
+}
+HEATMAP_TABLES = ("DQ_SCORES", "TDE", "RULES", "BUSINESS_TERMS")
+HEATMAP_CACHE_SIZE = 32
+# (bucket, start, end, version) -> matrix
+_heatmap_cache = {}
+
+def heatmap_version():
+    conn = get_db()
+    try:
+        counters = table_versions(conn, HEATMAP_TABLES)
+        # Score writes use INSERT OR REPLACE, so the highest rowid also moves on every write
+        max_rowid = conn.execute("SELECT max(rowid) FROM DQ_SCORES").fetchone()[0]
+    finally:
+        conn.close()
+    return counters + (max_rowid,)
+
+def bucket_start(value, bucket):
+    day = date.fromisoformat(value)
+    return (day - timedelta(days=day.weekday()) if bucket == "week" else day.replace(day=1)).isoformat()
+
+def rollup_cells(cursor, bucket, start, end):
+    """
+    Week/month cells from the agent's precomputed DQ_ROLLUPS, so long ranges never
+    scan DQ_SCORES. Buckets overlapping the range are reported whole.
+    """
+    first = bucket_start(start, bucket) if start else None
+    cursor.execute('''
+        SELECT b.term_id, b.name, th.threshold, r.period_start AS bucket,
+               sum(r.mean_score * r.count) / sum(r.count) AS avg_score, min(r.min_score) AS min_score,
+               sum(r.breach_count) AS breaches, sum(r.count) AS observations
+        FROM DQ_ROLLUPS r
+        JOIN TDE t ON t.tde_id = r.tde_id
+        JOIN BUSINESS_TERMS b ON b.term_id = t.business_term_id
+        LEFT JOIN (
+            SELECT business_term_id, max(threshold) AS threshold FROM RULES GROUP BY business_term_id
+        ) th ON th.business_term_id = b.term_id
+        WHERE r.period = ? AND (? IS NULL OR r.period_start >= ?) AND (? IS NULL OR r.period_start <= ?)
+        GROUP BY b.term_id, bucket
+        ORDER BY b.term_id, bucket
+    ''', (bucket, first, first, end, end))
+    return cursor.fetchall()
+
+def scan_cells(cursor, bucket, start, end):
+    """Cells aggregated straight from DQ_SCORES; the day view and the fallback for the others."""
+    cursor.execute(f'''
+        SELECT b.term_id, b.name, th.threshold,
+               {HEATMAP_BUCKETS[bucket]} AS bucket,
+               avg(d.score) AS avg_score, min(d.score) AS min_score,
+               sum(CASE WHEN d.score < th.threshold THEN 1 ELSE 0 END) AS breaches,
+               count(*) AS observations
+        FROM DQ_SCORES d
+        JOIN TDE t ON t.tde_id = d.tde_id
+        JOIN BUSINESS_TERMS b ON b.term_id = t.business_term_id
+        LEFT JOIN (
+            SELECT business_term_id, max(threshold) AS threshold FROM RULES GROUP BY business_term_id
+        ) th ON th.business_term_id = b.term_id
+        WHERE (? IS NULL OR d.date >= ?) AND (? IS NULL OR d.date <= ?)
+        GROUP BY b.term_id, bucket
+        ORDER BY b.term_id, bucket
+    ''', (start, start, end, end))
+    return cursor.fetchall()
+
+def build_heatmap(bucket, start, end):
+    """
+    Business term x time bucket matrix, aggregated in SQL. Each term is measured
+    against its strictest rule threshold; cells without scores are null.
+    """
+    conn = get_db()
+    cursor = conn.cursor()
+    rows = []
+    if bucket != "day":
+        try:
+            rows = rollup_cells(cursor, bucket, start, end)
+        except sqlite3.OperationalError:
+            pass  # databases from before rollups existed
+    if not rows:
+        rows = scan_cells(cursor, bucket, start, end)
+    conn.close()
+
+    buckets = sorted({row["bucket"] for row in rows})
+    column = {b: i for i, b in enumerate(buckets)}
+    terms, names, thresholds = [], [], []
+    avg_score, min_score, breach_ratio = [], [], []
+    for row in rows:
+        if not terms or terms[-1] != row["term_id"]:
+            terms.append(row["term_id"])
+            names.append(row["name"])
+            thresholds.append(row["threshold"])
+            for matrix in (avg_score, min_score, breach_ratio):
+                matrix.append([None] * len(buckets))
+        i = column[row["bucket"]]
+        avg_score[-1][i] = round(row["avg_score"], 4)
+        min_score[-1][i] = round(row["min_score"], 4)
+        breach_ratio[-1][i] = round(row["breaches"] / row["observations"], 4)
+
+    return {
+        "bucket": bucket,
+        "buckets": buckets,
+        "terms": terms,
+        "term_names": names,
+        "thresholds": thresholds,
+        "avg_score": avg_score,
+        "min_score": min_score,
+        "breach_ratio": breach_ratio
+    }
+
+@app.get("/heatmap")
+async def get_heatmap(bucket: str = "day", start: str = None, end: str = None):
+    """
+    Compact term x time-bucket DQ matrix in columnar form: `buckets` label the
+    columns, `terms` the rows, and each metric is a row-major 2D array.
+    Downsampled by day, week or month and cached per (bucket, range, data version).
+    """
+    if bucket not in HEATMAP_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of {', '.join(HEATMAP_BUCKETS)}")
+    for value in (start, end):
+        if value is not None:
+            try:
+                date.fromisoformat(value)
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid date '{value}', expected YYYY-MM-DD")
+
+    key = (bucket, start, end, await asyncio.to_thread(heatmap_version))
+    matrix = _heatmap_cache.get(key)
+    if matrix is None:
+        matrix = await single_flight(("heatmap",) + key, build_heatmap, bucket, start, end)
+        if len(_heatmap_cache) >= HEATMAP_CACHE_SIZE:
+            _heatmap_cache.pop(next(iter(_heatmap_cache)))
+        _heatmap_cache[key] = matrix
+    return matrix
 
 @app.post("/approve_pr/{pr_id}")
 def approve_pr(pr_id: int):
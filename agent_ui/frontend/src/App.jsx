@@ -1,17 +1,33 @@
 import React, { useState, useEffect, useRef } from 'react';
-import { fetchInvestigations, fetchLatestState, fetchLearningSummary } from './api';
+import { fetchHeatmap, fetchInvestigations, fetchLatestState, fetchLearningSummary } from './api';
 import Timeline from './components/Timeline';
 import InvestigationDetails from './components/InvestigationDetails';
 import Heatmap from './components/Heatmap';
 import LearningView from './components/LearningView';
 import { BrainCircuit, Activity, LineChart, Target, Play, Pause, SkipForward } from 'lucide-react';
 
+// Investigations are kept oldest first; pages are merged in by id
+function mergeInvestigations(current, incoming) {
+  const byId = new Map(current.map(inv => [inv.id, inv]));
+  incoming.forEach(inv => byId.set(inv.id, inv));
+  return [...byId.values()].sort((a, b) => a.id - b.id);
+}
+
 function App() {
   const [investigations, setInvestigations] = useState([]);
   const [latestState, setLatestState] = useState({});
+  // Term x time-bucket DQ matrix from /heatmap, shared by the heatmap panel and the timeline
+  const [heatmap, setHeatmap] = useState(null);
+  const [heatmapBucket, setHeatmapBucket] = useState('day');
   const [learningSummary, setLearningSummary] = useState({ improvements: [] });
   const [selectedInvestigation, setSelectedInvestigation] = useState(null);
   const [loading, setLoading] = useState(true);
+  // `before` cursor of the next older page: undefined until the first page arrives, null once all are loaded
+  const [olderCursor, setOlderCursor] = useState(undefined);
+  const [loadingOlder, setLoadingOlder] = useState(false);
+  const olderCursorRef = useRef(undefined);
+  const selectedRef = useRef(null);
+  const pagingRef = useRef(false);
 
   const [isPlaying, setIsPlaying] = useState(false);
   const [playbackSpeed, setPlaybackSpeed] = useState(2000); // 2 seconds per event
@@ -21,14 +37,22 @@ function App() {
     let isMounted = true;
     async function loadData() {
       try {
-        const invs = await fetchInvestigations();
+        const page = await fetchInvestigations();
+        const invs = page.investigations;
         const state = await fetchLatestState();
         const learning = await fetchLearningSummary();
+        const matrix = await fetchHeatmap(heatmapBucket);
 
         if (isMounted) {
-          setInvestigations(invs);
+          // Polls refresh the newest page; older pages stay as they were loaded
+          setInvestigations(prev => mergeInvestigations(prev, invs));
+          if (olderCursorRef.current === undefined) {
+            olderCursorRef.current = page.next_before;
+            setOlderCursor(page.next_before);
+          }
           setLatestState(state);
           setLearningSummary(learning);
+          setHeatmap(matrix);
 
           if (invs.length > 0 && !selectedInvestigation) {
             setSelectedInvestigation(invs[invs.length - 1]);
@@ -51,12 +75,52 @@ function App() {
       isMounted = false;
       clearInterval(pollInterval);
     };
+  }, [selectedInvestigation, heatmapBucket]);
+
+  useEffect(() => {
+    selectedRef.current = selectedInvestigation;
   }, [selectedInvestigation]);
 
+  async function loadOlder() {
+    const before = olderCursorRef.current;
+    if (before === undefined || before === null) return [];
+    setLoadingOlder(true);
+    try {
+      const page = await fetchInvestigations(before);
+      olderCursorRef.current = page.next_before;
+      setOlderCursor(page.next_before);
+      setInvestigations(prev => mergeInvestigations(prev, page.investigations));
+      return page.investigations;
+    } finally {
+      setLoadingOlder(false);
+    }
+  }
+
   // Playback Logic
   useEffect(() => {
     if (isPlaying && investigations.length > 0) {
-      playIntervalRef.current = setInterval(() => {
+      playIntervalRef.current = setInterval(async () => {
+        if (pagingRef.current) return;
+        const current = selectedRef.current;
+        // At the start of what is loaded: page in the older investigations first,
+        // so the replay begins at the very first one
+        if ((!current || current.id === investigations[0].id) && olderCursorRef.current) {
+          pagingRef.current = true;
+          try {
+            let oldest = [];
+            while (olderCursorRef.current) {
+              const page = await loadOlder();
+              if (page.length > 0) oldest = page;
+            }
+            if (oldest.length > 0) setSelectedInvestigation(oldest[0]);
+          } catch (err) {
+            console.error("Failed to load older investigations:", err);
+            setIsPlaying(false);
+          } finally {
+            pagingRef.current = false;
+          }
+          return;
+        }
         setSelectedInvestigation((prev) => {
           if (!prev) return investigations[0];
           const currentIndex = investigations.findIndex(inv => inv.id === prev.id);
@@ -118,8 +182,12 @@ function App() {
         </header>
         <Timeline
           investigations={investigations}
+          matrix={heatmap}
           selectedId={selectedInvestigation?.id}
           onSelect={setSelectedInvestigation}
+          hasOlder={Boolean(olderCursor)}
+          loadingOlder={loadingOlder}
+          onLoadOlder={() => loadOlder().catch(err => console.error("Failed to load older investigations:", err))}
         />
       </aside>
 
@@ -130,7 +198,7 @@ function App() {
               <Activity size={20} color="var(--accent-cyan)" />
               Business Term Risk State
             </h2>
-            <Heatmap states={latestState} />
+            <Heatmap states={latestState} matrix={heatmap} bucket={heatmapBucket} onBucketChange={setHeatmapBucket} />
           </div>
           <div className="panel">
             <h2 className="panel-header">
@@ -147,7 +215,7 @@ function App() {
             Investigation Reasoning
           </h2>
           {selectedInvestigation ? (
-            <InvestigationDetails inv={selectedInvestigation} />
+            <InvestigationDetails summary={selectedInvestigation} />
           ) : (
             <div style={{ color: 'var(--text-muted)' }}>Select an investigation from the timeline.</div>
           )}
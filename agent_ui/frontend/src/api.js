@@ -6,14 +6,25 @@ export async function fetchEvents() {
     return res.json();
 }
 
-export async function fetchInvestigations() {
-    const res = await fetch(`${API_BASE}/investigations`);
+export async function fetchInvestigations(before = null, limit = 50, asOf = null) {
+    const params = new URLSearchParams({ limit });
+    if (before !== null) params.set('before', before);
+    if (asOf !== null) params.set('as_of', asOf);
+    const res = await fetch(`${API_BASE}/investigations?${params}`);
     if (!res.ok) throw new Error("Failed to fetch investigations");
     return res.json();
 }
 
-export async function fetchLatestState() {
-    const res = await fetch(`${API_BASE}/latest_state`);
+export async function fetchInvestigation(id) {
+    const res = await fetch(`${API_BASE}/investigations/${id}`);
+    if (!res.ok) throw new Error("Failed to fetch investigation");
+    return res.json();
+}
+
+// asOf: an event id or ISO timestamp to see the state at that point
+export async function fetchLatestState(asOf = null) {
+    const query = asOf !== null ? `?${new URLSearchParams({ as_of: asOf })}` : '';
+    const res = await fetch(`${API_BASE}/latest_state${query}`);
     if (!res.ok) throw new Error("Failed to fetch latest state");
     return res.json();
 }
@@ -24,6 +35,15 @@ export async function fetchLearningSummary() {
     return res.json();
 }
 
+export async function fetchHeatmap(bucket = 'day', start = null, end = null) {
+    const params = new URLSearchParams({ bucket });
+    if (start) params.set('start', start);
+    if (end) params.set('end', end);
+    const res = await fetch(`${API_BASE}/heatmap?${params}`);
+    if (!res.ok) throw new Error("Failed to fetch heatmap");
+    return res.json();
+}
+
 export async function approvePullRequest(pr_id) {
     const res = await fetch(`${API_BASE}/approve_pr/${pr_id}`, { method: 'POST' });
     if (!res.ok) throw new Error("Failed to approve pull request");
@@ -1,26 +1,75 @@
 import React from 'react';
 import { Layers, Activity } from 'lucide-react';
 
-function Heatmap({ states }) {
-    const terms = Object.keys(states);
+// Most recent buckets shown per term; the server downsamples longer ranges by week or month
+const VISIBLE_BUCKETS = 30;
+
+function cellColor(score, threshold) {
+    if (score === null || score === undefined) return 'rgba(255,255,255,0.05)';
+    if (score >= threshold) return 'var(--accent-green)';
+    return score >= threshold * 0.9 ? 'var(--accent-amber)' : 'var(--accent-red)';
+}
+
+function Heatmap({ states, matrix, bucket, onBucketChange }) {
+    // Rows come from the /heatmap matrix; terms with a state but no scores yet are appended
+    const matrixTerms = matrix?.terms || [];
+    const terms = [...matrixTerms, ...Object.keys(states).filter(t => !matrixTerms.includes(t))];
 
     if (terms.length === 0) {
         return <div style={{ color: 'var(--text-muted)' }}>Awaiting telemetry...</div>;
     }
 
+    const buckets = matrix?.buckets || [];
+    const first = Math.max(0, buckets.length - VISIBLE_BUCKETS);
+
     return (
         <div className="heatmap-grid">
+            <div style={{ display: 'flex', justifyContent: 'flex-end', gap: '6px' }}>
+                {['day', 'week', 'month'].map(b => (
+                    <button
+                        key={b}
+                        onClick={() => onBucketChange(b)}
+                        style={{
+                            background: b === bucket ? 'rgba(255,255,255,0.08)' : 'transparent',
+                            border: '1px solid var(--glass-border)', borderRadius: '12px',
+                            color: b === bucket ? 'var(--text-primary)' : 'var(--text-muted)',
+                            fontSize: '0.75rem', padding: '2px 10px', cursor: 'pointer', textTransform: 'capitalize'
+                        }}
+                    >
+                        {b}
+                    </button>
+                ))}
+            </div>
             {terms.map(term => {
                 const info = states[term];
+                const row = matrixTerms.indexOf(term);
+                const scores = row >= 0 ? matrix.avg_score[row] : [];
+                const threshold = row >= 0 ? matrix.thresholds[row] : null;
                 return (
-                    <div key={term} className={`heatmap-item status-${info.status}`}>
-                        <div style={{ display: 'flex', alignItems: 'center', gap: '8px' }}>
+                    <div key={term} className={`heatmap-item ${info ? `status-${info.status}` : ''}`}>
+                        <div style={{ display: 'flex', alignItems: 'center', gap: '8px', minWidth: 0 }}>
                             <Layers size={16} color="var(--text-secondary)" />
-                            <span style={{ fontWeight: 500, color: 'var(--text-primary)' }}>{term}</span>
+                            <span style={{ fontWeight: 500, color: 'var(--text-primary)' }} title={row >= 0 ? matrix.term_names[row] : term}>{term}</span>
                         </div>
-                        <div className="status-badge">
-                            {info.status.replace('_', ' ')}
+                        <div style={{ display: 'flex', gap: '2px', flex: 1, justifyContent: 'flex-end', margin: '0 12px' }}>
+                            {buckets.slice(first).map((label, i) => {
+                                const score = scores[first + i];
+                                return (
+                                    <div
+                                        key={label}
+                                        title={`${label}: ${score === null || score === undefined ? 'no score' : score.toFixed(3)} (threshold ${threshold})`}
+                                        style={{ width: '8px', height: '16px', borderRadius: '2px', background: cellColor(score, threshold) }}
+                                    />
+                                );
+                            })}
                         </div>
+                        {info ? (
+                            <div className="status-badge">
+                                {info.status.replace('_', ' ')}
+                            </div>
+                        ) : (
+                            <Activity size={14} color="var(--text-muted)" />
+                        )}
                     </div>
                 );
             })}
@@ -1,11 +1,22 @@
 import React, { useState, useEffect } from 'react';
 import LineageGraph from './LineageGraph';
 import { AlertCircle, FileSearch, ShieldAlert, Cpu } from 'lucide-react';
-import { fetchConfig } from '../api';
+import { fetchConfig, fetchInvestigation } from '../api';
 
-function InvestigationDetails({ inv }) {
+function InvestigationDetails({ summary }) {
 
     const [repoUrl, setRepoUrl] = useState("https://github.com/unknown/repository");
+    const [inv, setInv] = useState(null);
+
+    // The timeline only holds summaries; the full event chain is fetched on selection
+    useEffect(() => {
+        let isMounted = true;
+        setInv(null);
+        fetchInvestigation(summary.id)
+            .then(detail => { if (isMounted) setInv(detail); })
+            .catch(e => console.error("Failed to load investigation", e));
+        return () => { isMounted = false; };
+    }, [summary.id]);
 
     useEffect(() => {
         const getConfig = async () => {
@@ -19,6 +30,10 @@ function InvestigationDetails({ inv }) {
         getConfig();
     }, []);
 
+    if (!inv) {
+        return <div style={{ color: 'var(--text-muted)' }}>Loading investigation...</div>;
+    }
+
     let problem = null;
     let reasoning = { lineage: null, analysis: null, gaps: null };
     let decision = null;
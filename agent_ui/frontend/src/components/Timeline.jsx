@@ -1,25 +1,42 @@
 import React from 'react';
-import { Target, Clock, AlertTriangle } from 'lucide-react';
+import { Target, Clock, AlertTriangle, Activity } from 'lucide-react';
 
-function Timeline({ investigations, selectedId, onSelect }) {
+// Latest bucketed score of a term and its threshold from the /heatmap matrix, or null
+function latestScore(matrix, term) {
+    const row = matrix?.terms?.indexOf(term) ?? -1;
+    if (row < 0) return null;
+    const scores = matrix.avg_score[row].filter(s => s !== null);
+    return scores.length > 0 ? { score: scores[scores.length - 1], threshold: matrix.thresholds[row] } : null;
+}
+
+function Timeline({ investigations, matrix, selectedId, onSelect, hasOlder, loadingOlder, onLoadOlder }) {
     if (!investigations || investigations.length === 0) {
         return <div className="timeline-container"><p style={{ color: 'var(--text-muted)' }}>No investigations yet.</p></div>;
     }
 
     return (
         <div className="timeline-container">
+            {hasOlder && (
+                <button
+                    onClick={onLoadOlder}
+                    disabled={loadingOlder}
+                    style={{
+                        background: 'transparent', border: '1px solid var(--glass-border)', borderRadius: 'var(--radius-md)',
+                        color: 'var(--text-muted)', padding: '8px', cursor: loadingOlder ? 'wait' : 'pointer'
+                    }}
+                >
+                    {loadingOlder ? "Loading..." : "Load older investigations"}
+                </button>
+            )}
             {investigations.map((inv) => {
                 const isActive = inv.id === selectedId;
                 const startTime = new Date(inv.start_time).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' });
 
-                let riskScore = 0;
-                let ruleBreached = "Unknown Rule";
-
-                // Extract basic data for the card
-                inv.events.forEach(e => {
-                    if (e.event_type === 'risk_assessed' && e.metrics.risk_score) riskScore = e.metrics.risk_score;
-                    if (e.event_type === 'rule_breached') ruleBreached = e.entity_name;
-                });
+                // Summaries carry what the card needs; events are loaded on selection
+                const riskScore = inv.risk_score || 0;
+                const ruleBreached = inv.rule_breached || "Unknown Rule";
+                const actioned = inv.has_recommendation;
+                const latest = latestScore(matrix, inv.focus_term);
 
                 return (
                     <div
@@ -39,9 +56,15 @@ function Timeline({ investigations, selectedId, onSelect }) {
                                 Risk: {riskScore.toFixed(3)}
                             </div>
                             <div className="stat-pill">
-                                <Target size={12} color={inv.recommendation ? "var(--accent-green)" : "var(--text-muted)"} />
-                                {inv.recommendation ? "Actioned" : "Scanning"}
+                                <Target size={12} color={actioned ? "var(--accent-green)" : "var(--text-muted)"} />
+                                {actioned ? "Actioned" : "Scanning"}
                             </div>
+                            {latest && (
+                                <div className="stat-pill" title={`Latest ${matrix.bucket} score of ${inv.focus_term}`}>
+                                    <Activity size={12} color={latest.score >= latest.threshold ? "var(--accent-green)" : "var(--accent-red)"} />
+                                    DQ: {latest.score.toFixed(3)}
+                                </div>
+                            )}
                         </div>
                     </div>
                 );